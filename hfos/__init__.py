@@ -15,22 +15,13 @@ This is a namespace package.
 
 __author__ = "Heiko 'riot' Weinen <riot@c-base.org>"
 
-# See http://peak.telecommunity.com/DevCenter/setuptools#namespace-packages
-try:
-    __import__('pkg_resources').declare_namespace(__name__)
-except ImportError:  # pragma: no cover
-    from pkgutil import extend_path
-
-    # noinspection PyUnboundLocalVariable
-    __path__ = extend_path(__path__, __name__)  # noqa
-    import os
-
-    for _path in __path__:
-        _path = os.path.join(_path, '__init__.py')
-        if _path != __file__ and os.path.exists(_path):
-            from six import exec_
-
-            with open(_path) as fd:
-                exec_(fd, globals())
-    # noinspection PyUnboundLocalVariable
-    del os, extend_path, _path, fd, exec_  # noqa
+# The module distributions all install into the hfos package. pkgutil finds
+# their portions on the python path, without the costly import of
+# pkg_resources on every start. See
+# https://packaging.python.org/guides/packaging-namespace-packages/
+from pkgutil import extend_path
+
+# noinspection PyUnboundLocalVariable
+__path__ = extend_path(__path__, __name__)  # noqa
+
+del extend_path
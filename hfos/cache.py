@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# HFOS - Hackerfleet Operating System
+# ===================================
+# Copyright (C) 2011-2017 Heiko 'riot' Weinen <riot@c-base.org> and others.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Heiko 'riot' Weinen"
+__license__ = "GPLv3"
+
+"""
+
+Module: Cache
+=============
+
+Per schema read-through object cache for uuid lookups.
+
+Cached are copies of the objects' fields, every lookup hands out a fresh
+model instance, so handlers can modify their objects without spoiling the
+cache. Entries are dropped when they expire, when the cache is full
+(least recently used first), when an object is written through the model
+layer and when object change events come in.
+
+Counts of query results are cached for a short while, too, and dropped
+whenever an object of their schema is changed.
+
+
+"""
+
+from collections import OrderedDict
+from copy import deepcopy
+from json import dumps
+from threading import Lock
+from time import time
+
+from hfos.logger import hfoslog, verbose
+
+cache_defaults = {
+    'size': 1000,
+    'ttl': 300
+}
+
+# Per schema overrides of the defaults above, a size of 0 disables caching
+cache_settings = {
+    'user': {'size': 500, 'ttl': 600},
+    'profile': {'size': 500, 'ttl': 600},
+    'client': {'size': 1000, 'ttl': 600},
+    'systemconfig': {'size': 10, 'ttl': 600},
+    'sensordata': {'size': 0},
+    'logmessage': {'size': 0}
+}
+
+# Seconds a cached query result count stays valid
+count_ttl = 30
+
+caches = {}
+counts = {}
+
+_caches_lock = Lock()
+_counts_lock = Lock()
+
+
+class ObjectCache(object):
+    """LRU cache of object fields for a single schema"""
+
+    def __init__(self, schema, size, ttl):
+        self.schema = schema
+        self.size = size
+        self.ttl = ttl
+
+        self._lock = Lock()
+        self._entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, uuid):
+        """Returns cached fields of an object or None"""
+
+        with self._lock:
+            entry = self._entries.pop(uuid, None)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored, fields = entry
+
+            if self.ttl and time() - stored > self.ttl:
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            # Reinsert as most recently used
+            self._entries[uuid] = entry
+            self.hits += 1
+
+            return fields
+
+    def put(self, uuid, fields):
+        if self.size <= 0:
+            return
+
+        with self._lock:
+            self._entries.pop(uuid, None)
+            self._entries[uuid] = (time(), deepcopy(fields))
+
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, uuid):
+        with self._lock:
+            if self._entries.pop(uuid, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'limit': self.size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
+
+
+def get_cache(schema):
+    """Returns (and creates, if necessary) the cache of a schema"""
+
+    try:
+        return caches[schema]
+    except KeyError:
+        pass
+
+    with _caches_lock:
+        if schema not in caches:
+            settings = dict(cache_defaults)
+            settings.update(cache_settings.get(schema, {}))
+
+            caches[schema] = ObjectCache(schema, settings['size'],
+                                         settings['ttl'])
+
+        return caches[schema]
+
+
+def get_cached(schema, uuid):
+    """Looks up an object in the cache only, returns None on a miss"""
+
+    fields = get_cache(schema).get(uuid)
+
+    if fields is None:
+        return None
+
+    from hfos.database import objectmodels
+
+    # The fields are stored as found in the database, so no defaults are
+    # filled in. The model still copies and validates them on every hit.
+    return objectmodels[schema](fields, from_find=True)
+
+
+def get_cached_fields(schema, uuid):
+    """Looks up a copy of an object's plain fields in the cache only"""
+
+    fields = get_cache(schema).get(uuid)
+
+    if fields is None:
+        return None
+
+    return deepcopy(fields)
+
+
+def store(schema, obj):
+    """Puts a copy of a model object into its schema's cache"""
+
+    try:
+        uuid = obj._fields['uuid']
+    except (AttributeError, KeyError):
+        return
+
+    get_cache(schema).put(uuid, obj._fields)
+
+
+def get_object(schema, uuid):
+    """Read-through lookup of an object by uuid
+
+    Blocks on a cache miss, call it via the database worker pool from within
+    handlers.
+    """
+
+    obj = get_cached(schema, uuid)
+
+    if obj is None:
+        from hfos.database import objectmodels
+
+        obj = objectmodels[schema].find_one({'uuid': uuid})
+
+        if obj is not None:
+            hfoslog('Caching', schema, uuid, lvl=verbose, emitter='CACHE')
+            store(schema, obj)
+
+    return obj
+
+
+def get_count(schema, object_filter=None):
+    """Returns the (cached) number of objects matching a filter
+
+    Blocks on a cache miss, call it via the database worker pool from within
+    handlers.
+    """
+
+    if object_filter is None:
+        object_filter = {}
+
+    key = dumps(object_filter, sort_keys=True, default=str)
+
+    with _counts_lock:
+        entry = counts.get(schema, {}).get(key, None)
+
+    if entry is not None and time() - entry[0] <= count_ttl:
+        return entry[1]
+
+    from hfos.database import objectmodels
+
+    count = objectmodels[schema].count(object_filter)
+
+    with _counts_lock:
+        counts.setdefault(schema, {})[key] = (time(), count)
+
+    return count
+
+
+def get_fields(schema, uuid):
+    """Read-through lookup of an object's plain fields by uuid
+
+    Like get_object, but does not instantiate a model. Blocks on a cache
+    miss.
+    """
+
+    fields = get_cached_fields(schema, uuid)
+
+    if fields is None:
+        from hfos.database import objectmodels
+
+        fields = objectmodels[schema].collection().find_one({'uuid': uuid})
+
+        if fields is not None:
+            hfoslog('Caching', schema, uuid, lvl=verbose, emitter='CACHE')
+            get_cache(schema).put(uuid, fields)
+
+    return fields
+
+
+def invalidate(schema, uuid):
+    """Drops a cached object, e.g. after it was changed"""
+
+    if schema in caches:
+        caches[schema].invalidate(uuid)
+
+    if schema in counts:
+        with _counts_lock:
+            counts.pop(schema, None)
+
+
+def clear():
+    """Drops all cached objects"""
+
+    for cache in caches.values():
+        cache.clear()
+
+    with _counts_lock:
+        counts.clear()
+
+
+def cache_stats():
+    """Returns hit, miss and eviction statistics of all schema caches"""
+
+    return {schema: cache.stats() for schema, cache in caches.items()}
@@ -45,14 +45,17 @@ from circuits.web.controllers import Controller
 from hfos.events.system import hfosEvent, authorizedevent, anonymousevent
 from hfos.schemata.component import ComponentBaseConfigSchema, \
     ComponentConfigSchemaTemplate
-from hfos.logger import hfoslog, warn, critical, error, debug, verbose, hilight
+from hfos.logger import hfoslog, warn, critical, error, debug, verbose, \
+    hilight, info, verbosity, logfilter, DROP
 from circuits import Component
 from jsonschema import ValidationError
 from warmongo import model_factory
-from pymongo.errors import ServerSelectionTimeoutError
+from pymongo.errors import ServerSelectionTimeoutError, BulkWriteError
 from random import randint
 from uuid import uuid4
 from copy import deepcopy
+from threading import Lock
+import json
 import inspect
 import traceback
 from sys import exc_info
@@ -144,32 +147,119 @@ def handler(*names, **kwargs):
     return wrapper
 
 
+# Compiled configuration schemata and models by configprops signature
+_configmodels = {}
+
+# Component configurations by unique name, while they are prefetched at boot
+_prefetched = None
+
+# Default configurations waiting to be inserted in bulk
+_pending_defaults = []
+
+# Components may be instantiated concurrently at boot
+_names_lock = Lock()
+
+
+def get_config_model(configprops):
+    """Returns the configuration schema and model for a set of configprops,
+    building them only once per distinct set"""
+
+    signature = json.dumps(configprops, sort_keys=True, default=str)
+
+    try:
+        return _configmodels[signature]
+    except KeyError:
+        configschema = deepcopy(ComponentBaseConfigSchema)
+        configschema['schema']['properties'].update(configprops)
+
+        result = _configmodels[signature] = (
+            configschema, model_factory(configschema['schema'])
+        )
+        return result
+
+
+def prefetch_configs():
+    """Loads all component configurations with a single query
+
+    Until flush_configs is called, components read their configuration
+    from this prefetch and defer storing new default configurations.
+    """
+
+    global _prefetched
+
+    configschema, model = get_config_model({})
+
+    try:
+        documents = model.collection().find({})
+        _prefetched = {document['name']: document for document in documents
+                       if 'name' in document}
+    except ServerSelectionTimeoutError:  # pragma: no cover
+        hfoslog("No database access! Check if mongodb is running "
+                "correctly.", lvl=critical, emitter='CORE')
+        _prefetched = None
+        return
+
+    hfoslog("Prefetched", len(_prefetched), "component configurations",
+            lvl=debug, emitter='CORE')
+
+
+def flush_configs():
+    """Inserts all deferred default configurations at once and ends the
+    prefetch"""
+
+    global _prefetched
+
+    _prefetched = None
+
+    # Configurations saved in the meantime already have an ObjectId
+    documents = [config._fields for config in _pending_defaults
+                 if '_id' not in config._fields]
+    del _pending_defaults[:]
+
+    if len(documents) == 0:
+        return
+
+    configschema, model = get_config_model({})
+
+    try:
+        model.collection().insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        hfoslog("Could not store all default configurations:", e.details,
+                lvl=error, emitter='CORE')
+
+    hfoslog("Stored", len(documents), "default component configurations",
+            lvl=debug, emitter='CORE')
+
+
 class ConfigurableMeta(object):
     names = []
     configprops = {}
 
+    # Names of components, that have to be registered before this one
+    dependencies = []
+
     def __init__(self, uniquename=None, *args, **kwargs):
         self.uniquename = ""
 
-        if uniquename:
-            if uniquename not in self.names:
-                self.uniquename = uniquename
-                self.names.append(uniquename)
-            else:
-                hfoslog("Unique component added twice: ", uniquename,
-                        lvl=critical, emitter="CORE")
-        else:
-            while True:
-                uniquename = "%s%s" % (self.name, randint(0, 32768))
+        with _names_lock:
+            if uniquename:
                 if uniquename not in self.names:
                     self.uniquename = uniquename
                     self.names.append(uniquename)
+                else:
+                    hfoslog("Unique component added twice: ", uniquename,
+                            lvl=critical, emitter="CORE")
+            else:
+                while True:
+                    uniquename = "%s%s" % (self.name, randint(0, 32768))
+                    if uniquename not in self.names:
+                        self.uniquename = uniquename
+                        self.names.append(uniquename)
 
-                    break
-
-        self.configschema = deepcopy(ComponentBaseConfigSchema)
+                        break
 
-        self.configschema['schema']['properties'].update(self.configprops)
+        self.configschema, self.componentmodel = get_config_model(
+            self.configprops)
 
         # self.log("[UNIQUECOMPONENT] Config Schema: ", self.configschema,
         #         lvl=critical)
@@ -181,7 +271,6 @@ class ConfigurableMeta(object):
         # schemastore[self.uniquename] = {'schema': self.configschema,
         # 'form': self.configform}
 
-        self.componentmodel = model_factory(self.configschema['schema'])
         # self.log("Component model: ", lvl=critical)
         # pprint(self.componentmodel._schema)
 
@@ -190,7 +279,10 @@ class ConfigurableMeta(object):
             self.log("Creating initial default configuration.")
             try:
                 self._set_config()
-                self._write_config()
+                if _prefetched is not None and self.config:
+                    _pending_defaults.append(self.config)
+                else:
+                    self._write_config()
             except ValidationError as e:
                 self.log("Error during configuration reading: ", e, type(e),
                          exc=True)
@@ -208,8 +300,14 @@ class ConfigurableMeta(object):
 
     def _read_config(self):
         try:
-            self.config = self.componentmodel.find_one(
-                {'name': self.uniquename})
+            if _prefetched is not None:
+                document = _prefetched.pop(self.uniquename, None)
+                # Built like find_one does, without adding defaults
+                self.config = self.componentmodel(document, from_find=True) \
+                    if document is not None else None
+            else:
+                self.config = self.componentmodel.find_one(
+                    {'name': self.uniquename})
         except ServerSelectionTimeoutError:  # pragma: no cover
             self.log("No database access! Check if mongodb is running "
                      "correctly.", lvl=critical)
@@ -286,24 +384,48 @@ class ConfigurableMeta(object):
 
             # self.log("Fields:", self.config._fields, lvl=verbose)
 
+    def dbcall(self, function, *args, **kwargs):
+        """Runs a blocking database function on the database worker pool
+
+        Use inside a handler as::
+
+            result = yield self.dbcall(model.find_one, {'uuid': uuid})
+            obj, failure = result.value
+
+        The handler is resumed by circuits, once the call has completed.
+        """
+
+        from hfos.database import dbtask, dbworker_channel
+        return self.call(dbtask(function, *args, **kwargs), dbworker_channel)
+
     def log(self, *args, **kwargs):
-        func = inspect.currentframe().f_back.f_code
-        # Dump the message + the name of this function to the log.
+        # Filtered out records should cost nothing but this comparison
+        lvl = kwargs.get('lvl', info)
+        if lvl < verbosity['global']:
+            return
+
+        # Muted emitters are dropped before anything gets formatted
+        if logfilter.active and logfilter.check(self.uniquename, lvl) == DROP:
+            return
+
+        exception = kwargs.get('exc', False) is True
 
-        if 'exc' in kwargs and kwargs['exc'] is True:
+        if exception:
             exc_type, exc_obj, exc_tb = exc_info()
-            line_no = exc_tb.tb_lineno
-            # print('EXCEPTION DATA:', line_no, exc_type, exc_obj, exc_tb)
             args += traceback.extract_tb(exc_tb),
-        else:
-            line_no = func.co_firstlineno
 
-        sourceloc = "[%.10s@%s:%i]" % (
-            func.co_name,
-            func.co_filename,
-            line_no
-        )
-        hfoslog(sourceloc=sourceloc, emitter=self.uniquename, *args, **kwargs)
+        # Source locations are only printed at debug verbosity
+        if verbosity['global'] <= debug and 'sourceloc' not in kwargs:
+            func = inspect.currentframe().f_back.f_code
+            # Dump the message + the name of this function to the log.
+
+            kwargs['sourceloc'] = "[%.10s@%s:%i]" % (
+                func.co_name,
+                func.co_filename,
+                exc_tb.tb_lineno if exception else func.co_firstlineno
+            )
+
+        hfoslog(emitter=self.uniquename, *args, **kwargs)
 
 
 class ConfigurableController(ConfigurableMeta, Controller):
@@ -40,26 +40,165 @@ Schemastore and Objectstore builder functions.
 
 import sys
 import warmongo
+import warmongo.database
 import pymongo
+import pymongo.errors
 import operator
 from os import statvfs, walk
 from os.path import join, getsize, isfile, isdir, splitext
 # noinspection PyUnresolvedReferences
 from six.moves import \
     input  # noqa - Lazily loaded, may be marked as error, e.g. in IDEs
-from circuits import Timer, Event
+from circuits import Timer, Event, Worker, task
 from hfos.logger import hfoslog, debug, warn, critical, verbose
 from hfos.component import ConfigurableComponent, handler
+from hfos.debugger import cli_register_event
+from hfos.tools import std_table
+from hfos import cache as objectcache
 from jsonschema import ValidationError  # NOQA
-from pkg_resources import iter_entry_points, DistributionNotFound
+from hfos.manifest import manifest_entries, load_entry
 from pprint import pprint
 from random import choice
+from collections import namedtuple
+from itertools import islice
+from threading import Lock
+
+try:
+    from pymongo.monitoring import ConnectionPoolListener
+except ImportError:  # pragma: no cover
+    # Pool monitoring needs pymongo >= 3.9, counters stay empty otherwise
+    ConnectionPoolListener = None
 
 schemastore = None
 configschemastore = {}
 objectmodels = None
 collections = None
 
+dbhost = '127.0.0.1:27017'
+dbname = 'hfos'
+
+client = None
+pool_counter = None
+
+dbworker_channel = 'dbworkers'
+dbworker_size = 4
+
+client_defaults = {
+    'maxPoolSize': 20,
+    'minPoolSize': 0,
+    'connectTimeoutMS': 5000,
+    'serverSelectionTimeoutMS': 5000,
+    'socketTimeoutMS': None,
+    'w': 1
+}
+
+
+class PoolCounter(ConnectionPoolListener or object):
+    """Counts connection pool events of the shared database client"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.counters = {
+            'created': 0,
+            'closed': 0,
+            'checked_out': 0,
+            'checked_in': 0,
+            'checkout_failed': 0,
+            'cleared': 0
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        """Returns a snapshot of the pool counters"""
+
+        with self._lock:
+            result = dict(self.counters)
+
+        result['open'] = result['created'] - result['closed']
+        result['in_use'] = result['checked_out'] - result['checked_in']
+
+        return result
+
+    def pool_created(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._count('cleared')
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._count('created')
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._count('closed')
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._count('checkout_failed')
+
+    def connection_checked_out(self, event):
+        self._count('checked_out')
+
+    def connection_checked_in(self, event):
+        self._count('checked_in')
+
+
+def _split_address(address):
+    if ":" in address:
+        host, port = address.split(":")
+        return host, int(port)
+    else:
+        return address, 27017
+
+
+def get_client():
+    """Returns the shared, pooled database client
+
+    Requires a prior call to :func:`initialize`.
+    """
+
+    if client is None:
+        hfoslog("Database client requested before initialization!",
+                lvl=critical, emitter='DB')
+        raise RuntimeError("Database not initialized")
+
+    return client
+
+
+def get_database(database_name=None):
+    """Returns a handle of the configured (or given) database from the
+    shared client"""
+
+    if database_name is None:
+        database_name = dbname
+
+    return get_client()[database_name]
+
+
+def get_collection(collection_name):
+    """Returns a collection handle of the configured database"""
+
+    return get_database()[collection_name]
+
+
+def pool_stats():
+    """Returns the connection pool counters of the shared client"""
+
+    if pool_counter is None:
+        return {}
+
+    return pool_counter.stats()
+
 
 def makesalt():
     alphabet = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
@@ -81,9 +220,7 @@ def clear_all():
         hfoslog('Not deleting the database.')
         sys.exit(5)
 
-    # TODO: Accept argument for dbhost
-    client = pymongo.MongoClient(host="localhost", port=27017)
-    db = client["hfos"]
+    db = get_database()
 
     for col in db.collection_names(include_system_collections=False):
         hfoslog("Dropping collection ", col, lvl=warn, emitter='DB')
@@ -93,16 +230,15 @@ def clear_all():
 def _build_schemastore_new():
     available = {}
 
-    for schema_entrypoint in iter_entry_points(group='hfos.schemata',
-                                               name=None):
+    for entry in manifest_entries('hfos.schemata'):
         try:
-            hfoslog("Schemata found: ", schema_entrypoint.name, lvl=verbose,
+            hfoslog("Schemata found: ", entry['name'], lvl=verbose,
                     emitter='DB')
-            schema = schema_entrypoint.load()
-            available[schema_entrypoint.name] = schema
-        except (ImportError, DistributionNotFound) as e:
+            schema = load_entry(entry)
+            available[entry['name']] = schema
+        except (ImportError, AttributeError) as e:
             hfoslog("Problematic schema: ", e, type(e),
-                    schema_entrypoint.name, exc=True, lvl=warn,
+                    entry['name'], exc=True, lvl=warn,
                     emitter='SCHEMATA')
 
     hfoslog("Found", len(available), "schemata: ", sorted(available.keys()),
@@ -113,6 +249,25 @@ def _build_schemastore_new():
     return available
 
 
+def _cached_model(schemaname, model):
+    """Extends a model, so writes through it invalidate the object cache"""
+
+    class CachedModel(model):
+        def save(self, *args, **kwargs):
+            result = model.save(self, *args, **kwargs)
+            objectcache.invalidate(schemaname, self._fields.get('uuid'))
+            return result
+
+        def delete(self):
+            result = model.delete(self)
+            objectcache.invalidate(schemaname, self._fields.get('uuid'))
+            return result
+
+    CachedModel.__name__ = model.__name__
+
+    return CachedModel
+
+
 def _build_model_factories(store):
     result = {}
 
@@ -127,7 +282,9 @@ def _build_model_factories(store):
                     emitter='DB')
 
         try:
-            result[schemaname] = warmongo.model_factory(schema)
+            result[schemaname] = _cached_model(
+                schemaname, warmongo.model_factory(schema)
+            )
         except Exception as e:
             hfoslog("Could not create factory for schema ", e, type(e),
                     schemaname, schema,
@@ -139,8 +296,7 @@ def _build_model_factories(store):
 def _build_collections(store):
     result = {}
 
-    client = pymongo.MongoClient(host='localhost', port=27017)
-    db = client['hfos']
+    db = get_database()
 
     for schemaname in store:
 
@@ -161,27 +317,226 @@ def _build_collections(store):
     return result
 
 
-def initialize(address='127.0.0.1:27017', database_name='hfos'):
+def dbworker(workers=None):
+    """Creates the bounded thread pool that runs blocking database calls
+
+    Register it once in the component graph, components then use
+    :meth:`hfos.component.ConfigurableMeta.dbcall` to hand off queries.
+    """
+
+    if workers is None:
+        workers = dbworker_size
+
+    return Worker(process=False, workers=workers, channel=dbworker_channel)
+
+
+def _guarded_call(function, *args, **kwargs):
+    """Runs inside a database worker and never raises, so the waiting
+    handler always gets resumed"""
+
+    try:
+        return function(*args, **kwargs), None
+    except Exception as e:
+        hfoslog("Database worker call failed:", function, e, type(e),
+                lvl=warn, emitter='DB')
+        return None, e
+
+
+def dbtask(function, *args, **kwargs):
+    """Wraps a blocking database call into a worker task event
+
+    The task's value is a (result, exception) tuple.
+    """
+
+    return task(_guarded_call, function, *args, **kwargs)
+
+
+def find_all(model, *args, **kwargs):
+    """Materializes a model query, so the cursor is exhausted inside the
+    worker thread and not in the event loop"""
+
+    return [item for item in model.find(*args, **kwargs)]
+
+
+def find_raw(model, object_filter=None, projection=None, **kwargs):
+    """Materializes a read-only query as plain documents
+
+    Skips model instantiation and validation, use it only for results that
+    are transmitted as they are.
+    """
+
+    results = model.collection().find(object_filter, projection, **kwargs)
+
+    return [document for document in results]
+
+
+def find_chunk(results, size):
+    """Advances a (streamed) model query by up to size items"""
+
+    return [item for item in islice(results, size)]
+
+
+def _index_name(fields):
+    # Same naming scheme as MongoDB's default index names
+    return "_".join("%s_1" % field for field in fields)
+
+
+def declared_indices(schemaname):
+    """Returns the index declarations of a schema by index name"""
+
+    result = {}
+
+    try:
+        declarations = schemastore[schemaname]['schema'].get('indices', [])
+    except KeyError:
+        return result
+
+    for declaration in declarations:
+        result[_index_name(declaration['fields'])] = declaration
+
+    return result
+
+
+def ensure_indices(schemata=None, create=True):
+    """Creates missing indices declared in the schemata and reports on
+    unused or undeclared ones
+
+    :param schemata: Optional list of schema names to check (default: all)
+    :param create: Create missing indices, only report them otherwise
+    :return: Report dictionary by schema name with lists of created, missing,
+             failed, unused (no usage since server start) and undeclared
+             index names
+    """
+
+    report = {}
+
+    if schemata is None:
+        schemata = sorted(schemastore.keys())
+
+    for schemaname in schemata:
+        declared = declared_indices(schemaname)
+
+        try:
+            collection = objectmodels[schemaname].collection()
+            present = collection.index_information()
+        except Exception as e:
+            hfoslog("Cannot inspect indices of", schemaname, e, type(e),
+                    lvl=warn, emitter='DB')
+            continue
+
+        entry = {
+            'created': [],
+            'missing': [],
+            'failed': [],
+            'unused': [],
+            'undeclared': []
+        }
+
+        for name, declaration in declared.items():
+            if name in present:
+                continue
+
+            if not create:
+                entry['missing'].append(name)
+                continue
+
+            keys = [(field, pymongo.ASCENDING) for field in
+                    declaration['fields']]
+            try:
+                collection.create_index(keys, name=name, background=True,
+                                        unique=declaration['unique'])
+                entry['created'].append(name)
+                hfoslog("Created index", name, "for", schemaname,
+                        lvl=debug, emitter='DB')
+            except pymongo.errors.PyMongoError as e:
+                entry['failed'].append(name)
+                hfoslog("Could not create index", name, "for", schemaname,
+                        e, type(e), lvl=warn, emitter='DB')
+
+        for name in present:
+            if name != '_id_' and name not in declared:
+                entry['undeclared'].append(name)
+
+        try:
+            for stats in collection.aggregate([{'$indexStats': {}}]):
+                if stats['name'] != '_id_' and \
+                        stats['accesses']['ops'] == 0:
+                    entry['unused'].append(stats['name'])
+        except pymongo.errors.PyMongoError as e:
+            hfoslog("No index usage statistics available:", e, lvl=verbose,
+                    emitter='DB')
+
+        report[schemaname] = entry
+
+    return report
+
+
+def initialize(address='127.0.0.1:27017', database_name='hfos',
+               **client_options):
+    """Sets up the shared database client and builds the object stores
+
+    :param address: Database server address as host:port
+    :param database_name: Name of the database to use
+    :param client_options: Optional pool, timeout and write concern settings
+                           (maxPoolSize, minPoolSize, connectTimeoutMS,
+                           serverSelectionTimeoutMS, socketTimeoutMS, w),
+                           see :data:`client_defaults`
+    """
+
     global schemastore
     global objectmodels
     global collections
+    global client
+    global pool_counter
+    global dbhost
+    global dbname
 
     hfoslog("Testing database availability to ", address, lvl=debug,
             emitter='DB')
 
+    host, port = _split_address(address)
+
+    options = dict(client_defaults)
+    options.update({key: value for key, value in client_options.items()
+                    if value is not None})
+
+    if client is not None:
+        if (dbhost, dbname) == (address, database_name):
+            hfoslog("Database already initialized", lvl=debug, emitter='DB')
+            return
+
+        hfoslog("Reinitializing database access to", address,
+                database_name, lvl=warn, emitter='DB')
+        client.close()
+
+        # warmongo caches databases of the closed client, too
+        warmongo.database.connections.clear()
+        warmongo.database.databases.clear()
+        warmongo.database.default_database = None
+
+    if ConnectionPoolListener is not None:
+        pool_counter = PoolCounter()
+        options['event_listeners'] = [pool_counter]
+
     try:
-        client = pymongo.MongoClient(host=address.split(":")[0], port=int(
-            address.split(":")[1]) if ":" in address else 27017)
+        client = pymongo.MongoClient(host=host, port=port, **options)
         db = client[database_name]
         hfoslog("Database: ", db.command('buildinfo'), lvl=debug, emitter='DB')
     except Exception as e:
         hfoslog("No database available! Check if you have mongodb > 3.0 "
-                "installed and running as well as listening on port 27017 "
-                "of localhost. (Error: %s) -> EXIT" % e, lvl=critical,
+                "installed and running as well as listening on %s "
+                "(Error: %s) -> EXIT" % (address, e), lvl=critical,
                 emitter='DB')
         sys.exit(5)
 
-    warmongo.connect(database_name)
+    dbhost = address
+    dbname = database_name
+
+    objectcache.clear()
+
+    # Let warmongo reuse the shared client instead of opening its own pool
+    warmongo.database.connections[(host, port)] = client
+    warmongo.connect(database_name, host=host, port=port)
 
     schemastore = _build_schemastore_new()
     objectmodels = _build_model_factories(schemastore)
@@ -242,6 +597,11 @@ def profile(schemaname='sensordata', profiletype='pjs'):
 
 # profile(schemaname='sensordata', profiletype='warmongo')
 
+
+class cli_db_pool(Event):
+    pass
+
+
 class Maintenance(ConfigurableComponent):
     configprops = {
         'locations': {
@@ -301,9 +661,7 @@ class Maintenance(ConfigurableComponent):
         super(Maintenance, self).__init__("MAINTENANCE", *args, **kwargs)
         self.log("Maintenance started")
 
-        # TODO: Accept argument for dbhost
-        client = pymongo.MongoClient(host="localhost", port=27017)
-        self.db = client["hfos"]
+        self.db = get_database()
 
         self.collection_sizes = {}
         self.collection_total = 0
@@ -317,6 +675,20 @@ class Maintenance(ConfigurableComponent):
             Event.create('maintenance_check'), persist=True
         ).register(self)
 
+        self.fireEvent(cli_register_event('db_pool', cli_db_pool))
+
+    @handler('cli_db_pool')
+    def db_pool(self, *args):
+        Row = namedtuple('Row', ['Counter', 'Value'])
+        rows = [Row(key, str(value)) for key, value in
+                sorted(pool_stats().items())]
+
+        if len(rows) == 0:
+            self.log('No connection pool counters available.', lvl=warn)
+            return
+
+        self.log('Connection pool of', dbhost, dbname, '\n' + std_table(rows))
+
     @handler('maintenance_check')
     def maintenance_check(self, *args):
         self.log('Performing maintenance check')
@@ -37,13 +37,16 @@ from uuid import uuid4
 
 from circuits.core.events import Event
 from circuits.core.handlers import reprhandler
+from circuits.core.utils import findtype
 from circuits.io import stdin
 
 from hfos.component import ConfigurableComponent, handler
 from hfos.events.client import send
 from hfos.events.system import frontendbuildrequest, componentupdaterequest, \
     logtailrequest, debugrequest
-from hfos.logger import hfoslog, critical, warn, debug, verbose
+from hfos.logger import hfoslog, critical, warn, debug, verbose, mute, \
+    solo, set_filters
+from hfos.cache import cache_stats
 
 try:
     import objgraph
@@ -153,12 +156,25 @@ class HFDebugger(ConfigurableComponent):
                     pass
 
                 raise TestException
+            if event.action == "objectcache":
+                self.log("Object cache statistics:", cache_stats(),
+                         pretty=True, lvl=critical)
             if event.action == "heap":
                 self.log("Heap log:", self.heapy.heap(), lvl=critical)
             if event.action == "buildfrontend":
                 self.log("Sending frontend build command")
 
                 self.fireEvent(frontendbuildrequest(force=True), "setup")
+            if event.action == "profile":
+                from hfos.profiler import Profiler, profile_control
+
+                profiler = findtype(self.root, Profiler)
+                if profiler is None:
+                    self.log("Profiling needs the launcher's --profile "
+                             "option", lvl=warn)
+                else:
+                    self.fireEvent(profile_control(event.data),
+                                   profiler.channel)
             if event.action == "logtail":
                 self.fireEvent(logtailrequest(event.user, None, None,
                                               event.client), "logger")
@@ -168,6 +184,22 @@ class HFDebugger(ConfigurableComponent):
                      lvl=critical)
 
 
+class cli_mute(Event):
+    pass
+
+
+class cli_unmute(Event):
+    pass
+
+
+class cli_solo(Event):
+    pass
+
+
+class cli_unsolo(Event):
+    pass
+
+
 class CLI(ConfigurableComponent):
     """
     Command Line Interface support
@@ -178,7 +210,12 @@ class CLI(ConfigurableComponent):
     def __init__(self, *args):
         super(CLI, self).__init__("CLI", *args)
 
-        self.hooks = {}
+        self.hooks = {
+            'MUTE': cli_mute,
+            'UNMUTE': cli_unmute,
+            'SOLO': cli_solo,
+            'UNSOLO': cli_unsolo
+        }
 
         self.log("Started")
         stdin.register(self)
@@ -219,6 +256,48 @@ class CLI(ConfigurableComponent):
                 self.log("Sending backend reload event")
                 self.fireEvent(componentupdaterequest(force=False), "setup")
 
+    def _change_filters(self, rules, mute_rules, solo_rules):
+        try:
+            set_filters(mute_rules, solo_rules)
+        except KeyError as e:
+            self.log("Unknown log level in rules:", rules, e, lvl=warn)
+            return
+
+        self.log("Log filters - muted:", mute, "solo:", solo, lvl=warn)
+
+    @handler('cli_mute')
+    def mute_log(self, *args):
+        """Mutes log records, rules are message texts or emitter names
+        like @CM or @NAV*:warn (only mutes records below warn level)"""
+
+        rules = args[0] if len(args) > 0 else []
+        self._change_filters(rules, mute + rules, None)
+
+    @handler('cli_unmute')
+    def unmute_log(self, *args):
+        """Removes the given or all mute rules"""
+
+        rules = args[0] if len(args) > 0 else []
+        remaining = [rule for rule in mute if rule not in rules] if rules \
+            else []
+        self._change_filters(rules, remaining, None)
+
+    @handler('cli_solo')
+    def solo_log(self, *args):
+        """Only emits log records matching one of the solo rules"""
+
+        rules = args[0] if len(args) > 0 else []
+        self._change_filters(rules, None, solo + rules)
+
+    @handler('cli_unsolo')
+    def unsolo_log(self, *args):
+        """Removes the given or all solo rules"""
+
+        rules = args[0] if len(args) > 0 else []
+        remaining = [rule for rule in solo if rule not in rules] if rules \
+            else []
+        self._change_filters(rules, None, remaining)
+
     @handler('cli_register_event')
     def register_event(self, event):
         self.log('Registering event hook:', event.cmd, event.thing,
@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# HFOS - Hackerfleet Operating System
+# ===================================
+# Copyright (C) 2011-2017 Heiko 'riot' Weinen <riot@c-base.org> and others.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Heiko 'riot' Weinen"
+__license__ = "GPLv3"
+"""
+
+Module: Devices
+===============
+
+Shared inventory of serial port devices
+
+Finding usable serial ports means opening every candidate device node,
+which is slow and can block on misbehaving devices. The inventory probes
+all candidates in parallel and with a timeout, when the ports are asked
+for the first time, and caches the result. It is scanned again, once
+device nodes appear or disappear. That is watched with inotify on linux
+and detected by the modification time of the device directory elsewhere.
+
+
+"""
+
+import ctypes
+import ctypes.util
+import glob
+import os
+import struct
+import sys
+import threading
+
+from copy import deepcopy
+from fnmatch import fnmatchcase
+from time import time
+
+from six.moves.queue import Queue, Empty
+
+from hfos.logger import hfoslog, debug, verbose, warn
+
+try:
+    import serial
+except ImportError:
+    serial = None
+
+# inotify event masks for created, deleted and moved device nodes
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+
+
+def candidate_ports(devicedir='/dev'):
+    """Lists the device names, that may be serial ports
+
+    :raises EnvironmentError:
+        On unsupported or unknown platforms
+    """
+
+    if sys.platform.startswith('win'):
+        return ['COM%s' % (i + 1) for i in range(256)]
+    elif sys.platform.startswith('linux') or sys.platform.startswith('cygwin'):
+        # this excludes your current terminal "/dev/tty"
+        return glob.glob(os.path.join(devicedir, 'tty[A-Za-z]*'))
+    elif sys.platform.startswith('darwin'):
+        return glob.glob(os.path.join(devicedir, 'tty.*'))
+    else:
+        raise EnvironmentError('Unsupported platform')
+
+
+def probe_port(port):
+    """Checks if a serial port can be opened
+
+    Courtesy: Thomas ( http://stackoverflow.com/questions/12090503
+    /listing-available-com-ports-with-python )
+    """
+
+    try:
+        s = serial.Serial(port)
+        s.close()
+        return True
+    except (OSError, serial.SerialException) as e:
+        hfoslog('Could not open serial port:', port, e, type(e),
+                lvl=verbose, emitter='DEVICES')
+        return False
+
+
+def watch_directory(path, callback):
+    """Calls back with the names of nodes created in or removed from a
+    directory, as reported by inotify
+
+    :returns: The watching thread or None, if inotify is not available
+    """
+
+    if not sys.platform.startswith('linux'):
+        return None
+
+    library = ctypes.util.find_library('c')
+    if library is None:
+        return None
+
+    try:
+        libc = ctypes.CDLL(library, use_errno=True)
+        descriptor = libc.inotify_init()
+    except (OSError, AttributeError):
+        return None
+
+    if descriptor < 0:
+        return None
+
+    mask = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+    if libc.inotify_add_watch(descriptor, path.encode('utf-8'), mask) < 0:
+        os.close(descriptor)
+        return None
+
+    def watch():
+        while True:
+            try:
+                data = os.read(descriptor, 4096)
+            except OSError:
+                return
+
+            names = []
+            offset = 0
+            # struct inotify_event: wd, mask, cookie, len, name[len]
+            while offset + 16 <= len(data):
+                length = struct.unpack_from('iIII', data, offset)[3]
+                name = data[offset + 16:offset + 16 + length]
+                names.append(name.rstrip(b'\0').decode('utf-8', 'replace'))
+                offset += 16 + length
+
+            callback(names)
+
+    thread = threading.Thread(target=watch, name='hfos-devicewatcher')
+    thread.daemon = True
+    thread.start()
+
+    return thread
+
+
+class SerialInventory(object):
+    """Cached list of usable serial ports
+
+    :param timeout: Seconds to wait for all probes of a scan
+    :param workers: Number of ports probed at the same time
+    :param devicedir: Directory containing the device nodes
+    :param probe: Function checking if a port is usable
+    """
+
+    def __init__(self, timeout=2.0, workers=16, devicedir='/dev',
+                 probe=None):
+        self.timeout = timeout
+        self.workers = workers
+        self.devicedir = devicedir
+
+        if probe is None and serial is not None:
+            probe = probe_port
+        self.probe = probe
+
+        self.scans = 0
+
+        self._ports = None
+        self._stamp = None
+        self._watcher = None
+        self._changes = 0
+        self._scanned = 0
+        self._lock = threading.Lock()
+
+        # Ports with a probe still running, possibly left behind hanging
+        self._probing = set()
+        self._probing_lock = threading.Lock()
+
+    def ports(self):
+        """Returns the usable serial ports, scanning them if the device
+        nodes changed since the last scan"""
+
+        with self._lock:
+            if self._ports is None or self._stale():
+                self._ports = self._scan()
+
+            return list(self._ports)
+
+    def refresh(self, names=None):
+        """Drops the cached ports, if any of the given device nodes could
+        be a serial port, or unconditionally without names"""
+
+        if names is None or any(fnmatchcase(name, 'tty*') for name in names):
+            hfoslog('Device nodes changed:', names, lvl=debug,
+                    emitter='DEVICES')
+            self._changes += 1
+
+    def _stale(self):
+        if self._scanned != self._changes:
+            return True
+        if self._watcher is not None:
+            return False
+
+        try:
+            return os.stat(self.devicedir).st_mtime != self._stamp
+        except OSError:
+            return False
+
+    def _scan(self):
+        if self.probe is None:
+            hfoslog('No pyserial found, serial ports are unavailable',
+                    lvl=warn, emitter='DEVICES')
+            return []
+
+        # Changes during the scan have to trigger the next one
+        if self._watcher is None:
+            self._watcher = watch_directory(self.devicedir, self.refresh)
+        self._scanned = self._changes
+        try:
+            self._stamp = os.stat(self.devicedir).st_mtime
+        except OSError:
+            self._stamp = None
+
+        candidates = candidate_ports(self.devicedir)
+
+        # Hanging ports would get another thread on every scan
+        with self._probing_lock:
+            hanging = sorted(self._probing.intersection(candidates))
+            candidates = [port for port in candidates
+                          if port not in self._probing]
+            self._probing.update(candidates)
+
+        if len(hanging) > 0:
+            hfoslog('Serial ports still being probed:', hanging,
+                    lvl=debug, emitter='DEVICES')
+
+        pending = Queue()
+        for port in candidates:
+            pending.put(port)
+
+        found = []
+        probed = set()
+
+        def work():
+            while True:
+                try:
+                    port = pending.get_nowait()
+                except Empty:
+                    return
+
+                try:
+                    if self.probe(port):
+                        found.append(port)
+                finally:
+                    probed.add(port)
+                    with self._probing_lock:
+                        self._probing.discard(port)
+
+        start = time()
+        deadline = start + self.timeout
+
+        # Probes blocking on a misbehaving port are left behind
+        threads = []
+        for i in range(min(self.workers, len(candidates))):
+            thread = threading.Thread(target=work, name='hfos-portprobe')
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        for thread in threads:
+            thread.join(max(0, deadline - time()))
+
+        # Ports nobody started probing in time are left for the next scan
+        while True:
+            try:
+                port = pending.get_nowait()
+            except Empty:
+                break
+            with self._probing_lock:
+                self._probing.discard(port)
+
+        result = sorted(found)
+        unfinished = sorted(set(candidates).difference(probed))
+        if len(unfinished) > 0:
+            hfoslog('Serial ports not responding in time:', unfinished,
+                    lvl=warn, emitter='DEVICES')
+
+        self.scans += 1
+        hfoslog('Found serial ports:', result, 'in %.3fs' % (time() - start),
+                lvl=debug, emitter='DEVICES')
+
+        return result
+
+
+serial_inventory = SerialInventory()
+
+
+def serial_port_props(configprops, field='serialfile'):
+    """Returns a copy of configuration properties, offering the usable
+    serial ports as choices of a device field"""
+
+    ports = serial_inventory.ports()
+
+    result = deepcopy(configprops)
+    result[field]['enum'] = ports + ['']
+
+    if 'x-schema-form' in result[field]:
+        result[field]['x-schema-form']['titleMap'] = {
+            port: port for port in ports
+        }
+
+    return result
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# HFOS - Hackerfleet Operating System
+# ===================================
+# Copyright (C) 2011-2017 Heiko 'riot' Weinen <riot@c-base.org> and others.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Heiko 'riot' Weinen"
+__license__ = "GPLv3"
+"""
+
+Module: Dormant
+===============
+
+On demand activation of rarely used components (launcher's --lazy mode)
+
+A dormant component is represented by a small stand-in, which only knows
+the names of the client events the component offers, as stored in the
+manifest. The component is imported and instantiated, when a client
+addresses one of these events for the first time and is unloaded again,
+after it received no more events for a configurable time.
+
+Only components that are driven by client requests are suited for this,
+as they don't take part in startup events like 'started' or 'ready'.
+Idleness is measured by incoming requests only, so components streaming
+to subscribed clients (e.g. the camera) would be stopped mid stream.
+
+
+"""
+
+from copy import copy
+from time import time
+
+from circuits import BaseComponent, Event, Timer
+
+from hfos.component import handler
+from hfos.events.system import advertise_events
+from hfos.logger import hfoslog, debug, verbose, error
+from hfos.manifest import load_entry
+
+
+class idlecheck(Event):
+    """Checks if an activated dormant component has become idle"""
+    pass
+
+
+class DormantComponent(BaseComponent):
+    """Stand-in for a component, that is only instantiated on demand"""
+
+    def __init__(self, entry, timeout=600, *args, **kwargs):
+        super(DormantComponent, self).__init__(
+            channel='dormant-' + entry['name'], *args, **kwargs)
+
+        self.entry = entry
+        self.timeout = timeout
+
+        self.component = None
+        self.activations = 0
+        self.last_used = 0
+
+        advertise_events(entry['events'])
+
+        eventnames = [event['module'] + '.' + event['name'] for event in
+                      entry['events']]
+
+        def wake(self, event, *args, **kwargs):
+            self._wake(event)
+
+        # Only the events of the component reach the stand-in
+        self.addHandler(handler(*eventnames, channel='*', priority=100)(wake))
+
+        if timeout > 0:
+            self._timer = Timer(min(timeout, 60), idlecheck(), self.channel,
+                                persist=True).register(self)
+
+        hfoslog("Dormant component", entry['name'], "waiting for",
+                len(eventnames), "events", lvl=debug, emitter='DORMANT')
+
+    def _wake(self, event):
+        self.last_used = time()
+
+        if self.component is not None:
+            return
+
+        self._activate()
+
+        # The handlers of the new instance only take part in dispatches of
+        # events fired after its registration
+        if self.component is not None:
+            self.fire(copy(event), *event.channels)
+
+    def _activate(self):
+        hfoslog("Activating component", self.entry['name'],
+                emitter='DORMANT')
+
+        try:
+            self.component = load_entry(self.entry)().register(self.parent)
+            self.activations += 1
+        except Exception as e:
+            hfoslog("Could not activate component:", self.entry['name'], e,
+                    type(e), lvl=error, exc=True, emitter='DORMANT')
+
+    def deactivate(self):
+        """Unloads the component's instance, if it is running"""
+
+        if self.component is None:
+            return
+
+        hfoslog("Deactivating idle component", self.entry['name'],
+                emitter='DORMANT')
+
+        self.component.unregister()
+        self.component = None
+
+    @handler('idlecheck')
+    def idlecheck(self):
+        if self.component is None:
+            return
+
+        idle = time() - self.last_used
+        hfoslog("Component", self.entry['name'], "idle for", idle,
+                lvl=verbose, emitter='DORMANT')
+
+        if idle >= self.timeout:
+            self.deactivate()
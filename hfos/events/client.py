@@ -22,18 +22,29 @@ __author__ = "Heiko 'riot' Weinen"
 __license__ = "GPLv3"
 
 from circuits import Event
-from hfos.logger import hfoslog, warn, events
+from hfos.logger import hfoslog, warn, events, verbosity
+
+# These events are created for every message going to or coming from a
+# client, so their attributes are slotted and debug output is only built
+# when the events log level is enabled.
 
 
 class send(Event):
     """Send a packet to a known client by UUID"""
 
+    __slots__ = ['uuid', 'packet', 'username', 'sendtype', 'raw', 'fail_quiet',
+                 'coalesce', 'droppable']
+
     def __init__(self, uuid, packet, sendtype="client",
-                 raw=False, username=None, fail_quiet=False, *args):
+                 raw=False, username=None, fail_quiet=False, coalesce=None,
+                 droppable=False, *args):
         """
 
         :param uuid: Unique User ID of known connection
         :param packet: Data packet to transmit to client
+        :param coalesce: Key of packets superseding each other, only the
+                         newest one is kept in a client's outbound queue
+        :param droppable: Packet may be dropped for slow clients
         :param args: Further Args
         """
         super(send, self).__init__(*args)
@@ -46,15 +57,51 @@ class send(Event):
         self.sendtype = sendtype
         self.raw = raw
         self.fail_quiet = fail_quiet
+        self.coalesce = coalesce
+        self.droppable = droppable
+
+        if verbosity['global'] <= events:
+            hfoslog("[CM-EVENT] Send event generated:", uuid,
+                    str(packet)[:50], sendtype, lvl=events)
+
+
+class multicast(Event):
+    """Send the same packet to a list of known clients or users by UUID"""
+
+    __slots__ = ['recipients', 'packet', 'sendtype', 'raw', 'fail_quiet',
+                 'coalesce', 'droppable']
+
+    def __init__(self, recipients, packet, sendtype="client", raw=False,
+                 fail_quiet=False, coalesce=None, droppable=False, *args):
+        """
+
+        :param recipients: Unique IDs of known clients or users
+        :param packet: Data packet to transmit to all recipients
+        :param sendtype: Either "client" or "user"
+        :param coalesce: Key of packets superseding each other
+        :param droppable: Packet may be dropped for slow clients
+        :param args: Further Args
+        """
+        super(multicast, self).__init__(*args)
+
+        self.recipients = recipients
+        self.packet = packet
+        self.sendtype = sendtype
+        self.raw = raw
+        self.fail_quiet = fail_quiet
+        self.coalesce = coalesce
+        self.droppable = droppable
 
-        hfoslog("[CM-EVENT] Send event generated:", uuid, str(packet)[:50],
-                sendtype,
-                lvl=events)
+        if verbosity['global'] <= events:
+            hfoslog("[CM-EVENT] Multicast event generated:", len(recipients),
+                    str(packet)[:50], sendtype, lvl=events)
 
 
 class broadcast(Event):
     """Send a packet to a known client by UUID"""
 
+    __slots__ = ['broadcasttype', 'content']
+
     def __init__(self, broadcasttype, content, *args):
         """
 
@@ -66,8 +113,9 @@ class broadcast(Event):
         self.broadcasttype = broadcasttype
         self.content = content
 
-        hfoslog("[CM-EVENT] Broadcast event generated:", broadcasttype,
-                content, lvl=events)
+        if verbosity['global'] <= events:
+            hfoslog("[CM-EVENT] Broadcast event generated:", broadcasttype,
+                    str(content)[:50], lvl=events)
 
 
 class clientdisconnect(Event):
@@ -81,13 +129,16 @@ class clientdisconnect(Event):
 
     """
 
+    __slots__ = ['clientuuid', 'useruuid']
+
     def __init__(self, clientuuid, useruuid=None, *args):
         super(clientdisconnect, self).__init__(*args)
         self.clientuuid = clientuuid
         self.useruuid = useruuid
 
-        hfoslog("[CM-EVENT] Client disconnect event generated:", clientuuid,
-                useruuid, lvl=events)
+        if verbosity['global'] <= events:
+            hfoslog("[CM-EVENT] Client disconnect event generated:",
+                    clientuuid, useruuid, lvl=events)
 
 
 class userlogin(Event):
@@ -101,13 +152,16 @@ class userlogin(Event):
 
     """
 
+    __slots__ = ['clientuuid', 'useruuid']
+
     def __init__(self, clientuuid, useruuid, *args):
         super(userlogin, self).__init__(*args)
         self.clientuuid = clientuuid
         self.useruuid = useruuid
 
-        hfoslog("[CM-EVENT] User login event generated:", clientuuid, useruuid,
-                lvl=events)
+        if verbosity['global'] <= events:
+            hfoslog("[CM-EVENT] User login event generated:", clientuuid,
+                    useruuid, lvl=events)
 
 
 class userlogout(Event):
@@ -121,17 +175,23 @@ class userlogout(Event):
 
     """
 
+    __slots__ = ['useruuid']
+
     def __init__(self, useruuid, *args):
         super(userlogout, self).__init__(*args)
         self.useruuid = useruuid
 
-        hfoslog("[CM-EVENT] User logout event generated:", useruuid,
-                lvl=events)
+        if verbosity['global'] <= events:
+            hfoslog("[CM-EVENT] User logout event generated:", useruuid,
+                    lvl=events)
 
 
 class authenticationrequest(Event):
     """A client wants to authenticate a client connection"""
 
+    __slots__ = ['username', 'password', 'sock', 'clientuuid',
+                 'requestedclientuuid', 'auto']
+
     def __init__(self, username, password, clientuuid, requestedclientuuid,
                  sock, auto, *args):
         """
@@ -155,6 +215,8 @@ class authenticationrequest(Event):
 class authentication(Event):
     """Authentication has been granted to a client"""
 
+    __slots__ = ['username', 'userdata', 'clientuuid', 'useruuid', 'sock']
+
     def __init__(self, username, userdata, clientuuid, useruuid, sock, *args):
         """
 
@@ -172,5 +234,6 @@ class authentication(Event):
         self.useruuid = useruuid
         self.sock = sock
 
-        hfoslog("[AUTH-EVENT] Authentication granted:", self.__dict__,
-                lvl=events)
+        if verbosity['global'] <= events:
+            hfoslog("[AUTH-EVENT] Authentication granted:", username,
+                    clientuuid, useruuid, lvl=events)
@@ -34,7 +34,7 @@ Major HFOS event declarations
 
 from circuits.core import Event
 
-from hfos.logger import hfoslog, critical, events
+from hfos.logger import hfoslog, critical, events, verbosity
 from hfos.ui.clientobjects import User
 from hfos.events.system import authorizedevent
 
@@ -51,8 +51,9 @@ class objectevent(Event):
         self.schema = schema
         self.client = client
 
-        hfoslog("Object event created: ", self.__doc__,
-                self.__dict__, lvl=events, emitter="OBJECT-EVENT")
+        if verbosity['global'] <= events:
+            hfoslog("Object event created: ", self.__doc__,
+                    self.__dict__, lvl=events, emitter="OBJECT-EVENT")
 
 
 class objectchange(objectevent):
@@ -32,13 +32,16 @@ Major HFOS event declarations
 
 """
 
+import inspect
+
 from circuits.core import Event
 
-from hfos.logger import hfoslog, critical, events
+from hfos.logger import hfoslog, critical, events, verbosity
 from hfos.ui.clientobjects import User
 
 AuthorizedEvents = {}
 AnonymousEvents = {}
+DormantEvents = {}
 
 
 def get_user_events():
@@ -68,6 +71,15 @@ def populate_user_events():
                     if name.startswith('hfos'):
 
                         subclasses_set.add(child)
+
+                        # Stand-ins only fill in for events, whose module
+                        # has not been imported
+                        known = subclasses.get(child.__module__, {}).get(
+                            child.__name__, None)
+                        if known is not None and child.dormant:
+                            work.append(child)
+                            continue
+
                         event = {
                             'event': child,
                             'name': name,
@@ -96,7 +108,13 @@ def populate_user_events():
 
 
 class hfosEvent(Event):
-    pass
+    # Set on stand-in classes for events of not yet instantiated components
+    dormant = False
+
+
+# Full event names (module.class) by event class, as building them for
+# every single request adds up
+_realnames = {}
 
 
 class anonymousevent(hfosEvent):
@@ -113,17 +131,22 @@ class anonymousevent(hfosEvent):
         :return:
         """
 
-        self.name = self.__module__ + '.' + self.__class__.__name__
+        self.name = self.realname()
         super(anonymousevent, self).__init__(*args)
         self.action = action
         self.data = data
         self.client = client
-        hfoslog('AnonymousEvent created:', self.name, lvl=events)
+        if verbosity['global'] <= events:
+            hfoslog('AnonymousEvent created:', self.name, lvl=events)
 
     @classmethod
     def realname(cls):
         # For circuits manager to enable module/event namespaces
-        return cls.__module__ + '.' + cls.__name__
+        try:
+            return _realnames[cls]
+        except KeyError:
+            name = _realnames[cls] = cls.__module__ + '.' + cls.__name__
+            return name
 
 
 class authorizedevent(hfosEvent):
@@ -143,18 +166,73 @@ class authorizedevent(hfosEvent):
 
         assert isinstance(user, User)
 
-        self.name = self.__module__ + '.' + self.__class__.__name__
+        self.name = self.realname()
         super(authorizedevent, self).__init__(*args)
         self.user = user
         self.action = action
         self.data = data
         self.client = client
-        hfoslog('AuthorizedEvent created:', self.name, lvl=events)
+        if verbosity['global'] <= events:
+            hfoslog('AuthorizedEvent created:', self.name, lvl=events)
 
     @classmethod
     def realname(cls):
         # For circuits manager to enable module/event namespaces
-        return cls.__module__ + '.' + cls.__name__
+        try:
+            return _realnames[cls]
+        except KeyError:
+            name = _realnames[cls] = cls.__module__ + '.' + cls.__name__
+            return name
+
+
+def describe_events(module):
+    """Lists the authorized and anonymous events a module defines, so they
+    can be advertised without importing it"""
+
+    result = []
+
+    for item in vars(module).values():
+        if not inspect.isclass(item) or item.__module__ != module.__name__:
+            continue
+
+        if issubclass(item, authorizedevent):
+            authorized = True
+        elif issubclass(item, anonymousevent):
+            authorized = False
+        else:
+            continue
+
+        result.append({
+            'name': item.__name__,
+            'module': item.__module__,
+            'doc': item.__doc__,
+            'authorized': authorized
+        })
+
+    return result
+
+
+def advertise_events(descriptions):
+    """Creates stand-in classes for described events of dormant components
+
+    The stand-ins carry the full name of the original events, so once the
+    component is instantiated, its handlers receive them.
+    """
+
+    for description in descriptions:
+        name = description['module'] + '.' + description['name']
+        if name in DormantEvents:
+            continue
+
+        base = authorizedevent if description['authorized'] else \
+            anonymousevent
+
+        # Subclasses are only weakly referenced by their base class
+        DormantEvents[name] = type(str(description['name']), (base,), {
+            '__module__': description['module'],
+            '__doc__': description['doc'],
+            'dormant': True
+        })
 
 
 # Authenticator Events
@@ -170,8 +248,9 @@ class profilerequest(authorizedevent):
         """
         super(profilerequest, self).__init__(*args)
 
-        hfoslog("Profile update request: ", self.__dict__,
-                lvl=events, emitter="PROFILE-EVENT")
+        if verbosity['global'] <= events:
+            hfoslog("Profile update request: ", self.__dict__,
+                    lvl=events, emitter="PROFILE-EVENT")
 
 
 # Frontend assembly events
@@ -49,19 +49,29 @@ from hfos.component import handler
 from circuits import reprhandler, Event
 
 from hfos.ui.builder import install_frontend
+from hfos.ui.deflate import DeflateWebSocketsDispatcher
 # from hfos.schemata.component import ComponentBaseConfigSchema
-from hfos.database import initialize  # , schemastore
-from hfos.component import ConfigurableComponent
+from hfos.database import initialize, dbworker, \
+    ensure_indices  # , schemastore
+from hfos.component import ConfigurableComponent, prefetch_configs, \
+    flush_configs
 from hfos.logger import hfoslog, verbose, debug, warn, error, critical, \
-    setup_root, verbosity, hilight, set_logfile
+    setup_root, verbosity, hilight, set_logfile, start_logfile, stop_logfile
 from hfos.events.system import populate_user_events
+from hfos.manifest import manifest_entries, component_groups, load_entry
+from hfos.dormant import DormantComponent
+from hfos.tools import std_table
 
 import click
+import atexit
 import sys
 import pwd
 import grp
 import os
 
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+from time import time
 from pprint import pprint
 
 
@@ -69,6 +79,11 @@ class ready(Event):
     pass
 
 
+class ensureindices(Event):
+    """Creates the missing indices declared in the schemata"""
+    pass
+
+
 def drop_privileges(uid_name='hfos', gid_name='hfos'):
     if os.getuid() != 0:
         hfoslog("Not root, cannot drop privileges. Probably opening "
@@ -90,6 +105,45 @@ def drop_privileges(uid_name='hfos', gid_name='hfos'):
     # old_umask = os.umask(22)
 
 
+def startup_order(dependencies):
+    """Orders component names, so that every component comes after the
+    components it depends on
+
+    :param dependencies: Lists of component names by component name
+    """
+
+    remaining = {
+        name: set(depends).intersection(dependencies).difference([name])
+        for name, depends in dependencies.items()
+    }
+
+    for name, depends in dependencies.items():
+        missing = set(depends).difference(dependencies)
+        if len(missing) > 0:
+            hfoslog("Component", name, "depends on components, that are "
+                    "not started:", sorted(missing), lvl=debug,
+                    emitter='CORE')
+
+    order = []
+    while len(remaining) > 0:
+        ready = sorted(name for name, depends in remaining.items()
+                       if len(depends) == 0)
+
+        if len(ready) == 0:
+            hfoslog("Circular component dependencies:", sorted(remaining),
+                    lvl=warn, emitter='CORE')
+            ready = sorted(remaining)
+
+        for name in ready:
+            del remaining[name]
+            for depends in remaining.values():
+                depends.discard(name)
+
+        order.extend(ready)
+
+    return order
+
+
 class Core(ConfigurableComponent):
     """HFOS Core Backend Application"""
     # TODO: Move most of this stuff over to a new FrontendBuilder
@@ -119,6 +173,40 @@ class Core(ConfigurableComponent):
             'title': 'Frontend enabled',
             'description': 'Option to toggle frontend activation',
             'default': True
+        },
+        'compression': {
+            'type': 'boolean',
+            'title': 'Websocket compression',
+            'description': 'Offer permessage-deflate compression to clients',
+            'default': True
+        },
+        'compressionwindowbits': {
+            'type': 'integer',
+            'title': 'Compression window bits',
+            'description': 'Size of the compression window (9-15), smaller '
+                           'windows use less memory per client',
+            'default': 15
+        },
+        'compressionminsize': {
+            'type': 'integer',
+            'title': 'Minimum compressed size',
+            'description': 'Messages smaller than this are sent uncompressed',
+            'default': 256
+        },
+        'lazycomponents': {
+            'type': 'array',
+            'title': 'On demand components',
+            'description': 'Components only started, when a client uses '
+                           'them (when launched with --lazy)',
+            'default': ['gdal', 'library'],
+            'items': {'type': 'string'}
+        },
+        'lazytimeout': {
+            'type': 'integer',
+            'title': 'Idle timeout',
+            'description': 'Seconds without client requests, after which on '
+                           'demand components are stopped (0 to keep them)',
+            'default': 600
         }
     }
 
@@ -129,6 +217,8 @@ class Core(ConfigurableComponent):
         self.insecure = args['insecure']
         self.quiet = args['quiet']
         self.development = args['dev']
+        self.lazy = args.get('lazy', False)
+        self.startupworkers = args.get('startupworkers', 8)
 
         self.host = args['host']
         self.port = args['port']
@@ -145,12 +235,16 @@ class Core(ConfigurableComponent):
 
         self.loadable_components = {}
         self.runningcomponents = {}
+        self.dormantcomponents = {}
+        self.boottimes = {}
 
         self.frontendrunning = False
 
         self.static = None
         self.websocket = None
 
+        self.dbworker = dbworker(args.get('dbworkers', None)).register(self)
+
         self.component_blacklist = [  # 'camera',
             # 'logger',
             'debugger',
@@ -241,66 +335,19 @@ class Core(ConfigurableComponent):
         self.log("Updating components")
         components = {}
 
-        if True:  # try:
-
-            from pkg_resources import iter_entry_points
-
-            entry_point_tuple = (
-                iter_entry_points(group='hfos.base', name=None),
-                iter_entry_points(group='hfos.sails', name=None),
-                iter_entry_points(group='hfos.components', name=None)
-            )
-
-            for iterator in entry_point_tuple:
-                for entry_point in iterator:
-                    try:
-                        name = entry_point.name
-                        location = entry_point.dist.location
-                        loaded = entry_point.load()
-
-                        self.log("Entry point: ", entry_point,
-                                 name,
-                                 entry_point.resolve(), lvl=verbose)
-
-                        self.log("Loaded: ", loaded, lvl=verbose)
-                        comp = {
-                            'location': location,
-                            'version': str(entry_point.dist.parsed_version),
-                            'description': loaded.__doc__
-                        }
-
-                        components[name] = comp
-                        self.loadable_components[name] = loaded
-
-                        self.log("Loaded component:", comp, lvl=verbose)
-
-                    except Exception as e:
-                        self.log("Could not inspect entrypoint: ", e,
-                                 type(e), entry_point, iterator, lvl=error,
-                                 exc=True)
-
-                        # for name in components.keys():
-                        #     try:
-                        #         self.log(self.loadable_components[name])
-                        #         configobject = {
-                        #             'type': 'object',
-                        #             'properties':
-                        # self.loadable_components[name].configprops
-                        #         }
-                        #         ComponentBaseConfigSchema['schema'][
-                        # 'properties'][
-                        #             'settings'][
-                        #             'oneOf'].append(configobject)
-                        #     except (KeyError, AttributeError) as e:
-                        #         self.log('Problematic configuration
-                        # properties in '
-                        #                  'component ', name, exc=True)
-                        #
-                        # schemastore['component'] = ComponentBaseConfigSchema
-
-        # except Exception as e:
-        #    self.log("Error: ", e, type(e), lvl=error, exc=True)
-        #    return
+        # Components are only imported when they are instantiated
+        for entry in manifest_entries(*component_groups):
+            name = entry['name']
+            comp = {
+                'location': entry['location'],
+                'version': entry['version'],
+                'description': entry.get('description', None)
+            }
+
+            components[name] = comp
+            self.loadable_components[name] = entry
+
+            self.log("Found component:", comp, lvl=verbose)
 
         self.log("Checking component frontend bits in ", self.frontendroot,
                  lvl=verbose)
@@ -317,6 +364,7 @@ class Core(ConfigurableComponent):
         if forcereload:
             self.log("Restarting all components.", lvl=warn)
             self._instantiate_components(clear=True)
+            populate_user_events()
 
     def _start_frontend(self, restart=False):
         self.log(self.config, self.config.frontendenabled, lvl=verbose)
@@ -328,7 +376,15 @@ class Core(ConfigurableComponent):
             self.static = Static("/",
                                  docroot=self.config.frontendtarget).register(
                 self)
-            self.websocket = WebSocketsDispatcher("/websocket").register(self)
+            if self.config.compression:
+                self.websocket = DeflateWebSocketsDispatcher(
+                    "/websocket",
+                    window_bits=self.config.compressionwindowbits,
+                    min_size=self.config.compressionminsize
+                ).register(self)
+            else:
+                self.websocket = WebSocketsDispatcher("/websocket").register(
+                    self)
             self.frontendrunning = True
 
     def _instantiate_components(self, clear=True):
@@ -339,42 +395,170 @@ class Core(ConfigurableComponent):
                 del comp
             self.runningcomponents = {}
 
+            for dormant in self.dormantcomponents.values():
+                dormant.deactivate()
+                dormant.unregister()
+            self.dormantcomponents = {}
+
         self.log('Not running blacklisted components: ',
                  self.component_blacklist,
                  lvl=debug)
 
+        lazy = self.config.lazycomponents if self.lazy else []
+
         running = set(self.loadable_components.keys()).difference(
             self.component_blacklist)
-        self.log('Starting components: ', sorted(running))
+        self.log('Starting components: ', sorted(running.difference(lazy)))
+
+        start = time()
+
+        classes = {}
         for name, componentdata in self.loadable_components.items():
             if name in self.component_blacklist:
                 continue
+            if name in lazy:
+                if componentdata.get('events', None):
+                    self._add_dormant_component(name, componentdata)
+                    continue
+
+                self.log("Component offers no client events, it cannot be "
+                         "started on demand:", name, lvl=warn)
+            if name in self.runningcomponents:
+                self.log("Component already running: ", name, lvl=warn)
+                continue
+            try:
+                classes[name] = load_entry(componentdata)
+            except Exception as e:
+                self.log("Could not load component: ", name, e, type(e),
+                         lvl=error, exc=True)
+
+        # All component configurations are read with one query, defaults
+        # are stored in bulk, once all components have been instantiated
+        prefetch_configs()
+        try:
+            instances = self._construct_components(classes)
+        finally:
+            flush_configs()
+
+        order = startup_order({
+            name: getattr(cls, 'dependencies', []) for name, cls in
+            classes.items()
+        })
+
+        for name in order:
+            if instances.get(name, None) is None:
+                continue
+
             self.log("Running component: ", name, lvl=debug)
+            registration = time()
             try:
-                if name in self.runningcomponents:
-                    self.log("Component already running: ", name,
-                             lvl=warn)
-                else:
-                    runningcomponent = componentdata().register(self)
-                    self.runningcomponents[name] = runningcomponent
+                self.runningcomponents[name] = instances[name].register(self)
             except Exception as e:
                 self.log("Could not register component: ", name, e,
                          type(e), lvl=error, exc=True)
+            self.boottimes[name]['register'] = time() - registration
+
+        self._report_boottimes(order, time() - start)
+
+    def _construct_components(self, classes):
+        """Instantiates components on a thread pool, as most of them wait
+        for the database or probe devices in their constructors"""
+
+        def construct(name):
+            construction = time()
+            try:
+                instance = classes[name]()
+            except Exception as e:
+                self.log("Could not instantiate component: ", name, e,
+                         type(e), lvl=error, exc=True)
+                instance = None
+
+            return name, instance, time() - construction
+
+        workers = min(self.startupworkers, len(classes))
+        if workers > 1:
+            pool = ThreadPool(workers)
+            try:
+                results = pool.map(construct, sorted(classes))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [construct(name) for name in sorted(classes)]
+
+        instances = {}
+        for name, instance, duration in results:
+            instances[name] = instance
+            self.boottimes[name] = {'init': duration, 'register': 0}
+
+        return instances
+
+    def _report_boottimes(self, order, duration):
+        Row = namedtuple('Row', ['Component', 'Init', 'Register'])
+
+        rows = []
+        total = 0
+        for name in order:
+            if name not in self.boottimes:
+                continue
+
+            times = self.boottimes[name]
+            total += times['init'] + times['register']
+            rows.append(Row(name, "%.3f" % times['init'],
+                            "%.3f" % times['register']))
+
+        if len(rows) > 0:
+            self.log("Component boot times (s):\n" + std_table(rows),
+                     lvl=debug)
+        self.log("Started", len(rows), "components in %.3fs, %.3fs "
+                 "sequentially" % (duration, total))
+
+    def _add_dormant_component(self, name, componentdata):
+        if name in self.dormantcomponents:
+            self.log("Component already dormant: ", name, lvl=warn)
+            return
+
+        self.log("Component will be started on demand:", name, lvl=debug)
+        self.dormantcomponents[name] = DormantComponent(
+            componentdata, self.config.lazytimeout).register(self)
 
     def started(self, component):
         """Sets up the application after startup."""
         self.log("Running.")
         self.log("Started event origin: ", component, lvl=verbose)
+
+        # Components are imported by their instantiation, dormant ones
+        # advertise their events without that
+        self._instantiate_components()
         populate_user_events()
 
         from hfos.events.system import AuthorizedEvents
         self.log(len(AuthorizedEvents), "authorized event sources:",
                  list(AuthorizedEvents.keys()), lvl=hilight)
 
-        self._instantiate_components()
         self._start_frontend()
         self.fire(ready(), "hfosweb")
 
+        # Index builds on large collections would hold up the startup
+        self.fire(ensureindices())
+
+    @handler('ensureindices')
+    def create_indices(self, *args):
+        """Creates missing indices on the database worker pool"""
+
+        result = yield self.dbcall(ensure_indices)
+        report, failure = result.value
+
+        if failure is not None:
+            self.log("Could not check indices:", failure, lvl=warn)
+            return
+
+        for schemaname, entry in report.items():
+            if entry['created'] or entry['failed']:
+                self.log("Indices of", schemaname, "created:",
+                         entry['created'], "failed:", entry['failed'],
+                         lvl=warn)
+
 
 def construct_graph(args):
     """Preliminary HFOS application Launcher"""
@@ -391,6 +575,11 @@ def construct_graph(args):
                                  "stream_success", "stream_complete",
                                  "stream"])
 
+    if args['profile']:
+        from hfos.profiler import Profiler
+        hfoslog("Starting profiler", lvl=warn, emitter='GRAPH')
+        Profiler(args['profileinterval'], args['profilereport']).register(app)
+
     hfoslog("Beginning graph assembly.", emitter='GRAPH')
 
     if args['drawgraph']:
@@ -417,7 +606,22 @@ def construct_graph(args):
               type=str, default=None)
 @click.option("--dbhost", help="Define hostname for database server",
               type=str, default='127.0.0.1:27017')
+@click.option("--dbname", help="Define name of database",
+              type=str, default='hfos')
+@click.option("--dbpoolsize", help="Maximum size of the database connection "
+                                   "pool", type=int, default=20)
+@click.option("--dbtimeout", help="Database server selection and connect "
+                                  "timeout (ms)", type=int, default=5000)
+@click.option("--dbwriteconcern", help="Database write concern (number of "
+                                       "acknowledging nodes)",
+              type=int, default=1)
+@click.option("--dbworkers", help="Number of threads for non-blocking "
+                                  "database access", type=int, default=4)
 @click.option("--profile", help="Enable profiler", is_flag=True)
+@click.option("--profileinterval", help="Seconds between profile reports",
+              type=int, default=60)
+@click.option("--profilereport", help="Profile report path",
+              default='/tmp/hfos_profile.txt')
 @click.option("--opengui", help="Launch webbrowser for GUI inspection after "
                                 "startup", is_flag=True)
 @click.option("--drawgraph", help="Draw a snapshot of the component graph "
@@ -430,15 +634,33 @@ def construct_graph(args):
 @click.option("--logfile", help="Logfile path",
               default='/tmp/hfos.log')
 @click.option("--dolog", help="Write to logfile", is_flag=True)
+@click.option("--logrotatesize", help="Rotate logfile after this many bytes "
+                                      "(0 to disable)", type=int,
+              default=10485760)
+@click.option("--logrotateinterval", help="Rotate logfile after this many "
+                                          "seconds (0 to disable)", type=int,
+              default=0)
+@click.option("--logretention", help="Number of rotated logfiles to keep",
+              type=int, default=5)
 @click.option("--debug", help="Run circuits debugger", is_flag=True)
 @click.option("--dev", help="Run development server", is_flag=True)
 @click.option("--insecure", help="Keep privileges - INSECURE", is_flag=True)
+@click.option("--lazy", help="Start rarely used components only on demand",
+              is_flag=True)
+@click.option("--startupworkers", help="Number of threads instantiating "
+                                       "components at boot (1 to disable)",
+              type=int, default=8)
 @click.option("--norun", help="Only assemble system, do not run", is_flag=True)
 def launch(run=True, **args):
     verbosity['console'] = args['log'] if not args['quiet'] else 100
     verbosity['global'] = min(args['log'], args['logfileverbosity'])
     verbosity['file'] = args['logfileverbosity'] if args['dolog'] else 100
     set_logfile(args['logfile'])
+    if args['dolog']:
+        start_logfile(rotate_size=args['logrotatesize'],
+                      rotate_interval=args['logrotateinterval'],
+                      retention=args['logretention'])
+        atexit.register(stop_logfile)
     print(args['dev'])
 
     hfoslog("Running with Python", sys.version.replace("\n", ""),
@@ -449,7 +671,11 @@ def launch(run=True, **args):
                 lvl=critical, emitter='CORE')
 
     hfoslog("Initializing database access", emitter='CORE')
-    initialize(args['dbhost'])
+    initialize(args['dbhost'], args['dbname'],
+               maxPoolSize=args['dbpoolsize'],
+               connectTimeoutMS=args['dbtimeout'],
+               serverSelectionTimeoutMS=args['dbtimeout'],
+               w=args['dbwriteconcern'])
 
     server = construct_graph(args)
     if run and not args['norun']:
@@ -28,6 +28,12 @@ Module: Logger
 HFOS own logger to avoid namespace clashes etc. Comes with some fancy
 functions.
 
+Log files are written by a LogFileWriter in the background, once one
+has been started with start_logfile.
+
+The last emitted records are kept as LogRecords in the records ring buffer,
+from where the syslog component stores and distributes them.
+
 Log Levels
 ----------
 
@@ -51,9 +57,17 @@ import pprint
 
 import time
 import sys
+import os
+import re
 import inspect
+import threading
 import six
 
+from six.moves.queue import Queue, Full, Empty
+from collections import deque
+from fnmatch import fnmatchcase
+from uuid import uuid4
+
 # import os
 
 root = None
@@ -103,7 +117,86 @@ color = True  # TODO: Make this switchable via args
 mute = []
 solo = []
 
-LiveLog = []
+
+class RingBuffer(object):
+    """Thread safe fixed size buffer, dropping its oldest items when full
+
+    Every appended item gets a sequence number, so readers can fetch
+    everything that has been added since their last visit.
+    """
+
+    def __init__(self, size):
+        super(RingBuffer, self).__init__()
+
+        self._items = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.sequence = 0
+
+    def append(self, item):
+        with self._lock:
+            self._items.append(item)
+            self.sequence += 1
+
+    def since(self, sequence):
+        """Returns the items added after the given sequence number (as far
+        as they are still buffered) and the current sequence number"""
+
+        with self._lock:
+            amount = min(self.sequence - sequence, len(self._items))
+            items = list(self._items)[len(self._items) - amount:] \
+                if amount > 0 else []
+            return items, self.sequence
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._items))
+
+    def __getitem__(self, index):
+        with self._lock:
+            return list(self._items)[index]
+
+    def __repr__(self):
+        # Renders like the plain list the live log used to be
+        with self._lock:
+            return repr(list(self._items))
+
+    __str__ = __repr__
+
+
+class LogRecord(object):
+    """Structured log record as stored in the logmessage collection"""
+
+    __slots__ = ['uuid', 'timestamp', 'level', 'emitter', 'sourceloc',
+                 'message']
+
+    def __init__(self, timestamp, level, emitter, sourceloc, message):
+        # Clients tell records apart by uuid, whichever way they got them
+        self.uuid = str(uuid4())
+        self.timestamp = timestamp
+        self.level = level
+        self.emitter = emitter
+        self.sourceloc = sourceloc
+        self.message = message
+
+    def serializablefields(self):
+        fields = {
+            'uuid': self.uuid,
+            'timestamp': self.timestamp,
+            'level': lvldata[self.level][0],
+            'emitter': self.emitter,
+            'content': self.message
+        }
+        if self.sourceloc:
+            fields['sourceloc'] = self.sourceloc
+
+        return fields
+
+
+LiveLog = RingBuffer(1000)
+records = RingBuffer(5000)
 
 start = time.time()
 
@@ -113,31 +206,337 @@ def set_logfile(path):
     logfile = path
 
 
-def ismuted(what):
+class LogFileWriter(object):
+    """Writes log records to a file from a background thread
+
+    Records are queued and written in chunks, whenever flush_size bytes
+    have been collected or flush_interval seconds have passed. The file is
+    rotated after rotate_size bytes or rotate_interval seconds, keeping
+    retention old files (path.1 being the newest). If the queue is full,
+    records are dropped and counted instead of blocking the caller.
+    """
+
+    def __init__(self, path, max_records=10000, flush_interval=1.0,
+                 flush_size=65536, rotate_size=10485760, rotate_interval=0,
+                 retention=5):
+        super(LogFileWriter, self).__init__()
+
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.rotate_size = rotate_size
+        self.rotate_interval = rotate_interval
+        self.retention = retention
+
+        self.dropped = 0
+        self.written = 0
+
+        self._queue = Queue(max_records)
+        self._thread = None
+        self._file = None
+        self._size = 0
+        self._opened = 0
+        self._reported = 0
+
+    def start(self):
+        """Opens the log file and starts the writer thread"""
+
+        self._open()
+
+        self._thread = threading.Thread(target=self._run,
+                                        name='hfos-logwriter')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Writes all queued records, then closes the log file"""
+
+        if self._thread is None:
+            return
+
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def put(self, msg):
+        """Queues a record without blocking, counts it, if dropped"""
+
+        try:
+            self._queue.put_nowait(msg)
+        except Full:
+            self.dropped += 1
+
+    def _open(self):
+        self._file = open(self.path, 'a')
+        self._size = self._file.tell()
+        self._opened = time.time()
+
+    def _run(self):
+        buffered = []
+        size = 0
+        deadline = time.time() + self.flush_interval
+        running = True
+
+        while running:
+            try:
+                msg = self._queue.get(timeout=max(0, deadline - time.time()))
+                if msg is None:
+                    running = False
+                else:
+                    buffered.append(msg + '\n')
+                    size += len(msg) + 1
+            except Empty:
+                pass
+
+            if size >= self.flush_size or time.time() >= deadline or \
+                    not running:
+                self._write(buffered, size)
+                buffered = []
+                size = 0
+                deadline = time.time() + self.flush_interval
+
+        self._file.close()
+        self._file = None
+
+    def _write(self, buffered, size):
+        if self.dropped > self._reported:
+            buffered.append("[%s] : Dropped %i log records\n" % (
+                time.asctime(), self.dropped - self._reported))
+            self._reported = self.dropped
+
+        if len(buffered) == 0:
+            return
+
+        try:
+            self._file.write("".join(buffered))
+            self._file.flush()
+        except IOError:
+            print("Can't write to logfile %s!" % self.path)
+            return
+
+        self.written += len(buffered)
+        self._size += size
+
+        if (self.rotate_size and self._size >= self.rotate_size) or \
+                (self.rotate_interval and
+                 time.time() - self._opened >= self.rotate_interval):
+            self.rotate()
+
+    def rotate(self):
+        """Moves the current file to path.1, shifting older files and
+        deleting those beyond the retention count"""
+
+        self._file.close()
+
+        for number in range(self.retention, 0, -1):
+            source = self.path + '.' + str(number - 1) if number > 1 \
+                else self.path
+            target = self.path + '.' + str(number)
+
+            if os.path.exists(source):
+                os.rename(source, target)
+
+        if self.retention == 0:
+            os.remove(self.path)
+
+        self._open()
+
+
+filewriter = None
+
+
+def start_logfile(path=None, **kwargs):
+    """Starts writing log records to a file in the background, arguments
+    are passed on to the LogFileWriter"""
+
+    global filewriter
+
+    if path is not None:
+        set_logfile(path)
+
+    stop_logfile()
+
+    try:
+        filewriter = LogFileWriter(logfile, **kwargs)
+        filewriter.start()
+    except IOError:
+        filewriter = None
+        print("Can't open logfile %s for writing!" % logfile)
+
+    return filewriter
+
+
+def stop_logfile():
+    """Flushes and closes the background log file writer"""
+
+    global filewriter
+
+    if filewriter is not None:
+        filewriter.stop()
+        filewriter = None
+
+
+levelnames = {
+    'EVENTS': events,
+    'NETWORK': network,
+    'VERBOSE': verbose,
+    'DEBUG': debug,
+    'INFO': info,
+    'WARN': warn,
+    'ERROR': error,
+    'CRITICAL': critical,
+    'HILIGHT': hilight,
+    'OFF': off
+}
+levelnames.update({data[0]: lvl for lvl, data in lvldata.items()})
+
+DROP = 0
+PASS = 1
+CHECKTEXT = 2
+
+
+def parse_rule(rule):
+    """Splits a mute/solo rule into emitter pattern, level and text
+
+    Rules starting with @ match emitter names (with shell style wildcards),
+    optionally followed by :LEVEL (a number or level name) to only affect
+    records below that level, e.g. '@CM:warn'. Any other rule matches text
+    in the formatted message, case insensitively.
+
+    :param rule: Rule string
+    :return: (emitter pattern or None, level bound, text or None)
+    """
+
+    if not rule.startswith('@'):
+        return None, off, rule
+
+    pattern, _, level = rule[1:].partition(':')
+
+    if level == '':
+        level = off
+    elif level.isdigit():
+        level = int(level)
+    else:
+        level = levelnames[level.upper()]
+
+    return pattern.upper(), level, None
+
+
+def _compile_text(texts):
+    if len(texts) == 0:
+        return None
+
+    return re.compile("|".join(re.escape(text) for text in texts),
+                      re.IGNORECASE)
+
+
+class LogFilter(object):
+    """Mute and solo rules compiled into one matcher
+
+    Emitter rules are decided once per emitter and level, before anything
+    is formatted. Only text rules need the formatted message.
+    """
+
+    def __init__(self):
+        super(LogFilter, self).__init__()
+
+        self.active = False
+        self.compile([], [])
+
+    def compile(self, mute_rules, solo_rules):
+        mute_rules = [parse_rule(rule) for rule in mute_rules]
+        solo_rules = [parse_rule(rule) for rule in solo_rules]
+
+        self._mute_emitters = [(pattern, level) for pattern, level, text
+                               in mute_rules if pattern is not None]
+        self._solo_emitters = [(pattern, level) for pattern, level, text
+                               in solo_rules if pattern is not None]
+
+        self._mute_text = _compile_text(
+            [text for pattern, level, text in mute_rules if text])
+        self._solo_text = _compile_text(
+            [text for pattern, level, text in solo_rules if text])
+
+        self._decisions = {}
+        self.active = len(mute_rules) + len(solo_rules) > 0
+
+    def _decide(self, emitter, lvl):
+        name = emitter.upper()
+
+        for pattern, level in self._mute_emitters:
+            if lvl < level and fnmatchcase(name, pattern):
+                return DROP
+
+        soloing = self._solo_text is not None or any(
+            lvl < level for pattern, level in self._solo_emitters)
+
+        if soloing and not any(
+                lvl < level and fnmatchcase(name, pattern)
+                for pattern, level in self._solo_emitters):
+            if self._solo_text is None:
+                return DROP
+            return CHECKTEXT
+
+        return PASS
+
+    def check(self, emitter, lvl):
+        """Decides by emitter and level, whether a record is dropped (DROP),
+        emitted (PASS) or has to be checked by text (CHECKTEXT)"""
+
+        try:
+            return self._decisions[emitter, lvl]
+        except KeyError:
+            decision = self._decisions[emitter, lvl] = self._decide(emitter,
+                                                                    lvl)
+            return decision
+
+    def rejects(self, msg, decision=PASS):
+        """Checks the formatted message against the text rules"""
+
+        if self._mute_text is not None and self._mute_text.search(msg):
+            return True
+
+        if decision == CHECKTEXT and not self._solo_text.search(msg):
+            return True
+
+        return False
+
+
+logfilter = LogFilter()
+
+
+def set_filters(mute_rules=None, solo_rules=None):
+    """Replaces the mute and/or solo rules and recompiles the log filter"""
+
+    if mute_rules is None:
+        mute_rules = mute
+    if solo_rules is None:
+        solo_rules = solo
+
+    logfilter.compile(mute_rules, solo_rules)
+
+    mute[:] = mute_rules
+    solo[:] = solo_rules
+
+
+def ismuted(what, emitter='UNKNOWN', lvl=info):
     """
     Checks if a logged event is to be muted for debugging purposes.
 
     Also goes through the solo list - only items in there will be logged!
 
-    :param what:
+    :param what: Formatted message
+    :param emitter: Name of the log source
+    :param lvl: Level of the message
     :return:
     """
 
-    state = False
-
-    for item in solo:
-        if item not in what:
-            state = True
-        else:
-            state = False
-            break
+    if not logfilter.active:
+        return False
 
-    for item in mute:
-        if item in what:
-            state = True
-            break
+    decision = logfilter.check(emitter, lvl)
 
-    return state
+    return decision == DROP or logfilter.rejects(what, decision)
 
 
 def setup_root(newroot):
@@ -164,22 +563,28 @@ def hfoslog(*what, **kwargs):
     :param sourceloc: Give specific source code location hints, used internally
     """
 
-    # Count all messages (missing numbers give a hint at too high log level)
+    lvl = kwargs.get('lvl', info)
+
+    # Filtered out records should cost nothing but this comparison
+    if lvl < verbosity['global']:
+        return
+
+    # Count all emitted messages
     global count
     count += 1
 
-    if 'lvl' in kwargs:
-        lvl = kwargs['lvl']
-        if lvl < verbosity['global']:
-            return
-    else:
-        lvl = info
-
     if 'emitter' in kwargs:
         emitter = kwargs['emitter']
     else:
         emitter = 'UNKNOWN'
 
+    if logfilter.active:
+        decision = logfilter.check(emitter, lvl)
+        if decision == DROP:
+            return
+    else:
+        decision = PASS
+
     if 'exc' in kwargs:
         exception = True
     else:
@@ -240,13 +645,17 @@ def hfoslog(*what, **kwargs):
 
     msg += content
 
-    if ismuted(msg):
+    if logfilter.active and logfilter.rejects(msg, decision):
         return
 
+    records.append(LogRecord(timestamp, lvl, emitter, callee, content[1:]))
+
     if not uncut and lvl > 10 and len(msg) > 1000:
         msg = msg[:1000]
 
-    if lvl >= verbosity['file']:
+    if lvl >= verbosity['file'] and filewriter is not None:
+        filewriter.put(msg)
+    elif lvl >= verbosity['file']:
         try:
             f = open(logfile, "a")
             f.write(msg + '\n')
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# HFOS - Hackerfleet Operating System
+# ===================================
+# Copyright (C) 2011-2017 Heiko 'riot' Weinen <riot@c-base.org> and others.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Heiko 'riot' Weinen"
+__license__ = "GPLv3"
+"""
+
+Module: Manifest
+================
+
+Cached manifest of all installed components, schemata and provisions
+
+Walking the entry points of all installed distributions needs
+pkg_resources, and used to import every single component. The manifest
+stores what is needed at boot (names, modules, versions, locations,
+frontend directories and client events) in a json file and is only
+rebuilt, when the fingerprint of the installed distributions changes.
+Components are imported lazily, via load_entry.
+
+
+"""
+
+import hashlib
+import json
+import os
+import sys
+
+from importlib import import_module
+
+from hfos.logger import hfoslog, debug, verbose, warn, error
+
+MANIFEST_VERSION = 2
+
+component_groups = ('hfos.base', 'hfos.sails', 'hfos.components')
+groups = component_groups + ('hfos.schemata', 'hfos.provisions')
+
+manifest_path = '/var/cache/hfos/manifest.json'
+
+# Used, when the system wide cache is not writable
+user_manifest_path = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+    'hfos', 'manifest.json')
+
+_manifest = None
+
+
+def fingerprint(paths=None):
+    """Hashes names and modification times of all installed distribution
+    metadata found on the python path, without importing pkg_resources"""
+
+    if paths is None:
+        paths = sys.path
+
+    items = [sys.version]
+
+    for path in paths:
+        try:
+            names = os.listdir(path or '.')
+        except OSError:
+            continue
+
+        for name in names:
+            if not name.endswith(('.egg-info', '.dist-info', '.egg-link',
+                                  '.egg', '.pth')):
+                continue
+
+            filename = os.path.join(path, name)
+            entry_points = os.path.join(filename, 'entry_points.txt')
+            if os.path.exists(entry_points):
+                filename = entry_points
+
+            try:
+                items.append("%s:%s:%f" % (path, name,
+                                           os.stat(filename).st_mtime))
+            except OSError:
+                continue
+
+    return hashlib.sha1("\n".join(sorted(items)).encode('utf-8')).hexdigest()
+
+
+def build_manifest():
+    """Walks all hfos entry points and imports the components once, to
+    collect their descriptions and the client events they offer"""
+
+    from pkg_resources import iter_entry_points
+    from hfos.events.system import describe_events
+
+    manifest = {group: [] for group in groups}
+
+    for group in groups:
+        for entry_point in iter_entry_points(group=group, name=None):
+            try:
+                location = entry_point.dist.location
+                entry = {
+                    'name': entry_point.name,
+                    'module': entry_point.module_name,
+                    'attrs': list(entry_point.attrs),
+                    'location': location,
+                    'version': str(entry_point.dist.parsed_version)
+                }
+
+                frontend = os.path.join(location, 'frontend')
+                if os.path.isdir(frontend):
+                    entry['frontend'] = frontend
+
+                if group in component_groups:
+                    entry['description'] = entry_point.load().__doc__
+                    entry['events'] = describe_events(
+                        sys.modules[entry_point.module_name])
+
+                manifest[group].append(entry)
+                hfoslog("Entry point:", group, entry, lvl=verbose,
+                        emitter='MANIFEST')
+            except Exception as e:
+                hfoslog("Could not inspect entrypoint: ", e, type(e),
+                        entry_point, lvl=error, exc=True, emitter='MANIFEST')
+
+    return manifest
+
+
+def _trusted(stat):
+    """Checks, that a manifest file could only have been written by us or
+    root, as the launcher imports every module it names"""
+
+    if not hasattr(os, 'getuid'):  # pragma: no cover
+        return True
+
+    return stat.st_uid in (os.getuid(), 0) and not stat.st_mode & 0o022
+
+
+def _read(path, current):
+    try:
+        with open(path, 'r') as f:
+            if not _trusted(os.fstat(f.fileno())):
+                hfoslog("Ignoring manifest writable by others:", path,
+                        lvl=warn, emitter='MANIFEST')
+                return None
+
+            cached = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+    if cached.get('version') != MANIFEST_VERSION or \
+            cached.get('fingerprint') != current:
+        return None
+
+    return cached['groups']
+
+
+def _write(path, current, manifest):
+    content = {
+        'version': MANIFEST_VERSION,
+        'fingerprint': current,
+        'groups': manifest
+    }
+
+    for filename in (path, user_manifest_path):
+        temporary = "%s.%d" % (filename, os.getpid())
+        descriptor = None
+        try:
+            directory = os.path.dirname(filename)
+            if not os.path.exists(directory):
+                os.makedirs(directory, 0o700)
+
+            # Only ever write to a freshly created, private file
+            descriptor = os.open(temporary,
+                                 os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(descriptor, 'w') as f:
+                json.dump(content, f, indent=1)
+            os.rename(temporary, filename)
+
+            return filename
+        except (IOError, OSError) as e:
+            hfoslog("Could not store manifest:", filename, e, lvl=debug,
+                    emitter='MANIFEST')
+            if descriptor is not None and os.path.exists(temporary):
+                os.remove(temporary)
+
+    hfoslog("Manifest could not be stored, it will be rebuilt on every "
+            "start", lvl=warn, emitter='MANIFEST')
+
+
+def get_manifest(rebuild=False):
+    """Returns the manifest, rebuilding it if the installed distributions
+    changed or a rebuild is requested"""
+
+    global _manifest
+
+    if _manifest is not None and not rebuild:
+        return _manifest
+
+    current = fingerprint()
+
+    manifest = None
+    if not rebuild:
+        manifest = _read(manifest_path, current)
+        if manifest is None:
+            manifest = _read(user_manifest_path, current)
+
+    if manifest is None:
+        hfoslog("Building component manifest", lvl=debug, emitter='MANIFEST')
+        manifest = build_manifest()
+        _write(manifest_path, current, manifest)
+
+    _manifest = manifest
+
+    return manifest
+
+
+def manifest_entries(*selected):
+    """Returns the manifest entries of the given entry point groups"""
+
+    manifest = get_manifest()
+    result = []
+
+    for group in selected:
+        result.extend(manifest.get(group, []))
+
+    return result
+
+
+def load_entry(entry):
+    """Imports the object an entry points to"""
+
+    loaded = import_module(entry['module'])
+    for attribute in entry['attrs']:
+        loaded = getattr(loaded, attribute)
+
+    return loaded
@@ -31,7 +31,7 @@ Module: Migration
 from hfos.database import schemastore
 from hfos.logger import hfoslog, error, verbose, warn, critical, debug
 from deepdiff.diff import DeepDiff
-from pkg_resources import iter_entry_points, DistributionNotFound
+from hfos.manifest import manifest_entries, load_entry
 import dpath
 import os
 import json
@@ -157,21 +157,20 @@ def make_migrations(schema=None):
         with open(os.path.join(path, filename), 'w') as f:
             f.write(migration)
 
-    for schema_entrypoint in iter_entry_points(group='hfos.schemata',
-                                               name=None):
+    for schema_entrypoint in manifest_entries('hfos.schemata'):
         try:
-            hfoslog("Schemata found: ", schema_entrypoint.name, lvl=debug,
+            hfoslog("Schemata found: ", schema_entrypoint['name'], lvl=debug,
                     emitter='DB')
-            if schema is not None and schema_entrypoint.name != schema:
+            if schema is not None and schema_entrypoint['name'] != schema:
                 continue
 
-            entrypoints[schema_entrypoint.name] = schema_entrypoint
-            pprint(schema_entrypoint.dist.location)
-            schema_top = schema_entrypoint.dist.location
-            schema_migrations = schema_entrypoint.module_name.replace(
+            entrypoints[schema_entrypoint['name']] = schema_entrypoint
+            pprint(schema_entrypoint['location'])
+            schema_top = schema_entrypoint['location']
+            schema_migrations = schema_entrypoint['module'].replace(
                 'schemata', 'migrations').replace('.', '/')
             path = os.path.join(schema_top, schema_migrations)
-            new_model = schema_entrypoint.load()['schema']
+            new_model = load_entry(schema_entrypoint)['schema']
 
             migrations = []
 
@@ -199,9 +198,9 @@ def make_migrations(schema=None):
             if len(migrations) == 0:
                 write_migration(schema, 1, path, None, new_model)
 
-        except (ImportError, DistributionNotFound) as e:
+        except (ImportError, AttributeError) as e:
             hfoslog("Problematic schema: ", e, type(e),
-                    schema_entrypoint.name, exc=True, lvl=warn,
+                    schema_entrypoint['name'], exc=True, lvl=warn,
                     emitter='SCHEMATA')
 
     hfoslog("Found schemata: ", sorted(entrypoints.keys()), lvl=debug,
@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# HFOS - Hackerfleet Operating System
+# ===================================
+# Copyright (C) 2011-2017 Heiko 'riot' Weinen <riot@c-base.org> and others.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Heiko 'riot' Weinen"
+__license__ = "GPLv3"
+"""
+
+Module: Profiler
+================
+
+Profiling mode of the launcher (--profile)
+
+Measures wall and CPU time of every circuits handler call, by component,
+event and channel, how long events wait in the queue and how long the
+events of timers take to be handled. Reports are written regularly, a
+cProfile session can be controlled with the 'profile' debug request.
+
+Generator handlers are only measured until they yield for the first time.
+
+
+"""
+
+import cProfile
+import pstats
+import time
+
+from collections import namedtuple
+from uuid import uuid4
+
+from six.moves import StringIO
+
+from circuits import Event, Timer
+from circuits.core.utils import findtype
+
+from hfos.component import ConfigurableComponent, handler
+from hfos.logger import warn, hilight
+from hfos.tools import std_table
+
+try:
+    from time import perf_counter as wallclock
+except ImportError:  # pragma: no cover
+    from time import time as wallclock
+
+try:
+    from time import thread_time as cpuclock
+except ImportError:  # pragma: no cover
+    try:
+        from time import process_time as cpuclock
+    except ImportError:
+        from time import clock as cpuclock
+
+
+class Timing(object):
+    """Accumulated wall and CPU time of a measured thing"""
+
+    __slots__ = ['count', 'wall', 'cpu', 'max']
+
+    def __init__(self):
+        self.count = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.max = 0.0
+
+    def add(self, wall, cpu=0.0):
+        self.count += 1
+        self.wall += wall
+        self.cpu += cpu
+        if wall > self.max:
+            self.max = wall
+
+
+def _account(timings, key, wall, cpu=0.0):
+    try:
+        timing = timings[key]
+    except KeyError:
+        timing = timings[key] = Timing()
+
+    timing.add(wall, cpu)
+
+
+class HandlerProfiler(object):
+    """Instruments a circuits root manager to measure its handlers"""
+
+    def __init__(self):
+        super(HandlerProfiler, self).__init__()
+
+        self.handlers = {}
+        self.waits = {}
+        self.events = {}
+
+        self.started = time.time()
+        self.root = None
+
+    def install(self, root):
+        """Wraps the root manager's handler lookup, event queueing and
+        dispatching"""
+
+        self.root = root
+
+        get_handlers = root.getHandlers
+        fire = root._fire
+        dispatcher = root._dispatcher
+
+        def profiled_get_handlers(event, channel, **kwargs):
+            return [self._wrap(item, event.name, channel) for item in
+                    get_handlers(event, channel, **kwargs)]
+
+        def profiled_fire(event, channel, priority=0):
+            event._profiler_fired = wallclock()
+            return fire(event, channel, priority)
+
+        def profiled_dispatcher(event, channels, remaining):
+            start = wallclock()
+
+            fired = event.__dict__.pop('_profiler_fired', None)
+            if fired is not None:
+                _account(self.waits, event.name, start - fired)
+
+            try:
+                return dispatcher(event, channels, remaining)
+            finally:
+                _account(self.events, event.name, wallclock() - start)
+
+        root.getHandlers = profiled_get_handlers
+        root._fire = profiled_fire
+        root._dispatcher = profiled_dispatcher
+
+        # Cached handler lists have to be rebuilt with wrapped handlers
+        root._cache_needs_refresh = True
+
+    def _wrap(self, event_handler, name, channel):
+        instance = getattr(event_handler, '__self__', None)
+        component = getattr(instance, 'uniquename', None) or \
+            instance.__class__.__name__
+        key = (component, name, str(channel))
+
+        def profiled(*args, **kwargs):
+            wall = wallclock()
+            cpu = cpuclock()
+            try:
+                return event_handler(*args, **kwargs)
+            finally:
+                _account(self.handlers, key, wallclock() - wall,
+                         cpuclock() - cpu)
+
+        for attribute in ('event', 'priority', 'channel', 'names',
+                          'handler', 'filter', '__name__'):
+            if hasattr(event_handler, attribute):
+                setattr(profiled, attribute, getattr(event_handler,
+                                                     attribute))
+        profiled.__self__ = instance
+
+        return profiled
+
+    def report(self, limit=30):
+        """Returns a textual report of the slowest handlers, queue waits
+        and timer events"""
+
+        def ms(seconds):
+            return "%.3f" % (seconds * 1000.0)
+
+        Row = namedtuple('Row', ['Component', 'Event', 'Channel', 'Calls',
+                                 'Wall', 'CPU', 'Mean', 'Max'])
+        handlers = sorted(self.handlers.items(),
+                          key=lambda item: item[1].wall, reverse=True)
+        handler_rows = [
+            Row(key[0], key[1], key[2], str(timing.count), ms(timing.wall),
+                ms(timing.cpu), ms(timing.wall / timing.count),
+                ms(timing.max))
+            for key, timing in handlers[:limit]
+        ]
+
+        WaitRow = namedtuple('WaitRow', ['Event', 'Count', 'Mean', 'Max'])
+        waits = sorted(self.waits.items(), key=lambda item: item[1].max,
+                       reverse=True)
+        wait_rows = [WaitRow(name, str(timing.count),
+                             ms(timing.wall / timing.count), ms(timing.max))
+                     for name, timing in waits[:limit]]
+
+        timer_names = set()
+        if self.root is not None:
+            for timer in findtype(self.root, Timer, all=True):
+                timer_names.add(getattr(timer.event, 'name', None))
+
+        TimerRow = namedtuple('TimerRow', ['Event', 'Ticks', 'Wall', 'Mean',
+                                           'Max'])
+        timer_rows = [TimerRow(name, str(timing.count), ms(timing.wall),
+                               ms(timing.wall / timing.count),
+                               ms(timing.max))
+                      for name, timing in sorted(self.events.items())
+                      if name in timer_names]
+
+        result = "Profile after %.0f seconds, times in ms\n\n" % (
+            time.time() - self.started)
+        result += "Handlers:\n" + std_table(handler_rows) + "\n"
+        result += "Queue waits:\n" + std_table(wait_rows) + "\n"
+        result += "Timers:\n" + std_table(timer_rows)
+
+        return result
+
+
+class profile_report(Event):
+    pass
+
+
+class profile_control(Event):
+    """Controls the profiler
+
+    :param command: 'start' or 'stop' a cProfile session, or write a
+                    'report' now
+    """
+
+    def __init__(self, command, *args):
+        super(profile_control, self).__init__(*args)
+
+        self.command = command
+
+
+class Profiler(ConfigurableComponent):
+    """
+    Measures handler timings and writes them to a report file regularly.
+
+    Only present, when the launcher runs with --profile.
+    """
+
+    configprops = {}
+
+    def __init__(self, interval=60, report='/tmp/hfos_profile.txt', *args):
+        super(Profiler, self).__init__('PROFILER', *args)
+
+        self.filename = report
+        self.profiler = HandlerProfiler()
+        self.session = None
+
+        if interval > 0:
+            Timer(interval, profile_report(), self.channel,
+                  persist=True).register(self)
+
+    def registered(self, component, manager):
+        if component is self and self.profiler.root is None:
+            self.profiler.install(self.root)
+            self.log('Profiling all handlers, reports go to',
+                     self.filename, lvl=warn)
+
+    @handler('profile_report')
+    def profile_report(self, *args):
+        """Writes the current handler timings to the report file"""
+
+        try:
+            with open(self.filename, 'w') as report:
+                report.write(self.profiler.report())
+        except IOError as e:
+            self.log('Could not write profile report:', e, lvl=warn)
+
+    @handler('profile_control')
+    def profile_control(self, event):
+        """Starts a cProfile session, or stops it and dumps its statistics,
+        or writes a report"""
+
+        command = event.command
+
+        if command == 'start':
+            if self.session is None:
+                self.session = cProfile.Profile()
+                self.session.enable()
+                self.log('cProfile session started', lvl=hilight)
+        elif command == 'stop':
+            if self.session is None:
+                self.log('No cProfile session running', lvl=warn)
+                return
+
+            self.session.disable()
+            filename = '/tmp/hfos_profile_' + str(uuid4()) + '.pstats'
+            self.session.dump_stats(filename)
+
+            output = StringIO()
+            stats = pstats.Stats(self.session, stream=output)
+            self.session = None
+
+            stats.sort_stats('cumulative')
+            stats.print_stats(30)
+            self.log('cProfile statistics written to', filename,
+                     lvl=hilight)
+            self.log('Slowest calls:\n' + output.getvalue(), lvl=hilight)
+        elif command == 'report':
+            self.profile_report()
+            self.log('Profile report written to', self.filename,
+                     lvl=hilight)
+        else:
+            self.log('Unknown profiler command:', command, lvl=warn)
@@ -13,7 +13,7 @@ This contains tilelayer urls, api stuff etc.
 """
 
 from hfos.logger import hfoslog, debug  # , verbose, error, warn
-from pkg_resources import iter_entry_points
+from hfos.manifest import manifest_entries, load_entry
 
 __author__ = "Heiko 'riot' Weinen <riot@c-base.org>"
 
@@ -21,12 +21,12 @@ __author__ = "Heiko 'riot' Weinen <riot@c-base.org>"
 def _build_provisionstore():
     available = {}
 
-    for provision_entrypoint in iter_entry_points(group='hfos.provisions',
-                                                  name=None):
-        hfoslog("Provisions found: ", provision_entrypoint.name, lvl=debug,
+    for provision_entrypoint in manifest_entries('hfos.provisions'):
+        hfoslog("Provisions found: ", provision_entrypoint['name'], lvl=debug,
                 emitter='DB')
         # try:
-        available[provision_entrypoint.name] = provision_entrypoint.load()
+        available[provision_entrypoint['name']] = load_entry(
+            provision_entrypoint)
         # except ImportError as e:
         #    hfoslog("Problematic provision: ", e, type(e),
         #            provision_entrypoint.name, exc=True, lvl=warn,
@@ -36,7 +36,7 @@ Basic functionality around provisioning.
 
 from jsonschema import ValidationError
 from hfos.logger import hfoslog, debug, verbose, warn, error
-from hfos.database import objectmodels
+from hfos.database import objectmodels, get_database
 
 system_user = None
 
@@ -75,10 +75,7 @@ def provisionList(items, dbobject, overwrite=False, clear=False,
 
     import pymongo
 
-    # TODO: Fix this to make use of the dbhost
-
-    client = pymongo.MongoClient(host="localhost", port=27017)
-    db = client["hfos"]
+    db = get_database()
 
     col_name = dbobject.collection_name()
 
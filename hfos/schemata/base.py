@@ -38,6 +38,20 @@ User: Useraccount object
 from hfos.schemata.defaultform import noform
 
 
+def index(*fields, **kwargs):
+    """Builds an (ascending, optionally unique) index declaration
+
+    :param fields: Names of the indexed fields, more than one makes a
+                   compound index
+    :param unique: Enforce unique values
+    """
+
+    return {
+        'fields': list(fields),
+        'unique': kwargs.get('unique', False)
+    }
+
+
 def base_object(name,
                 no_perms=False,
                 has_owner=True,
@@ -46,12 +60,14 @@ def base_object(name,
                 roles_read=None,
                 roles_list=None,
                 roles_create=None,
-                all_roles=None):
+                all_roles=None,
+                indices=None):
     base_schema = {
         'id': '#' + name,
         'type': 'object',
         'name': name,
-        'properties': {}
+        'properties': {},
+        'indices': []
     }
 
     if not no_perms:
@@ -158,5 +174,19 @@ def base_object(name,
             }
         })
         base_schema['required'] = ["uuid"]
+        base_schema['indices'].append(index('uuid', unique=True))
+
+    if not no_perms:
+        base_schema['indices'].append(index('name'))
+        if has_owner:
+            base_schema['indices'].append(index('owner'))
+
+    for item in indices or []:
+        if isinstance(item, str):
+            item = index(item)
+        elif isinstance(item, (list, tuple)):
+            item = index(*item)
+
+        base_schema['indices'].append(item)
 
     return base_schema
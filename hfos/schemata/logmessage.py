@@ -36,7 +36,8 @@ LogMessage: LogMessage to store messages in rooms and private logs
 from hfos.schemata.defaultform import readonlyform
 from hfos.schemata.base import base_object
 
-LogMessageSchema = base_object('logmessage', no_perms=True)
+LogMessageSchema = base_object('logmessage', no_perms=True,
+                               indices=['timestamp'])
 
 LogMessageSchema.update({'roles_create': 'SYSTEM'})
 
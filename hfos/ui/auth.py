@@ -40,6 +40,7 @@ from hfos.component import handler
 from hfos.events.client import authentication, send
 from hfos.component import ConfigurableComponent
 from hfos.database import objectmodels, makesalt
+from hfos import cache as objectcache
 from hfos.logger import error, warn, debug, verbose
 
 
@@ -106,12 +107,9 @@ class Authenticator(ConfigurableComponent):
         if event.auto:
             self.log("Verifying automatic login request")
 
-            try:
-                clientconfig = objectmodels['client'].find_one({
-                    'uuid': event.requestedclientuuid
-                })
-            except Exception:
-                clientconfig = None
+            result = yield self.dbcall(objectcache.get_object, 'client',
+                                       event.requestedclientuuid)
+            clientconfig, failure = result.value
 
             if clientconfig is None or clientconfig.autologin is False:
                 self.log("Autologin failed:", event.requestedclientuuid,
@@ -120,19 +118,23 @@ class Authenticator(ConfigurableComponent):
 
             if clientconfig.autologin is True:
 
-                try:
-                    useraccount = objectmodels['user'].find_one({
-                        'uuid': clientconfig.owner
-                    })
-                    self.log("Autologin for", useraccount.name, lvl=debug)
-                except Exception as e:
-                    self.log("No user object due to error: ", e, type(e),
-                             lvl=error)
+                result = yield self.dbcall(objectcache.get_object, 'user',
+                                           clientconfig.owner)
+                useraccount, failure = result.value
+
+                if useraccount is None:
+                    self.log("No user object due to error: ", failure,
+                             type(failure), lvl=error)
+                    return
+
+                self.log("Autologin for", useraccount.name, lvl=debug)
+
+                result = yield self.dbcall(objectmodels['profile'].find_one, {
+                    'owner': str(useraccount.uuid)
+                })
+                userprofile, failure = result.value
 
                 try:
-                    userprofile = objectmodels['profile'].find_one({
-                        'owner': str(useraccount.uuid)
-                    })
                     self.log("Profile: ", userprofile,
                              useraccount.uuid, lvl=debug)
 
@@ -173,14 +175,18 @@ class Authenticator(ConfigurableComponent):
             userprofile = None
 
             # TODO: Notify problems here back to the frontend
-            try:
-                useraccount = objectmodels['user'].find_one({
-                    'name': event.username
-                })
+            result = yield self.dbcall(objectmodels['user'].find_one, {
+                'name': event.username
+            })
+            useraccount, failure = result.value
+
+            if failure is not None:
+                self.log("No userobject due to error: ", failure,
+                         type(failure), lvl=error)
+            elif useraccount is None:
+                self.log("Unknown user: ", event.username, lvl=warn)
+            else:
                 self.log("Account: %s" % useraccount._fields, lvl=debug)
-            except Exception as e:
-                self.log("No userobject due to error: ", e, type(e),
-                         lvl=error)
 
             if useraccount:
                 self.log("User found.", lvl=debug)
@@ -194,9 +200,9 @@ class Authenticator(ConfigurableComponent):
                     # Client requests to get an existing client
                     # configuration or has none
 
-                    clientconfig = objectmodels['client'].find_one({
-                        'uuid': requestedclientuuid
-                    })
+                    result = yield self.dbcall(objectcache.get_object,
+                                               'client', requestedclientuuid)
+                    clientconfig, failure = result.value
 
                     if clientconfig:
                         self.log("Checking client configuration permissions",
@@ -226,11 +232,15 @@ class Authenticator(ConfigurableComponent):
                         clientconfig.owner = useraccount.uuid
                         # TODO: Make sure the profile is only saved if the
                         # client could store it, too
-                        clientconfig.save()
+                        yield self.dbcall(clientconfig.save)
+
+                    result = yield self.dbcall(
+                        objectmodels['profile'].find_one,
+                        {'owner': str(useraccount.uuid)}
+                    )
+                    userprofile, failure = result.value
 
                     try:
-                        userprofile = objectmodels['profile'].find_one(
-                            {'owner': str(useraccount.uuid)})
                         self.log("Profile: ", userprofile,
                                  useraccount.uuid, lvl=debug)
 
@@ -340,9 +350,7 @@ class Authenticator(ConfigurableComponent):
             newprofile = event.data
             self.log("Updating with %s " % newprofile, lvl=debug)
 
-            userprofile = objectmodels['profile'].find_one({
-                'uuid': event.user.uuid
-            })
+            userprofile = objectcache.get_object('profile', event.user.uuid)
 
             self.log("Updating %s" % userprofile, lvl=debug)
 
@@ -26,6 +26,7 @@ from glob import glob
 from shutil import copy
 
 from hfos.logger import hfoslog, debug, verbose, warn, error, critical, hilight
+from hfos.manifest import manifest_entries, component_groups
 
 try:
     from subprocess import Popen
@@ -99,59 +100,29 @@ def install_frontend(forcereload=False, forcerebuild=False,
         hfoslog("Frontend dependency installing done: ", out,
                 err, lvl=debug, emitter='MANAGE')
 
-    if True:  # try:
-        from pkg_resources import iter_entry_points
-
-        entry_point_tuple = (
-            iter_entry_points(group='hfos.base', name=None),
-            iter_entry_points(group='hfos.sails', name=None),
-            iter_entry_points(group='hfos.components', name=None)
-        )
-
-        for iterator in entry_point_tuple:
-            for entry_point in iterator:
-                try:
-                    name = entry_point.name
-                    location = entry_point.dist.location
-                    loaded = entry_point.load()
-
-                    hfoslog("Entry point: ", entry_point,
-                            name,
-                            entry_point.resolve(), lvl=verbose,
-                            emitter='MANAGE')
-
-                    hfoslog("Loaded: ", loaded, lvl=verbose, emitter='MANAGE')
-                    comp = {
-                        'location': location,
-                        'version': str(entry_point.dist.parsed_version),
-                        'description': loaded.__doc__
-                    }
-
-                    frontend = os.path.join(location, 'frontend')
-                    hfoslog("Checking component frontend parts: ",
-                            frontend, lvl=verbose, emitter='MANAGE')
-                    if os.path.isdir(
-                            frontend) and frontend != frontendroot:
-                        comp['frontend'] = frontend
-                    else:
-                        hfoslog("Component without frontend "
-                                "directory:", comp, lvl=debug,
-                                emitter='MANAGE')
-
-                    components[name] = comp
-                    loadable_components[name] = loaded
-
-                    hfoslog("Loaded component:", comp, lvl=verbose,
-                            emitter='MANAGE')
-
-                except Exception as e:
-                    hfoslog("Could not inspect entrypoint: ", e,
-                            type(e), entry_point, iterator, lvl=error,
-                            exc=True, emitter='MANAGE')
-
-    # except Exception as e:
-    #    hfoslog("Error: ", e, type(e), lvl=error, exc=True, emitter='MANAGE')
-    #    return
+    for entry in manifest_entries(*component_groups):
+        name = entry['name']
+        comp = {
+            'location': entry['location'],
+            'version': entry['version'],
+            'description': entry.get('description', None)
+        }
+
+        frontend = entry.get('frontend', None)
+        hfoslog("Checking component frontend parts: ",
+                frontend, lvl=verbose, emitter='MANAGE')
+        if frontend is not None and frontend != frontendroot:
+            comp['frontend'] = frontend
+        else:
+            hfoslog("Component without frontend "
+                    "directory:", comp, lvl=debug,
+                    emitter='MANAGE')
+
+        components[name] = comp
+        loadable_components[name] = entry
+
+        hfoslog("Found component:", comp, lvl=verbose,
+                emitter='MANAGE')
 
     hfoslog('COMPONENTS AFTER LOOKUP:', components.keys(), lvl=hilight)
 
@@ -33,7 +33,6 @@ Coordinates clients communicating via websocket
 """
 
 import datetime
-import json
 import random
 
 from time import time
@@ -42,16 +41,21 @@ from uuid import uuid4
 from base64 import b64decode
 
 from hfos.component import handler
-from circuits.net.events import write
+from circuits.net.events import write, close
+from circuits.net.sockets import Server
+from circuits.core.utils import findtype
 from circuits import Event, Timer
 from hfos.events.system import get_anonymous_events, get_user_events
-from hfos.events.client import authenticationrequest, send, clientdisconnect, \
-    userlogin, userlogout
+from hfos.events.client import authenticationrequest, send, multicast, \
+    clientdisconnect, userlogin, userlogout
 from hfos.component import ConfigurableComponent
-from hfos.database import objectmodels
 from hfos.logger import error, warn, critical, debug, info, network, \
-    verbose, hilight
-from hfos.ui.clientobjects import Socket, Client, User
+    verbose, hilight, verbosity
+from hfos.ui.clientobjects import Socket, Outbox, Client, User
+from hfos.ui.deflate import DeflateWebSocketsDispatcher
+from hfos.ui.ratelimit import RateLimiter
+from hfos.ui.requeststats import RequestStats
+from hfos.ui.framing import ComplexEncoder, available, encode, decode  # NOQA
 from hfos.debugger import cli_register_event
 from hfos.tools import std_table
 
@@ -68,20 +72,23 @@ class cli_who(Event):
     pass
 
 
-class reset_flood_counters(Event):
+class flush_outboxes(Event):
     pass
 
 
-class reset_flood_offenders(Event):
+class flush_batch(Event):
     pass
 
 
-class ComplexEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, datetime.time):
-            return obj.isoformat()
-            # Let the base class default method raise the TypeError
-        return json.JSONEncoder.default(self, obj)
+class cli_ratelimits(Event):
+    pass
+
+
+class cli_requests(Event):
+    pass
+
+
+Dispatch = namedtuple('Dispatch', ['event', 'authorized', 'key'])
 
 
 class ClientManager(ConfigurableComponent):
@@ -92,6 +99,59 @@ class ClientManager(ConfigurableComponent):
 
     channel = "hfosweb"
 
+    configprops = {
+        'ratelimit': {
+            'type': 'number',
+            'title': 'Request rate limit',
+            'description': 'Requests per second a client may send',
+            'default': 50
+        },
+        'ratelimitburst': {
+            'type': 'integer',
+            'title': 'Request burst limit',
+            'description': 'Requests a client may send at once',
+            'default': 100
+        },
+        'ratelimits': {
+            'type': 'object',
+            'title': 'Event rate limits',
+            'description': 'Rate ({"rate": x, "burst": y}) limits for '
+                           'single events by name (component.action)',
+            'default': {
+                'hfos.events.objectmanager.search': {'rate': 2, 'burst': 10},
+                'hfos.events.objectmanager.list': {'rate': 2, 'burst': 10},
+                'hfos.events.objectmanager.put': {'rate': 5, 'burst': 20},
+                'auth.login': {'rate': 0.2, 'burst': 5}
+            }
+        },
+        'outbound_bytes': {
+            'type': 'integer',
+            'title': 'Outbound queue size',
+            'description': 'Maximum amount of bytes queued for a client',
+            'default': 4194304
+        },
+        'outbound_messages': {
+            'type': 'integer',
+            'title': 'Outbound queue length',
+            'description': 'Maximum amount of messages queued for a client',
+            'default': 1000
+        },
+        'outbound_watermark': {
+            'type': 'integer',
+            'title': 'Transmission watermark',
+            'description': 'Amount of bytes in flight to a connection, '
+                           'above which messages are held back in the queue',
+            'default': 262144
+        },
+        'outbound_grace': {
+            'type': 'number',
+            'title': 'Slow client grace time',
+            'description': 'Seconds a client may stay over its outbound '
+                           'queue limits, before it is disconnected',
+            'default': 10
+        }
+    }
+
     def __init__(self, *args):
         super(ClientManager, self).__init__('CM', *args)
 
@@ -100,21 +160,27 @@ class ClientManager(ConfigurableComponent):
         self._users = {}
         self._count = 0
         self._usermapping = {}
-        self._flooding = {}
-        self._flood_counter = {}
+        self._limited = set()
+
+        self._transport = None
+        self._dispatcher = None
 
         self.authorized_events = {}
         self.anonymous_events = {}
+        self._dispatch = {}
 
         self.fireEvent(cli_register_event('users', cli_users))
         self.fireEvent(cli_register_event('clients', cli_clients))
         self.fireEvent(cli_register_event('who', cli_who))
-        self._flood_counters_resetter = Timer(
-            2, Event.create('reset_flood_counters'), persist=True
-        ).register(self)
-        self._flood_offender_resetter = Timer(
-            10, Event.create('reset_flood_offenders'), persist=True
-        ).register(self)
+        self.fireEvent(cli_register_event('ratelimits', cli_ratelimits))
+        self.fireEvent(cli_register_event('requests', cli_requests))
+
+        self._ratelimiter = RateLimiter(self.config.ratelimit,
+                                        self.config.ratelimitburst,
+                                        self.config.ratelimits)
+        self._requeststats = RequestStats()
+
+        self._outbox_flusher = None
 
     @handler('cli_clients')
     def client_list(self, *args):
@@ -126,18 +192,34 @@ class ClientManager(ConfigurableComponent):
 
     @handler('cli_who')
     def who(self, *args):
-        Row = namedtuple("Row", ['User', 'Client', 'IP'])
+        Row = namedtuple("Row", ['User', 'Client', 'IP', 'Queued', 'Bytes',
+                                 'Dropped', 'Coalesced', 'Compression'])
         rows = []
 
+        def queue_stats(client):
+            compression = self._get_compression(client.sock)
+            if compression is not None:
+                ratio = "%.2f" % compression['ratio']
+            else:
+                ratio = '-'
+
+            try:
+                outbox = self._sockets[client.sock].outbox
+                return str(len(outbox)), str(outbox.bytes), \
+                    str(outbox.dropped), str(outbox.coalesced), ratio
+            except (KeyError, AttributeError, TypeError):
+                return '-', '-', '-', '-', ratio
+
         for user in self._users.values():
             for key, client in self._clients.items():
                 if client.useruuid == user.uuid:
-                    row = Row(user.account.name, key, client.ip)
+                    row = Row(user.account.name, key, client.ip,
+                              *queue_stats(client))
                     rows.append(row)
 
         for key, client in self._clients.items():
             if client.useruuid is None:
-                row = Row('ANON', key, client.ip)
+                row = Row('ANON', key, client.ip, *queue_stats(client))
                 rows.append(row)
 
         self.log("\n" + std_table(rows))
@@ -146,6 +228,25 @@ class ClientManager(ConfigurableComponent):
     def ready(self):
         self.authorized_events = get_user_events()
         self.anonymous_events = get_anonymous_events()
+        self._build_dispatch()
+
+    def _build_dispatch(self):
+        """Maps every known (component, action) pair to the event it
+        fires, whether it needs a logged in user and its rate limit key"""
+
+        self._dispatch = {}
+
+        # Anonymous events take precedence, so they are added last
+        for authorized, events in ((True, self.authorized_events),
+                                   (False, self.anonymous_events)):
+            for component, actions in events.items():
+                for action, item in actions.items():
+                    self._dispatch[component, action] = Dispatch(
+                        item['event'], authorized, component + '.' + action
+                    )
+
+        self.log('Dispatch table built with', len(self._dispatch),
+                 'events', lvl=debug)
 
     @handler("disconnect", channel="wsserver")
     def disconnect(self, sock):
@@ -181,6 +282,9 @@ class ClientManager(ConfigurableComponent):
                 del self._clients[clientuuid]
                 self.log("Deleting Socket", lvl=debug)
                 del self._sockets[sock]
+                self._ratelimiter.forget(clientuuid)
+                self._limited.discard(clientuuid)
+                self._requeststats.forget(sock)
         except Exception as e:
             self.log("Error during disconnect handling: ", e, type(e),
                      lvl=critical)
@@ -214,7 +318,9 @@ class ClientManager(ConfigurableComponent):
             if sock not in self._sockets:
                 self.log("New client connected:", ip, lvl=debug)
                 clientuuid = str(uuid4())
-                self._sockets[sock] = Socket(ip, clientuuid)
+                outbox = Outbox(self.config.outbound_bytes,
+                                self.config.outbound_messages)
+                self._sockets[sock] = Socket(ip, clientuuid, outbox)
                 # Key uuid is temporary, until signin, will then be replaced
                 #  with account uuid
 
@@ -233,52 +339,294 @@ class ClientManager(ConfigurableComponent):
         except Exception as e:
             self.log("Error during connect: ", e, type(e), lvl=critical)
 
+    def _get_transport(self):
+        """Finds the socket server the websocket connections run on"""
+
+        if self._transport is None:
+            for server in findtype(self.root, Server, all=True):
+                if server.channel == "web":
+                    self._transport = server
+                    break
+
+        return self._transport
+
+    def _get_compression(self, sock):
+        """Returns compression statistics of a websocket connection"""
+
+        if self._dispatcher is None:
+            self._dispatcher = findtype(self.root, DeflateWebSocketsDispatcher)
+
+        if self._dispatcher is None:
+            return None
+
+        return self._dispatcher.stats(sock)
+
+    def _write(self, sock, data, coalesce=None, droppable=False):
+        """Queues a message for a socket and transmits as much as the
+        connection currently takes"""
+
+        self._requeststats.answered(sock)
+
+        socket = self._sockets.get(sock, None)
+
+        if socket is None or socket.outbox is None:
+            self.fireEvent(write(sock, data), "wsserver")
+            return
+
+        socket.outbox.put(data, coalesce, droppable)
+        self._flush(sock, socket)
+
+        if len(socket.outbox) > 0:
+            self._schedule_flush()
+
+    def _flush(self, sock, socket):
+        """Hands queued messages to the transport, until the socket's
+        transmissions in flight reach the watermark"""
+
+        outbox = socket.outbox
+        watermark = self.config.outbound_watermark
+
+        while len(outbox) > 0 and socket.inflight < watermark:
+            data = outbox.get()
+            socket.inflight += len(data)
+
+            transmission = write(sock, data)
+            transmission.complete = True
+            self.fireEvent(transmission, "wsserver")
+
+    def _schedule_flush(self):
+        """Arms the outbox check, unless it is already pending"""
+
+        if self._outbox_flusher is None:
+            self._outbox_flusher = Timer(0.1, flush_outboxes(),
+                                         self.channel).register(self)
+
+    @handler("write_complete", channel="wsserver")
+    def write_complete(self, transmission, *args):
+        """Accounts transmissions taken over by the transport and hands it
+        the next held back messages"""
+
+        sock, data = transmission.args[:2]
+        socket = self._sockets.get(sock, None)
+
+        if socket is None or socket.outbox is None:
+            return
+
+        socket.inflight = max(0, socket.inflight - len(data))
+        self._flush(sock, socket)
+
+    @handler('flush_outboxes')
+    def flush_outboxes(self, *args):
+        """Transmits held back messages and disconnects clients that stay
+        over their outbound queue limits for too long"""
+
+        self._outbox_flusher = None
+
+        now = time()
+        grace = self.config.outbound_grace
+        queued = False
+
+        for sock, socket in list(self._sockets.items()):
+            outbox = socket.outbox
+            if outbox is None or len(outbox) == 0:
+                continue
+
+            self._flush(sock, socket)
+
+            if outbox.over_limit is not None and \
+                    now - outbox.over_limit > grace:
+                self.log('Disconnecting slow client:', socket.clientuuid,
+                         socket.ip, len(outbox), outbox.bytes, lvl=warn)
+                outbox.clear()
+
+                transport = self._get_transport()
+                if transport is not None:
+                    self.fireEvent(close(sock), transport.channel)
+
+            if len(outbox) > 0:
+                queued = True
+
+        # Checks stop, once every outbox is drained
+        if queued:
+            self._schedule_flush()
+
+    def _encode(self, packet, sock, encoded=None):
+        """Encodes a packet in the framing negotiated for a socket
+
+        :param encoded: Optional dictionary to reuse encodings by framing
+        """
+
+        try:
+            framing = self._sockets[sock].framing
+        except (KeyError, AttributeError):
+            framing = 'json'
+
+        if encoded is None:
+            return encode(packet, framing)
+
+        if framing not in encoded:
+            encoded[framing] = encode(packet, framing)
+
+        return encoded[framing]
+
+    def _set_framing(self, sock, framing):
+        """Switches a socket to a negotiated packet framing, after
+        confirming it in the socket's current framing"""
+
+        if sock not in self._sockets:
+            return
+
+        accepted = framing in available()
+
+        packet = {
+            'component': 'auth',
+            'action': 'protocol',
+            'data': {
+                'protocol': framing if accepted else False,
+                'available': available()
+            }
+        }
+        self._write(sock, self._encode(packet, sock))
+
+        if accepted:
+            self.log('Switching client to', framing, 'framing',
+                     lvl=debug)
+            self._sockets[sock].framing = framing
+        else:
+            self.log('Unsupported framing requested:', framing, lvl=warn)
+
+    def _set_batching(self, sock, window):
+        """Enables or disables batched delivery for a socket
+
+        :param window: Milliseconds to collect packets for, 0 to collect the
+                       packets of one event loop iteration, None or False to
+                       disable batching
+        """
+
+        if sock not in self._sockets:
+            return
+
+        try:
+            if window is None or window is False:
+                batch = None
+            else:
+                batch = min(max(float(window), 0), 1000) / 1000.0
+        except (ValueError, TypeError):
+            self.log('Invalid batching window requested:', window, lvl=warn)
+            batch = None
+
+        socket = self._sockets[sock]
+
+        if batch is None and socket.batched:
+            self.flush_batch(sock)
+
+        socket.batch = batch
+
+        packet = {
+            'component': 'auth',
+            'action': 'batch',
+            'data': batch * 1000 if batch is not None else False
+        }
+        self._write(sock, self._encode(packet, sock))
+
+        self.log('Batching for client', socket.clientuuid, 'set to', batch,
+                 lvl=debug)
+
+    def _deliver(self, sock, packet, encoded=None, coalesce=None,
+                 droppable=False):
+        """Transmits a packet, or adds it to the socket's batch, if the
+        client asked for batched delivery"""
+
+        socket = self._sockets.get(sock, None)
+
+        if socket is None or socket.batch is None:
+            self._write(sock, self._encode(packet, sock, encoded), coalesce,
+                        droppable)
+            return
+
+        if len(socket.batched) == 0:
+            if socket.batch > 0:
+                Timer(socket.batch, flush_batch(sock),
+                      self.channel).register(self)
+            else:
+                self.fireEvent(flush_batch(sock))
+
+        if coalesce is not None:
+            socket.batched = [(key, item) for key, item in socket.batched
+                              if key != coalesce]
+
+        socket.batched.append((coalesce, packet))
+
+    @handler('flush_batch')
+    def flush_batch(self, sock):
+        """Transmits the packets collected for a socket in one frame"""
+
+        socket = self._sockets.get(sock, None)
+
+        if socket is None or len(socket.batched) == 0:
+            return
+
+        packets = [packet for key, packet in socket.batched]
+        socket.batched = []
+
+        if len(packets) == 1:
+            packet = packets[0]
+        else:
+            packet = {
+                'component': 'hfos.ui.clientmanager',
+                'action': 'batch',
+                'data': packets
+            }
+
+        self._write(sock, self._encode(packet, sock))
+
     def send(self, event):
         """Sends a packet to an already known user or one of his clients by
         UUID"""
 
         try:
-            jsonpacket = json.dumps(event.packet, cls=ComplexEncoder)
+            encoded = {}
             if event.sendtype == "user":
-                # TODO: I think, caching a user name <-> uuid table would
-                # make sense instead of looking this up all the time.
-
-                if event.uuid is None:
-                    userobject = objectmodels['user'].find_one({
-                        'name': event.username
-                    })
+                # Only connected users can receive anything, so names are
+                # resolved among them instead of in the database
+                if event.uuid is not None:
+                    userobject = self._users.get(event.uuid, None)
                 else:
-                    userobject = objectmodels['user'].find_one({
-                        'uuid': event.uuid
-                    })
+                    userobject = None
+                    for user in self._users.values():
+                        if getattr(user.account, 'name', None) == \
+                                event.username:
+                            userobject = user
+                            break
 
                 if userobject is None:
-                    self.log("No user by that name known.", lvl=warn)
+                    if not event.fail_quiet:
+                        self.log("User not connected!", event.uuid,
+                                 event.username, lvl=critical)
                     return
-                else:
-                    uuid = userobject.uuid
+
+                uuid = userobject.uuid
 
                 self.log("Broadcasting to all of users clients: '%s': '%s" % (
                     uuid, str(event.packet)[:20]), lvl=network)
-                if uuid not in self._users:
-                    self.log("User not connected!", event, lvl=critical)
-                    return
                 clients = self._users[uuid].clients
 
                 for clientuuid in clients:
                     sock = self._clients[clientuuid].sock
 
                     if not event.raw:
-                        self.log("Sending json to client", jsonpacket[:50],
-                                 lvl=network)
+                        self.log("Sending packet to client",
+                                 str(event.packet)[:50], lvl=network)
 
-                        self.fireEvent(write(sock, jsonpacket), "wsserver")
+                        self._deliver(sock, event.packet, encoded,
+                                      event.coalesce, event.droppable)
                     else:
                         self.log("Sending raw data to client")
-                        self.fireEvent(write(sock, event.packet), "wsserver")
+                        self._write(sock, event.packet, event.coalesce,
+                                    event.droppable)
             else:  # only to client
                 self.log("Sending to user's client: '%s': '%s'" % (
-                    event.uuid, jsonpacket[:20]), lvl=network)
+                    event.uuid, str(event.packet)[:20]), lvl=network)
                 if event.uuid not in self._clients:
                     if not event.fail_quiet:
                         self.log("Unknown client!", event.uuid, lvl=critical)
@@ -287,15 +635,64 @@ class ClientManager(ConfigurableComponent):
 
                 sock = self._clients[event.uuid].sock
                 if not event.raw:
-                    self.fireEvent(write(sock, jsonpacket), "wsserver")
+                    self._deliver(sock, event.packet, None, event.coalesce,
+                                  event.droppable)
                 else:
                     self.log("Sending raw data to client", lvl=network)
-                    self.fireEvent(write(sock, event.packet[:20]), "wsserver")
+                    self._write(sock, event.packet, event.coalesce,
+                                event.droppable)
 
         except Exception as e:
             self.log("Exception during sending: %s (%s)" % (e, type(e)),
                      lvl=critical, exc=True)
 
+    def multicast(self, event):
+        """Sends one packet to a list of clients or users by UUID
+
+        The packet is only encoded once and every socket is written to only
+        once, even if it belongs to more than one recipient. Unknown or
+        offline recipients are skipped.
+        """
+
+        try:
+            encoded = {}
+            sockets = []
+
+            for uuid in event.recipients:
+                if event.sendtype == "user":
+                    if uuid not in self._users:
+                        self.log("User not connected:", uuid, lvl=verbose)
+                        continue
+                    clients = self._users[uuid].clients
+                else:
+                    clients = [uuid]
+
+                for clientuuid in clients:
+                    if clientuuid not in self._clients:
+                        if not event.fail_quiet:
+                            self.log("Unknown client!", clientuuid,
+                                     lvl=warn)
+                        continue
+
+                    sock = self._clients[clientuuid].sock
+                    if sock not in sockets:
+                        sockets.append(sock)
+
+            self.log("Multicasting to %i sockets: '%s'" % (
+                len(sockets), str(event.packet)[:20]), lvl=network)
+
+            for sock in sockets:
+                if event.raw:
+                    self._write(sock, event.packet, event.coalesce,
+                                event.droppable)
+                else:
+                    self._deliver(sock, event.packet, encoded,
+                                  event.coalesce, event.droppable)
+
+        except Exception as e:
+            self.log("Exception during multicast: %s (%s)" % (e, type(e)),
+                     lvl=critical, exc=True)
+
     def broadcast(self, event):
         """Broadcasts an event either to all users or clients, depending on
         event flag"""
@@ -304,9 +701,9 @@ class ClientManager(ConfigurableComponent):
                 if len(self._users) > 0:
                     self.log("Broadcasting to all users:",
                              event.content, lvl=network)
-                    for useruuid in self._users.keys():
-                        self.fireEvent(
-                            send(useruuid, event.content, sendtype="user"))
+                    self.fireEvent(
+                        multicast([useruuid for useruuid in self._users],
+                                  event.content, sendtype="user"))
                         # else:
                         #    self.log("Not broadcasting, no users connected.",
                         #            lvl=debug)
@@ -316,8 +713,7 @@ class ClientManager(ConfigurableComponent):
                     self.log("Broadcasting to all clients: ",
                              event.content, lvl=network)
                     for client in self._clients.values():
-                        self.fireEvent(write(client.sock, event.content),
-                                       "wsserver")
+                        self._write(client.sock, event.content)
                         # else:
                         #    self.log("Not broadcasting, no clients
                         # connected.",
@@ -336,50 +732,48 @@ class ClientManager(ConfigurableComponent):
         except Exception as e:
             self.log("Error during broadcast: ", e, type(e), lvl=critical)
 
-    def _handleAuthorizedEvents(self, component, action, data, user, client):
+    def _handleAuthorizedEvents(self, dispatch, action, data, user, client):
         """Isolated communication link for authorized events."""
 
         try:
-            if component == "debugger":
-                self.log(component, action, data, user, client, lvl=info)
-
-            if not user and component in self.authorized_events.keys():
-                self.log("Unknown client tried to do an authenticated "
-                         "operation: %s",
-                         component, action, data, user)
-                return
-
-            event = self.authorized_events[component][action]['event']
-
-            self.log("Firing authorized event: ", component, action,
-                     str(data)[:20], lvl=network)
+            if verbosity['global'] <= network:
+                self.log("Firing authorized event: ", dispatch.key,
+                         str(data)[:20], lvl=network)
             # self.log("", (user, action, data, client), lvl=critical)
-            self.fireEvent(event(user, action, data, client))
+            self.fireEvent(dispatch.event(user, action, data, client))
         except Exception as e:
             self.log("Critical error during authorized event handling:",
-                     component, action, e,
-                     type(e), lvl=critical, exc=True)
+                     dispatch.key, e, type(e), lvl=critical, exc=True)
 
-    def _handleAnonymousEvents(self, component, action, data, client):
+    def _handleAnonymousEvents(self, dispatch, action, data, client):
         try:
-            event = self.anonymous_events[component][action]['event']
-
-            self.log("Firing anonymous event: ", component, action,
-                     str(data)[:20], lvl=network)
+            if verbosity['global'] <= network:
+                self.log("Firing anonymous event: ", dispatch.key,
+                         str(data)[:20], lvl=network)
             # self.log("", (user, action, data, client), lvl=critical)
-            self.fireEvent(event(action, data, client))
+            self.fireEvent(dispatch.event(action, data, client))
         except Exception as e:
             self.log("Critical error during anonymous event handling:",
-                     component, action, e,
-                     type(e), lvl=critical, exc=True)
+                     dispatch.key, e, type(e), lvl=critical, exc=True)
 
     def _handleAuthenticationEvents(self, requestdata, requestaction,
                                     clientuuid, sock):
         # TODO: Move this stuff over to ./auth.py
-        if requestaction in ("login", "autologin"):
+        if requestaction == "protocol":
+            self._set_framing(sock, requestdata)
+        elif requestaction == "batch":
+            self._set_batching(sock, requestdata)
+        elif requestaction in ("login", "autologin"):
             try:
                 self.log("Login request", lvl=verbose)
 
+                if isinstance(requestdata, dict) and \
+                        'protocol' in requestdata:
+                    self._set_framing(sock, requestdata['protocol'])
+                if isinstance(requestdata, dict) and \
+                        'batch' in requestdata:
+                    self._set_batching(sock, requestdata['batch'])
+
                 if requestaction == "autologin":
                     username = password = None
                     requestedclientuuid = requestdata
@@ -428,34 +822,67 @@ class ClientManager(ConfigurableComponent):
             self.log("Unsupported auth action requested:",
                      requestaction, lvl=warn)
 
-    @handler('reset_flood_counters')
-    def _reset_flood_counters(self, *args):
-        # self.log('Resetting flood counter')
-        self._flood_counter = {}
-
-    @handler('reset_flood_offenders')
-    def _reset_flood_offenders(self, *args):
-        # self.log('Resetting flood offenders')
-        for offender, offence_time in self._flooding.items():
-            if time() - offence_time < 10:
-                self.log('Removed offender from flood list:', offender)
-                del self._flooding[offender]
+    def _check_flood_protection(self, key, clientuuid):
+        """Returns True, if a request exceeds the client's rate limits"""
 
-    def _check_flood_protection(self, component, action, clientuuid):
-        if clientuuid not in self._flood_counter:
-            self._flood_counter[clientuuid] = 0
+        if self._ratelimiter.check(clientuuid, key):
+            self._limited.discard(clientuuid)
+            return False
 
-        self._flood_counter[clientuuid] += 1
+        if clientuuid not in self._limited:
+            self._limited.add(clientuuid)
 
-        if self._flood_counter[clientuuid] > 100:
             packet = {
                 'component': 'hfos.ui.clientmanager',
                 'action': 'Flooding',
                 'data': True
             }
-            self.fireEvent(send(clientuuid, packet))
-            self.log('Flooding from', clientuuid)
-            return True
+            self.fireEvent(send(clientuuid, packet, fail_quiet=True))
+            self.log('Flooding from', clientuuid, key, lvl=warn)
+
+        return True
+
+    @handler('cli_ratelimits')
+    def ratelimits(self, *args):
+        Row = namedtuple("Row", ['Event', 'Rate', 'Burst', 'Rejected'])
+        rows = [Row('* (all requests)', str(self._ratelimiter.rate),
+                    str(self._ratelimiter.burst),
+                    str(self._ratelimiter.rejections.get('*', 0)))]
+
+        for key, limit in sorted(self._ratelimiter.limits.items()):
+            rows.append(Row(key, str(limit['rate']), str(limit['burst']),
+                            str(self._ratelimiter.rejections.get(key, 0))))
+
+        self.log("\n" + std_table(rows))
+
+    @handler('cli_requests')
+    def requests(self, *args):
+        Row = namedtuple("Row", ['Event', 'Requests', 'Answered', 'Mean',
+                                 'P50', 'P90', 'P99', 'Max'])
+        rows = []
+
+        stats = self._requeststats
+        for key in sorted(stats.requests):
+            histogram = stats.latencies.get(key, None)
+            if histogram is None:
+                rows.append(Row(key, str(stats.requests[key]), '0',
+                                '-', '-', '-', '-', '-'))
+                continue
+
+            rows.append(Row(
+                key, str(stats.requests[key]), str(histogram.count),
+                "%.1f" % histogram.mean,
+                "%.1f" % histogram.percentile(50),
+                "%.1f" % histogram.percentile(90),
+                "%.1f" % histogram.percentile(99),
+                "%.1f" % histogram.max
+            ))
+
+        if len(rows) == 0:
+            self.log("No requests received yet.")
+            return
+
+        self.log("Request latencies (ms):\n" + std_table(rows))
 
     @handler("read", channel="wsserver")
     def read(self, *args):
@@ -472,14 +899,20 @@ class ClientManager(ConfigurableComponent):
         except Exception as e:
             self.log("Receiving error: ", e, type(e), lvl=error)
 
-        if clientuuid in self._flooding:
-            return
+        try:
+            framing = self._sockets[sock].framing
+        except (KeyError, AttributeError):
+            framing = 'json'
 
         try:
-            msg = json.loads(msg)
+            # Text frames are always JSON encoded
+            if not isinstance(msg, bytes) or framing == 'json':
+                msg = decode(msg)
+            else:
+                msg = decode(msg, framing)
             self.log("Message from client received: ", msg, lvl=network)
         except Exception as e:
-            self.log("JSON Decoding failed! %s (%s of %s)" % (msg, e, type(e)))
+            self.log("Decoding failed! %s (%s of %s)" % (msg, e, type(e)))
             return
 
         try:
@@ -489,66 +922,62 @@ class ClientManager(ConfigurableComponent):
             self.log("Unpacking error: ", msg, e, type(e), lvl=error)
             return
 
-        if self._check_flood_protection(requestcomponent, requestaction,
-                                        clientuuid):
-            self.log('Flood protection triggered')
-            self._flooding[clientuuid] = time()
+        try:
+            dispatch = self._dispatch[requestcomponent, requestaction]
+            key = dispatch.key
+        except (KeyError, TypeError):
+            dispatch = None
+            key = str(requestcomponent) + '.' + str(requestaction)
+
+        if self._check_flood_protection(key, clientuuid):
+            self.log('Request dropped by rate limit:', key, lvl=verbose)
+            return
 
         try:
             # TODO: Do not unpickle or decode anything from unsafe events
             requestdata = msg['data']
-            if 'raw' in requestdata:
+            if 'raw' in requestdata and \
+                    not isinstance(requestdata['raw'], bytes):
                 # self.log(requestdata['raw'], lvl=critical)
                 requestdata['raw'] = b64decode(requestdata['raw'])
                 # self.log(requestdata['raw'])
-        except (KeyError, AttributeError) as e:
+        except (KeyError, AttributeError, TypeError) as e:
             self.log("No payload.", lvl=network)
             requestdata = None
 
         if requestcomponent == "auth":
+            self._requeststats.started(sock, key)
             self._handleAuthenticationEvents(requestdata, requestaction,
                                              clientuuid, sock)
             return
 
+        if dispatch is None:
+            self.log("Unknown event requested:", key, lvl=warn)
+            return
+
         try:
             client = self._clients[clientuuid]
         except KeyError as e:
             self.log('Could not get client for request!', e, type(e), lvl=warn)
             return
 
-        if requestcomponent in self.anonymous_events and requestaction in \
-                self.anonymous_events[requestcomponent]:
-            self.log('Executing anonymous event:', requestcomponent,
-                     requestaction)
-            try:
-                self._handleAnonymousEvents(requestcomponent, requestaction,
-                                            requestdata, client)
-            except Exception as e:
-                self.log("Anonymous request failed:", e, type(e), lvl=warn,
-                         exc=True)
+        if not dispatch.authorized:
+            self.log('Executing anonymous event:', key, lvl=verbose)
+            self._requeststats.started(sock, key)
+            self._handleAnonymousEvents(dispatch, requestaction,
+                                        requestdata, client)
             return
 
-        elif requestcomponent in self.authorized_events:
-            try:
-                useruuid = client.useruuid
-                self.log("Authenticated operation requested by ",
-                         client.config, lvl=network)
-            except Exception as e:
-                self.log("No useruuid!", e, type(e), lvl=critical)
-                return
-
-            try:
-                user = self._users[useruuid]
-            except KeyError:
-                self.log("User not logged in.", lvl=warn)
-                return
+        try:
+            user = self._users[client.useruuid]
+        except KeyError:
+            self.log("Unknown client tried to do an authenticated "
+                     "operation:", key, client.useruuid, lvl=warn)
+            return
 
-            try:
-                self._handleAuthorizedEvents(requestcomponent, requestaction,
-                                             requestdata, user, client)
-            except Exception as e:
-                self.log("User request failed: ", e, type(e), lvl=warn,
-                         exc=True)
+        self._requeststats.started(sock, key)
+        self._handleAuthorizedEvents(dispatch, requestaction, requestdata,
+                                     user, client)
 
     @handler("authentication", channel="auth")
     def authentication(self, event):
@@ -612,24 +1041,20 @@ class ClientManager(ConfigurableComponent):
                           "data": account.serializablefields()}
             self.log("Transmitting Authorization to client", authpacket,
                      lvl=network)
-            self.fireEvent(
-                write(event.sock, json.dumps(authpacket)),
-                "wsserver"
-            )
+            self._write(event.sock, self._encode(authpacket, event.sock))
 
             profilepacket = {"component": "profile", "action": "get",
                              "data": profile.serializablefields()}
             self.log("Transmitting Profile to client", profilepacket,
                      lvl=network)
-            self.fireEvent(write(event.sock, json.dumps(profilepacket)),
-                           "wsserver")
+            self._write(event.sock, self._encode(profilepacket, event.sock))
 
             clientconfigpacket = {"component": "clientconfig", "action": "get",
                                   "data": clientconfig.serializablefields()}
             self.log("Transmitting client configuration to client",
                      clientconfigpacket, lvl=network)
-            self.fireEvent(write(event.sock, json.dumps(clientconfigpacket)),
-                           "wsserver")
+            self._write(event.sock,
+                        self._encode(clientconfigpacket, event.sock))
 
             self.fireEvent(userlogin(clientuuid, useruuid))
 
@@ -29,27 +29,131 @@ Contains
 --------
 
 Socket:
+Outbox:
 Client:
 User:
 
 
 """
 
+from collections import deque
+from time import time
+
 
 class Socket(object):
     """
     Socket metadata object
     """
 
-    def __init__(self, ip, clientuuid):
+    def __init__(self, ip, clientuuid, outbox=None, framing='json',
+                 batch=None):
         """
 
         :param ip: Associated Internet protocol address
         :param clientuuid: Unique Uniform ID of this client
+        :param outbox: Outbound message queue of this socket
+        :param framing: Negotiated packet encoding
+        :param batch: Seconds to collect packets for batched delivery
         """
         super(Socket, self).__init__()
         self.ip = ip
         self.clientuuid = clientuuid
+        self.outbox = outbox
+        self.framing = framing
+        self.batch = batch
+        self.batched = []
+        # Bytes handed out for transmission, but not yet taken over by the
+        # transport
+        self.inflight = 0
+
+
+class Outbox(object):
+    """
+    Bounded outbound message queue of a single socket
+
+    Messages with a coalescing key replace an already queued message with
+    the same key. When the queue exceeds its limits, the oldest droppable
+    messages are dropped. If that does not suffice, the time since the queue
+    is over its limits is recorded in over_limit.
+    """
+
+    def __init__(self, max_bytes, max_messages):
+        """
+
+        :param max_bytes: Maximum amount of queued data
+        :param max_messages: Maximum amount of queued messages
+        """
+        super(Outbox, self).__init__()
+
+        self.max_bytes = max_bytes
+        self.max_messages = max_messages
+
+        self._queue = deque()
+        self.bytes = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.over_limit = None
+
+    def __len__(self):
+        return len(self._queue)
+
+    def full(self):
+        return self.bytes > self.max_bytes or \
+            len(self._queue) > self.max_messages
+
+    def put(self, data, coalesce=None, droppable=False):
+        """Queues a message
+
+        :param data: Encoded message
+        :param coalesce: Key of messages that supersede each other
+        :param droppable: Message may be dropped when the queue is full
+        """
+
+        if coalesce is not None:
+            droppable = True
+
+            for index, entry in enumerate(self._queue):
+                if entry[1] == coalesce:
+                    del self._queue[index]
+                    self.bytes -= entry[0]
+                    self.coalesced += 1
+                    break
+
+        size = len(data)
+        self._queue.append((size, coalesce, droppable, data))
+        self.bytes += size
+
+        if self.full():
+            for entry in [item for item in self._queue if item[2]]:
+                self._queue.remove(entry)
+                self.bytes -= entry[0]
+                self.dropped += 1
+
+                if not self.full():
+                    break
+
+        self._check_limits()
+
+    def get(self):
+        """Removes and returns the oldest queued message"""
+
+        size, coalesce, droppable, data = self._queue.popleft()
+        self.bytes -= size
+
+        self._check_limits()
+
+        return data
+
+    def clear(self):
+        self._queue.clear()
+        self.bytes = 0
+        self.over_limit = None
+
+    def _check_limits(self):
+        if not self.full():
+            self.over_limit = None
+        elif self.over_limit is None:
+            self.over_limit = time()
 
 
 class Client(object):
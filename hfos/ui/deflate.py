@@ -0,0 +1,352 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# HFOS - Hackerfleet Operating System
+# ===================================
+# Copyright (C) 2011-2017 Heiko 'riot' Weinen <riot@c-base.org> and others.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Heiko 'riot' Weinen"
+__license__ = "GPLv3"
+
+"""
+
+Module: Deflate
+===============
+
+permessage-deflate (RFC 7692) support for the websocket endpoint.
+
+The dispatcher negotiates the extension during the opening handshake and
+attaches a codec to the connection, that compresses outgoing messages above
+a minimum size and inflates compressed incoming ones. Each connection keeps
+its compressor and decompressor (and with them the sliding window) across
+messages, unless the client asked for no context takeover.
+
+
+"""
+
+import zlib
+
+from collections import deque
+
+from circuits import handler
+from circuits.protocols.websocket import WebSocketCodec
+from circuits.web.websockets.dispatcher import WebSocketsDispatcher
+
+from hfos.logger import hfoslog, debug
+
+EXTENSION = 'permessage-deflate'
+TRAILER = b'\x00\x00\xff\xff'
+
+
+class PerMessageDeflate(object):
+    """Negotiated compression state of a single connection"""
+
+    def __init__(self, server_window_bits=15, client_window_bits=15,
+                 server_no_context_takeover=False,
+                 client_no_context_takeover=False, min_size=256, level=6):
+        super(PerMessageDeflate, self).__init__()
+
+        self.server_window_bits = server_window_bits
+        self.client_window_bits = client_window_bits
+        self.server_no_context_takeover = server_no_context_takeover
+        self.client_no_context_takeover = client_no_context_takeover
+        self.min_size = min_size
+        self.level = level
+
+        self._compressor = None
+        self._decompressor = None
+
+        self.messages = 0
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+
+    def compress(self, data):
+        if self._compressor is None or self.server_no_context_takeover:
+            self._compressor = zlib.compressobj(self.level, zlib.DEFLATED,
+                                                -self.server_window_bits)
+
+        result = self._compressor.compress(bytes(data)) + \
+            self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+        if result.endswith(TRAILER):
+            result = result[:-4]
+
+        self.messages += 1
+        self.raw_bytes += len(data)
+        self.compressed_bytes += len(result)
+
+        return result
+
+    def decompress(self, data):
+        if self._decompressor is None or self.client_no_context_takeover:
+            self._decompressor = zlib.decompressobj(-self.client_window_bits)
+
+        return self._decompressor.decompress(bytes(data) + TRAILER)
+
+    def stats(self):
+        """Returns compressed message count, byte counts and ratio"""
+
+        if self.raw_bytes > 0:
+            ratio = float(self.compressed_bytes) / self.raw_bytes
+        else:
+            ratio = 1.0
+
+        return {
+            'messages': self.messages,
+            'raw': self.raw_bytes,
+            'compressed': self.compressed_bytes,
+            'ratio': ratio
+        }
+
+
+def _parse_offers(header):
+    offers = []
+
+    for offer in header.split(','):
+        parts = [part.strip() for part in offer.split(';')]
+        if parts[0] != EXTENSION:
+            continue
+
+        params = {}
+        for part in parts[1:]:
+            if '=' in part:
+                key, value = part.split('=', 1)
+                params[key.strip()] = value.strip().strip('"')
+            elif part:
+                params[part] = None
+
+        offers.append(params)
+
+    return offers
+
+
+def negotiate(header, window_bits=15, min_size=256):
+    """Picks the first acceptable permessage-deflate offer of a client
+
+    :param header: Sec-WebSocket-Extensions header sent by the client
+    :param window_bits: Largest window size (9-15) the server uses
+    :param min_size: Messages below this size are sent uncompressed
+    :return: Compression state and extension response header or None, None
+    """
+
+    for params in _parse_offers(header):
+        known = ('server_no_context_takeover', 'client_no_context_takeover',
+                 'server_max_window_bits', 'client_max_window_bits')
+        if any(key not in known for key in params):
+            continue
+
+        response = [EXTENSION]
+        server_bits = window_bits
+        client_bits = 15
+
+        try:
+            if 'server_max_window_bits' in params:
+                requested = int(params['server_max_window_bits'])
+                if not 8 <= requested <= 15:
+                    continue
+                server_bits = min(server_bits, requested)
+
+            if 'client_max_window_bits' in params and \
+                    params['client_max_window_bits'] is not None:
+                client_bits = int(params['client_max_window_bits'])
+                if not 8 <= client_bits <= 15:
+                    continue
+        except ValueError:
+            continue
+
+        # zlib cannot produce raw deflate streams with 256 byte windows
+        if server_bits < 9:
+            continue
+
+        if 'server_no_context_takeover' in params:
+            response.append('server_no_context_takeover')
+        if 'client_no_context_takeover' in params:
+            response.append('client_no_context_takeover')
+        if server_bits < 15:
+            response.append('server_max_window_bits=%i' % server_bits)
+        if 'client_max_window_bits' in params and client_bits < 15:
+            response.append('client_max_window_bits=%i' % client_bits)
+
+        deflate = PerMessageDeflate(
+            server_window_bits=server_bits,
+            client_window_bits=client_bits,
+            server_no_context_takeover='server_no_context_takeover' in params,
+            client_no_context_takeover='client_no_context_takeover' in params,
+            min_size=min_size
+        )
+
+        return deflate, '; '.join(response)
+
+    return None, None
+
+
+class DeflateWebSocketCodec(WebSocketCodec):
+    """WebSocket codec with permessage-deflate compression
+
+    Frames are parsed by the circuits codec. Compressed messages are only
+    marked before and inflated after that.
+    """
+
+    def __init__(self, sock=None, data=bytearray(), deflate=None, *args,
+                 **kwargs):
+        # Needed by the parser, which already runs during construction
+        self._deflate = deflate
+        self._messages = deque()
+
+        super(DeflateWebSocketCodec, self).__init__(sock, data, *args,
+                                                    **kwargs)
+
+    def _mark_compressed(self, data):
+        """Records for every message started in the complete frames of data,
+        whether it is compressed and text. Compressed text frames are
+        relabeled as binary, so the parser leaves their payload alone."""
+
+        offset = 0
+        while len(data) - offset >= 2:
+            first = data[offset]
+            length = data[offset + 1] & 0x7F
+            header = 2
+
+            if length >= 126:
+                length_bytes = 2 if length == 126 else 8
+                if len(data) - offset < header + length_bytes:
+                    return
+                length = 0
+                for i in range(length_bytes):
+                    length = length * 256 + data[offset + header + i]
+                header += length_bytes
+
+            if data[offset + 1] & 0x80:
+                header += 4
+
+            if len(data) - offset < header + length:
+                return
+
+            opcode = first & 0xF
+            if opcode in (1, 2):
+                compressed = bool(first & 0x40) and self._deflate is not None
+                self._messages.append((compressed, opcode == 1))
+                if compressed:
+                    data[offset] = (first & ~0x4F) | 2
+
+            offset += header + length
+
+    def _parse_messages(self, data):
+        data = self._buffer + data
+        self._buffer = bytearray()
+
+        self._mark_compressed(data)
+
+        msgs = super(DeflateWebSocketCodec, self)._parse_messages(data)
+
+        if not msgs:
+            return msgs
+
+        result = []
+        for msg in msgs:
+            compressed, text = self._messages.popleft()
+            if compressed:
+                msg = bytearray(self._deflate.decompress(msg))
+                if text:
+                    msg = msg.decode('utf-8', 'replace')
+            result.append(msg)
+
+        return result
+
+    @handler('write', override=True)
+    def _on_write(self, *args):
+        if self._close_sent:
+            return
+
+        if self._sock is not None:
+            if args[0] != self._sock:
+                return
+            data = args[1]
+        else:
+            data = args[0]
+
+        frame = bytearray()
+        first = 0x80  # FIN, messages are never fragmented
+        if isinstance(data, str):
+            first += 1  # text
+            data = bytearray(data, 'utf-8')
+        else:
+            first += 2  # binary
+
+        if self._deflate is not None and len(data) >= self._deflate.min_size:
+            first += 0x40  # RSV1 marks compressed messages
+            data = bytearray(self._deflate.compress(data))
+
+        frame.append(first)
+        frame += self._encode_tail(data, self._sock is None)
+        self._write(frame)
+
+
+class DeflateWebSocketsDispatcher(WebSocketsDispatcher):
+    """WebSockets dispatcher negotiating permessage-deflate"""
+
+    def __init__(self, path=None, wschannel='wsserver', window_bits=15,
+                 min_size=256, *args, **kwargs):
+        """
+        :param window_bits: Largest compression window size (9-15)
+        :param min_size: Messages below this size are sent uncompressed
+        """
+        super(DeflateWebSocketsDispatcher, self).__init__(
+            path, wschannel, *args, **kwargs)
+
+        self.window_bits = max(9, min(15, window_bits))
+        self.min_size = min_size
+
+    @handler('request', priority=0.2, override=True)
+    def _on_request(self, event, request, response):
+        result = super(DeflateWebSocketsDispatcher, self)._on_request(
+            event, request, response)
+
+        if response.status != 101 or request.sock not in self._codecs:
+            return result
+
+        deflate, extension = negotiate(
+            request.headers.get('Sec-WebSocket-Extensions', ''),
+            self.window_bits, self.min_size
+        )
+
+        if extension is None:
+            return result
+
+        hfoslog('Compressing connection:', extension, lvl=debug, emitter='WS')
+        response.headers['Sec-WebSocket-Extensions'] = extension
+
+        # The handshake set up a plain codec, that has not seen any data yet
+        self._codecs[request.sock].unregister()
+        codec = DeflateWebSocketCodec(request.sock, deflate=deflate,
+                                      channel=self._wschannel)
+        self._codecs[request.sock] = codec
+        codec.register(self)
+
+        return result
+
+    def stats(self, sock):
+        """Returns the compression statistics of a connection or None"""
+
+        try:
+            deflate = self._codecs[sock]._deflate
+        except (KeyError, AttributeError):
+            return None
+
+        if deflate is None:
+            return None
+
+        return deflate.stats()
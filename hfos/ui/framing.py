@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# HFOS - Hackerfleet Operating System
+# ===================================
+# Copyright (C) 2011-2017 Heiko 'riot' Weinen <riot@c-base.org> and others.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Heiko 'riot' Weinen"
+__license__ = "GPLv3"
+
+"""
+
+Module: Framing
+===============
+
+Encodings of the client protocol's {component, action, data} packets.
+
+JSON is the default and always available. MessagePack and CBOR framings
+are offered when the msgpack or cbor2 packages are installed. They are sent
+as binary websocket frames and carry raw (bytes) payloads natively.
+
+
+"""
+
+import datetime
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+
+class ComplexEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, datetime.time):
+            return obj.isoformat()
+            # Let the base class default method raise the TypeError
+        return json.JSONEncoder.default(self, obj)
+
+
+def _json_encode(packet):
+    return json.dumps(packet, cls=ComplexEncoder)
+
+
+def _json_decode(data):
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    return json.loads(data)
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, datetime.time):
+        return obj.isoformat()
+    raise TypeError("Cannot serialize %r" % obj)
+
+
+def _msgpack_encode(packet):
+    return msgpack.packb(packet, default=_msgpack_default, use_bin_type=True)
+
+
+def _msgpack_decode(data):
+    return msgpack.unpackb(data, raw=False)
+
+
+def _cbor_default(encoder, obj):
+    if isinstance(obj, datetime.time):
+        encoder.encode(obj.isoformat())
+    else:
+        raise TypeError("Cannot serialize %r" % obj)
+
+
+def _cbor_encode(packet):
+    return cbor2.dumps(packet, default=_cbor_default)
+
+
+def _cbor_decode(data):
+    return cbor2.loads(data)
+
+
+framings = {
+    'json': (_json_encode, _json_decode)
+}
+
+if msgpack is not None:
+    framings['msgpack'] = (_msgpack_encode, _msgpack_decode)
+
+if cbor2 is not None:
+    framings['cbor'] = (_cbor_encode, _cbor_decode)
+
+
+def available():
+    """Returns the names of all usable framings"""
+
+    return sorted(framings.keys())
+
+
+def encode(packet, framing='json'):
+    """Encodes a packet, binary framings return bytes"""
+
+    return framings[framing][0](packet)
+
+
+def decode(data, framing='json'):
+    """Decodes a received packet"""
+
+    return framings[framing][1](data)
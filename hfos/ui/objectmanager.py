@@ -36,14 +36,18 @@ from uuid import uuid4
 from hfos.events.objectmanager import objectcreation, objectchange, \
     objectdeletion, list, search, get, change, put, delete, subscribe, \
     unsubscribe
-from hfos.events.client import send
+from hfos.events.client import send, multicast
 from hfos.component import handler, ConfigurableComponent
-from hfos.database import objectmodels, ValidationError, schemastore
+from hfos.database import objectmodels, ValidationError, schemastore, \
+    find_raw, find_chunk
+from hfos import cache as objectcache
 from hfos.logger import verbose, debug, error, warn, critical, hilight
 
 from pprint import pprint
 
 WARNSIZE = 500
+MAXLIMIT = 5000
+CHUNKSIZE = 250
 
 
 class ObjectManager(ConfigurableComponent):
@@ -65,7 +69,13 @@ class ObjectManager(ConfigurableComponent):
     def _check_permissions(self, subject, action, obj):
         self.log('Roles of user:', subject.account.roles, lvl=verbose)
 
-        if 'perms' not in obj._fields:
+        # Accepts model objects as well as plain documents
+        if isinstance(obj, dict):
+            fields = obj
+        else:
+            fields = obj._fields
+
+        if 'perms' not in fields:
             if 'admin' in subject.account.roles:
                 self.log('Access to administrative object granted',
                          lvl=verbose)
@@ -75,23 +85,38 @@ class ObjectManager(ConfigurableComponent):
                          lvl=verbose)
                 return False
 
-        if 'owner' in obj.perms[action]:
-            try:
-                if subject.uuid == obj.owner:
+        if 'owner' in fields['perms'][action]:
+            if 'owner' in fields:
+                if subject.uuid == fields['owner']:
                     self.log('Access granted via ownership', lvl=verbose)
                     return True
-            except AttributeError as e:
+            else:
                 self.log('Schema has ownership permission but no owner:',
-                         obj._schema['name'], obj._fields, e, type(e),
-                         lvl=warn, exc=True)
+                         fields, lvl=warn)
         for role in subject.account.roles:
-            if role in obj.perms[action]:
+            if role in fields['perms'][action]:
                 self.log('Access granted', lvl=verbose)
                 return True
 
         self.log('Access denied', lvl=verbose)
         return False
 
+    def _get_permission_filter(self, subject, action):
+        """Translates the permission check into a database query filter, so
+        objects the subject may not access are not even fetched"""
+
+        roles = [role for role in subject.account.roles]
+
+        permitted = [
+            {'perms.' + action: {'$in': roles}},
+            {'perms.' + action: 'owner', 'owner': subject.uuid}
+        ]
+
+        if 'admin' in roles:
+            permitted.append({'perms': {'$exists': False}})
+
+        return {'$or': permitted}
+
     def _check_create_permission(self, subject, schema):
         for role in subject.account.roles:
             if role in schemastore[schema]['schema']['roles_create']:
@@ -208,40 +233,281 @@ class ObjectManager(ConfigurableComponent):
                 return
             object_filter = {'uuid': uuid}
 
-        storage_object = None
-        storage_object = objectmodels[schema].find_one(object_filter)
+        if object_filter == {'uuid': uuid}:
+            document = objectcache.get_cached_fields(schema, uuid)
+
+            if document is None:
+                result = yield self.dbcall(objectcache.get_fields, schema,
+                                           uuid)
+                document, failure = result.value
+        else:
+            result = yield self.dbcall(
+                objectmodels[schema].collection().find_one, object_filter)
+            document, failure = result.value
 
-        if not storage_object:
+        if not document:
             self._cancel_by_error(event, uuid + ' of ' + schema +
                                   'unavailable')
             return
 
-        if storage_object:
-            self.log("Object found, checking permissions: ", data, lvl=debug)
+        self.log("Object found, checking permissions: ", data, lvl=debug)
 
-            if not self._check_permissions(user, 'read',
-                                           storage_object):
-                self._cancel_by_permission(schema, data, event.client)
-                return
+        if not self._check_permissions(user, 'read', document):
+            self._cancel_by_permission(schema, data, event.client)
+            return
 
-            for field in hidden:
-                storage_object._fields.pop(field, None)
+        document.pop('_id', None)
+        for field in hidden:
+            document.pop(field, None)
 
-            if do_subscribe and uuid != "":
-                self._add_subscription(uuid, event)
+        if do_subscribe and uuid != "":
+            self._add_subscription(uuid, event)
 
-            result = {
-                'component': 'hfos.events.objectmanager',
-                'action': 'get',
-                'data': {
-                    'schema': schema,
-                    'uuid': uuid,
-                    'object': storage_object.serializablefields()
-                }
+        result = {
+            'component': 'hfos.events.objectmanager',
+            'action': 'get',
+            'data': {
+                'schema': schema,
+                'uuid': uuid,
+                'object': document
             }
+        }
 
         self._respond(None, result, event)
 
+    def _get_query_options(self, data):
+        """Extracts paging and sorting options of list/search requests
+
+        :param data: Request data with optional limit, skip and sort entries
+        :return: Keyword arguments for the model query
+        :raise ValueError: On malformed options
+        """
+
+        options = {}
+
+        if data.get('limit', None) is not None:
+            options['limit'] = min(int(data['limit']), MAXLIMIT)
+            if options['limit'] <= 0:
+                raise ValueError('limit must be positive')
+
+        if data.get('skip', None) is not None:
+            options['skip'] = int(data['skip'])
+            if options['skip'] < 0:
+                raise ValueError('skip must not be negative')
+
+        if data.get('sort', None) is not None:
+            sort = data['sort']
+            if not isinstance(sort, (tuple, type([]))):
+                sort = [sort]
+
+            options['sort'] = []
+            for key in sort:
+                if isinstance(key, (tuple, type([]))):
+                    field, direction = key
+                    direction = 1 if int(direction) >= 0 else -1
+                elif key.startswith('-'):
+                    field, direction = key[1:], -1
+                else:
+                    field, direction = key, 1
+
+                options['sort'].append((str(field), direction))
+
+        return options
+
+    def _get_chunk_size(self, data):
+        """Extracts the chunk size of streamed list requests
+
+        :param data: Request data with an optional stream entry, either true
+                     or the number of items per chunk
+        :return: The chunk size or None, if the list is not streamed
+        :raise ValueError: On malformed stream options
+        """
+
+        stream = data.get('stream', None)
+
+        if stream is None or stream is False:
+            return None
+        if stream is True:
+            return CHUNKSIZE
+        if not isinstance(stream, int) or stream <= 0:
+            raise ValueError('stream must be true or a positive chunk size')
+
+        return min(stream, MAXLIMIT)
+
+    def _get_projection(self, fields, hidden):
+        """Translates requested fields into a query projection"""
+
+        if fields in ('*', ['*']):
+            projection = {'_id': False}
+            for field in hidden:
+                projection[field] = False
+
+            return projection
+
+        # Permission fields are needed for the object checks
+        projection = {
+            '_id': False,
+            'uuid': True,
+            'name': True,
+            'perms': True,
+            'owner': True
+        }
+
+        for field in fields:
+            if field in hidden or field in projection:
+                continue
+            # Only top level fields are transmitted
+            if '.' in field or field.startswith('$'):
+                continue
+            projection[field] = True
+
+        return projection
+
+    def _list_item(self, document, fields, hidden):
+        if fields in ('*', ['*']):
+            for field in hidden:
+                document.pop(field, None)
+            return document
+
+        list_item = {'uuid': document['uuid']}
+
+        if 'name' in document:
+            list_item['name'] = document['name']
+
+        for field in fields:
+            if field in document and field not in hidden:
+                list_item[field] = document[field]
+            else:
+                list_item[field] = None
+
+        return list_item
+
+    def _list_items(self, documents, user, fields, hidden):
+        object_list = []
+
+        for document in documents:
+            try:
+                if not self._check_permissions(user, 'list', document):
+                    continue
+                self.log("Listing item: ", document, lvl=verbose)
+
+                object_list.append(self._list_item(document, fields, hidden))
+            except Exception as e:
+                self.log("Faulty object or field: ", e, type(e),
+                         document, fields, lvl=error, exc=True)
+
+        return object_list
+
+    def _query(self, event, action, schema, object_filter):
+        """Runs a list or search query and transmits the results
+
+        Supports paging via limit/skip, sorting, a (cached) total count and a
+        streaming mode that transmits results in chunks as the database
+        cursor advances.
+        """
+
+        data, user = event.data, event.user
+
+        if 'fields' in data:
+            fields = data['fields']
+        else:
+            fields = []
+
+        opts = schemastore[schema].get('options', {})
+        hidden = opts.get('hidden', [])
+
+        try:
+            options = self._get_query_options(data)
+            chunksize = self._get_chunk_size(data)
+        except (ValueError, TypeError, AttributeError) as e:
+            self.log('Invalid query options:', e, lvl=warn)
+            self._cancel_by_error(event, 'invalid_options')
+            return
+
+        # Only fetch what the user may see, the object checks stay in place
+        permission_filter = self._get_permission_filter(user, 'list')
+        if object_filter:
+            object_filter = {'$and': [object_filter, permission_filter]}
+        else:
+            object_filter = permission_filter
+
+        response = {
+            'schema': schema
+        }
+
+        if data.get('count', False) is True:
+            result = yield self.dbcall(objectcache.get_count, schema,
+                                       object_filter)
+            count, failure = result.value
+
+            if failure is None:
+                response['count'] = count
+
+        model = objectmodels[schema]
+        projection = self._get_projection(fields, hidden)
+
+        if chunksize is None:
+            result = yield self.dbcall(find_raw, model, object_filter,
+                                       projection, **options)
+            items, failure = result.value
+
+            if failure is not None:
+                self._cancel_by_error(event, 'query_failed')
+                return
+
+            if len(items) > WARNSIZE:
+                self.log("Getting a very long list of items for ", schema,
+                         lvl=warn)
+
+            response['list'] = self._list_items(items, user, fields, hidden)
+
+            if 'limit' in options and len(items) == options['limit']:
+                response['next'] = options.get('skip', 0) + len(items)
+
+            self._respond(None, {
+                'component': 'hfos.events.objectmanager',
+                'action': action,
+                'data': response
+            }, event)
+            return
+
+        results = model.collection().find(object_filter, projection,
+                                          **options)
+        position = options.get('skip', 0)
+        part = 0
+        done = False
+
+        while not done:
+            result = yield self.dbcall(find_chunk, results, chunksize)
+            items, failure = result.value
+
+            if failure is not None:
+                self.log('Streamed query failed:', failure, lvl=warn)
+                self._cancel_by_error(event, 'query_failed')
+                return
+
+            done = len(items) < chunksize
+            position += len(items)
+
+            frame = dict(response)
+            frame.update({
+                'list': self._list_items(items, user, fields, hidden),
+                'part': part,
+                'done': done
+            })
+
+            if done and 'limit' in options and \
+                    position - options.get('skip', 0) == options['limit']:
+                frame['next'] = position
+
+            self._respond(None, {
+                'component': 'hfos.events.objectmanager',
+                'action': action,
+                'data': frame
+            }, event)
+
+            part += 1
+
     @handler(search)
     def search(self, event):
         try:
@@ -264,63 +530,14 @@ class ObjectManager(ConfigurableComponent):
             else:
                 object_filter = {}
 
-        if 'fields' in data:
-            fields = data['fields']
-        else:
-            fields = []
-
-        object_list = []
-
-        if objectmodels[schema].count() > WARNSIZE:
-            self.log("Getting a very long list of items for ", schema,
-                     lvl=warn)
-
-        opts = schemastore[schema].get('options', {})
-        hidden = opts.get('hidden', [])
-
         self.log("object_filter: ", object_filter, ' Schema: ', schema,
-                 "Fields: ", fields,
+                 "Fields: ", data.get('fields', None),
                  lvl=verbose)
 
-        for item in objectmodels[schema].find(object_filter):
-            if not self._check_permissions(user, 'list', item):
-                continue
-            self.log("Search found item: ", item, lvl=verbose)
-
-            try:
-                list_item = {'uuid': item.uuid}
-                if fields in ('*', ['*']):
-                    item_fields = item.serializablefields()
-                    for field in hidden:
-                        item_fields.pop(field, None)
-                    object_list.append(item_fields)
-                else:
-                    if 'name' in item._fields:
-                        list_item['name'] = item.name
-
-                    for field in fields:
-                        if field in item._fields and field not in \
-                                hidden:
-                            list_item[field] = item._fields[field]
-                        else:
-                            list_item[field] = None
-
-                    object_list.append(list_item)
-            except Exception as e:
-                self.log("Faulty object or field: ", e, type(e),
-                         item._fields, fields, lvl=error, exc=True)
-        # self.log("Generated object search list: ", object_list)
-
-        result = {
-            'component': 'hfos.events.objectmanager',
-            'action': 'search',
-            'data': {
-                'schema': schema,
-                'list': object_list,
-            }
-        }
+        if schema is None:
+            return
 
-        self._respond(None, result, event)
+        return self._query(event, 'search', schema, object_filter)
 
     @handler(list)
     def objectlist(self, event):
@@ -335,61 +552,10 @@ class ObjectManager(ConfigurableComponent):
         self.log('Object list for', schema, 'requested from',
                  user.account.name, lvl=debug)
 
-        if 'fields' in data:
-            fields = data['fields']
-        else:
-            fields = []
-
-        object_list = []
-
-        opts = schemastore[schema].get('options', {})
-        hidden = opts.get('hidden', [])
-
-        if objectmodels[schema].count(object_filter) > WARNSIZE:
-            self.log("Getting a very long list of items for ", schema,
-                     lvl=warn)
-
-        try:
-            for item in objectmodels[schema].find(object_filter):
-                try:
-                    if not self._check_permissions(user, 'list', item):
-                        continue
-                    if fields in ('*', ['*']):
-                        item_fields = item.serializablefields()
-                        for field in hidden:
-                            item_fields.pop(field, None)
-                        object_list.append(item_fields)
-                    else:
-                        list_item = {'uuid': item.uuid}
-
-                        if 'name' in item._fields:
-                            list_item['name'] = item._fields['name']
-
-                        for field in fields:
-                            if field in item._fields and field not in hidden:
-                                list_item[field] = item._fields[field]
-                            else:
-                                list_item[field] = None
-
-                        object_list.append(list_item)
-                except Exception as e:
-                    self.log("Faulty object or field: ", e, type(e),
-                             item._fields, fields, lvl=error, exc=True)
-        except ValidationError as e:
-            self.log('Invalid object in database encountered!', e, exc=True,
-                     lvl=warn)
-        # self.log("Generated object list: ", object_list)
-
-        result = {
-            'component': 'hfos.events.objectmanager',
-            'action': 'list',
-            'data': {
-                'schema': schema,
-                'list': object_list
-            }
-        }
+        if schema is None:
+            return
 
-        self._respond(None, result, event)
+        return self._query(event, 'list', schema, object_filter)
 
     @handler(change)
     def change(self, event):
@@ -410,11 +576,13 @@ class ObjectManager(ConfigurableComponent):
             self._cancel_by_error(event, 'missing_args')
             return
 
-        storage_object = None
+        storage_object = objectcache.get_cached(schema, uuid)
 
-        try:
-            storage_object = objectmodels[schema].find_one({'uuid': uuid})
-        except Exception as e:
+        if storage_object is None:
+            result = yield self.dbcall(objectcache.get_object, schema, uuid)
+            storage_object, failure = result.value
+
+        if storage_object is None:
             self.log('Change for unknown object requested:', schema,
                      data, lvl=warn)
             self._cancel_by_error(event, 'not_found')
@@ -433,10 +601,15 @@ class ObjectManager(ConfigurableComponent):
         except ValidationError:
             self.log("Validation of changed object failed!",
                      storage_object, lvl=warn)
-            self._cancel_by_error('invalid_object')
+            self._cancel_by_error(event, 'invalid_object')
             return
 
-        storage_object.save()
+        result = yield self.dbcall(storage_object.save)
+        stored, failure = result.value
+
+        if failure is not None:
+            self._cancel_by_error(event, 'storage_failed')
+            return
 
         self.log("Object stored.")
 
@@ -467,14 +640,19 @@ class ObjectManager(ConfigurableComponent):
                      lvl=critical)
             return
 
-        try:
-            model = objectmodels[schema]
+        model = objectmodels[schema]
+        storage_object = None
 
-            if uuid != 'create':
-                storage_object = model.find_one({'uuid': uuid})
-            if uuid == 'create' or model.count({
-                'uuid': uuid
-            }) == 0:
+        if uuid != 'create':
+            storage_object = objectcache.get_cached(schema, uuid)
+
+            if storage_object is None:
+                result = yield self.dbcall(objectcache.get_object, schema,
+                                           uuid)
+                storage_object, failure = result.value
+
+        try:
+            if uuid == 'create' or storage_object is None:
                 if uuid == 'create':
                     uuid = str(uuid4())
                 clientobject['uuid'] = uuid
@@ -505,8 +683,21 @@ class ObjectManager(ConfigurableComponent):
                     self.log("Validation of new object failed!", clientobject,
                              lvl=warn)
 
-            storage_object.save()
+        except Exception as e:
+            self.log("Error during object storage:", e, type(e), data,
+                     lvl=error, exc=True, pretty=True)
+            return
+
+        result = yield self.dbcall(storage_object.save)
+        stored, failure = result.value
 
+        if failure is not None:
+            self.log("Error during object storage:", failure, type(failure),
+                     data, lvl=error, pretty=True)
+            self._cancel_by_error(event, 'storage_failed')
+            return
+
+        try:
             self.log("Object stored.")
 
             # Notify backend listeners
@@ -549,7 +740,12 @@ class ObjectManager(ConfigurableComponent):
 
             if schema in objectmodels.keys():
                 self.log("Looking for object to be deleted:", uuid, lvl=debug)
-                storage_object = objectmodels[schema].find_one({'uuid': uuid})
+                storage_object = objectcache.get_cached(schema, uuid)
+
+                if storage_object is None:
+                    result = yield self.dbcall(objectcache.get_object, schema,
+                                               uuid)
+                    storage_object, failure = result.value
 
                 if not storage_object:
                     self._cancel_by_error(event, 'not found')
@@ -563,7 +759,12 @@ class ObjectManager(ConfigurableComponent):
 
                 self.log("Fields:", storage_object._fields, "\n\n\n",
                          storage_object.__dict__)
-                storage_object.delete()
+                result = yield self.dbcall(storage_object.delete)
+                deleted, failure = result.value
+
+                if failure is not None:
+                    self._cancel_by_error(event, 'deletion_failed')
+                    return
 
                 self.log("Preparing notification.", lvl=debug)
                 notification = objectdeletion(uuid, schema, client)
@@ -598,6 +799,14 @@ class ObjectManager(ConfigurableComponent):
             self.log("Error during delete request: ", e, type(e),
                      lvl=error)
 
+    @handler('objectcreation', 'objectchange', 'objectdeletion', channel='*')
+    def invalidate_cache(self, event):
+        """Drops changed objects from the object cache"""
+
+        self.log('Invalidating cached object', event.schema, event.uuid,
+                 lvl=verbose)
+        objectcache.invalidate(event.schema, event.uuid)
+
     @handler(subscribe)
     def subscribe(self, event):
         uuid = event.data
@@ -668,6 +877,8 @@ class ObjectManager(ConfigurableComponent):
 
             # pprint(self.subscriptions)
 
+            recipients = []
+
             for client, recipient in self.subscriptions[
                 update_object.uuid
             ].items():
@@ -677,4 +888,7 @@ class ObjectManager(ConfigurableComponent):
 
                 self.log('Notifying subscriber: ', client, recipient,
                          lvl=verbose)
-                self.fireEvent(send(client, update))
+                recipients.append(client)
+
+            if len(recipients) > 0:
+                self.fireEvent(multicast(recipients, update))
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# HFOS - Hackerfleet Operating System
+# ===================================
+# Copyright (C) 2011-2017 Heiko 'riot' Weinen <riot@c-base.org> and others.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Heiko 'riot' Weinen"
+__license__ = "GPLv3"
+
+"""
+
+Module: Ratelimit
+=================
+
+Token bucket rate limiting of client requests.
+
+Every client has a bucket for all of its requests and one per event class
+that has its own limit configured. Buckets refill lazily when they are
+checked, so no timers are involved.
+
+
+"""
+
+from time import time
+
+
+class TokenBucket(object):
+    """Allows bursts of up to burst requests, refilled with rate tokens per
+    second"""
+
+    def __init__(self, rate, burst):
+        super(TokenBucket, self).__init__()
+
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = self.burst
+        self.stamp = time()
+
+    def take(self, now=None):
+        """Takes a token, returns False if none is left"""
+
+        if now is None:
+            now = time()
+
+        if now > self.stamp:
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+
+        if self.tokens < 1:
+            return False
+
+        self.tokens -= 1
+        return True
+
+    def refund(self):
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+class RateLimiter(object):
+    """Per client and per client and event class token buckets"""
+
+    def __init__(self, rate, burst, limits=None):
+        """
+
+        :param rate: Requests per second a client may send in total
+        :param burst: Requests a client may send at once
+        :param limits: Dictionary of {'rate': x, 'burst': y} limits by event
+                       name (component.action)
+        """
+        super(RateLimiter, self).__init__()
+
+        self.rate = rate
+        self.burst = burst
+        self.limits = limits if limits is not None else {}
+
+        self._buckets = {}
+        self.rejections = {}
+
+    def _get_bucket(self, clientuuid, key, rate, burst):
+        try:
+            return self._buckets[clientuuid, key]
+        except KeyError:
+            bucket = self._buckets[clientuuid, key] = TokenBucket(rate, burst)
+            return bucket
+
+    def check(self, clientuuid, key):
+        """Accounts a request and returns False, if it exceeds a limit
+
+        :param clientuuid: Requesting client
+        :param key: Event name of the request (component.action)
+        """
+
+        now = time()
+        event_bucket = None
+
+        if key in self.limits:
+            limit = self.limits[key]
+            event_bucket = self._get_bucket(clientuuid, key, limit['rate'],
+                                            limit['burst'])
+            if not event_bucket.take(now):
+                self.rejections[key] = self.rejections.get(key, 0) + 1
+                return False
+
+        if not self._get_bucket(clientuuid, None, self.rate,
+                                self.burst).take(now):
+            if event_bucket is not None:
+                event_bucket.refund()
+            self.rejections['*'] = self.rejections.get('*', 0) + 1
+            return False
+
+        return True
+
+    def forget(self, clientuuid):
+        """Drops the buckets of a disconnected client"""
+
+        for key in [key for key in self._buckets if key[0] == clientuuid]:
+            del self._buckets[key]
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# HFOS - Hackerfleet Operating System
+# ===================================
+# Copyright (C) 2011-2017 Heiko 'riot' Weinen <riot@c-base.org> and others.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Heiko 'riot' Weinen"
+__license__ = "GPLv3"
+"""
+
+Module: Requeststats
+====================
+
+Request counters and latency histograms of client requests.
+
+The latency of a request is measured from its arrival to the first message
+that is sent back to the requesting client afterwards. Only the latest
+unanswered request of a socket is tracked, so requests without a response
+don't pile up.
+
+
+"""
+
+from time import time
+
+# Upper bounds of the histogram buckets in milliseconds
+BOUNDS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+
+class LatencyHistogram(object):
+    """Counts latencies into fixed logarithmic buckets"""
+
+    def __init__(self):
+        super(LatencyHistogram, self).__init__()
+
+        self.buckets = [0] * len(BOUNDS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, latency):
+        """Accounts a latency given in milliseconds"""
+
+        for index, bound in enumerate(BOUNDS):
+            if latency <= bound:
+                self.buckets[index] += 1
+                break
+
+        self.count += 1
+        self.total += latency
+        self.max = max(self.max, latency)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count > 0 else 0.0
+
+    def percentile(self, percent):
+        """Returns the upper bound of the bucket, the given percentage of
+        latencies falls into"""
+
+        if self.count == 0:
+            return 0.0
+
+        threshold = self.count * percent / 100.0
+        seen = 0
+
+        for index, amount in enumerate(self.buckets):
+            seen += amount
+            if seen >= threshold:
+                return min(BOUNDS[index], self.max)
+
+        return self.max
+
+
+class RequestStats(object):
+    """Request counts and latencies by event name (component.action)"""
+
+    def __init__(self):
+        super(RequestStats, self).__init__()
+
+        self.requests = {}
+        self.latencies = {}
+
+        self._pending = {}
+
+    def started(self, sock, key, now=None):
+        """Accounts a request that has been received on a socket"""
+
+        self.requests[key] = self.requests.get(key, 0) + 1
+        self._pending[sock] = (key, time() if now is None else now)
+
+    def answered(self, sock, now=None):
+        """Records the latency of the socket's pending request, if any"""
+
+        try:
+            key, stamp = self._pending.pop(sock)
+        except KeyError:
+            return
+
+        if now is None:
+            now = time()
+
+        try:
+            histogram = self.latencies[key]
+        except KeyError:
+            histogram = self.latencies[key] = LatencyHistogram()
+
+        histogram.add((now - stamp) * 1000.0)
+
+    def forget(self, sock):
+        """Drops the pending request of a closed socket"""
+
+        self._pending.pop(sock, None)
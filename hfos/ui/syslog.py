@@ -1,8 +1,11 @@
+from circuits import Event, Timer
+
 from hfos.component import ConfigurableComponent, handler
-from hfos.database import objectmodels
-from hfos.events.client import send, clientdisconnect
+from hfos.database import objectmodels, find_raw
+from hfos.events.client import send, multicast, clientdisconnect
 from hfos.events.system import authorizedevent
-from hfos.logger import error, debug
+from hfos import logger
+from hfos.logger import error, verbose
 
 
 class history(authorizedevent):
@@ -13,14 +16,56 @@ class subscribe(authorizedevent):
     pass
 
 
+class flush_logs(Event):
+    pass
+
+
+class logupdate(Event):
+    """New log records, fired at most once per flush interval
+
+    :param records: List of log records as logmessage documents
+    """
+
+    def __init__(self, records, *args):
+        super(logupdate, self).__init__(*args)
+
+        self.records = records
+
+
 class Syslog(ConfigurableComponent):
     """
     System log access component
 
     Handles all the frontend log history requests.
 
+    Regularly collects new records from the logger's ring buffer, stores
+    them in batches and sends them on to subscribed clients.
     """
 
+    configprops = {
+        'flushinterval': {
+            'type': 'number',
+            'title': 'Flush interval',
+            'description': 'Seconds between log storage and updates to '
+                           'subscribed clients',
+            'default': 1.0
+        },
+        'persistlevel': {
+            'type': 'integer',
+            'title': 'Storage level',
+            'description': 'Minimum level of log records to store in the '
+                           'database (0-100)',
+            'default': 20
+        },
+        'updatelimit': {
+            'type': 'integer',
+            'title': 'Update size',
+            'description': 'Maximum number of records sent to clients per '
+                           'update, older ones are skipped',
+            'default': 100
+        }
+    }
+
     def __init__(self, *args):
         super(Syslog, self).__init__('SYSLOG', *args)
 
@@ -28,6 +73,11 @@ class Syslog(ConfigurableComponent):
 
         self.subscribers = []
 
+        self._sequence = 0
+        self._flusher = Timer(
+            self.config.flushinterval, flush_logs(), persist=True
+        ).register(self)
+
     @handler(subscribe)
     def subscribe(self, event):
         self.subscribers.append(event.client.uuid)
@@ -37,17 +87,54 @@ class Syslog(ConfigurableComponent):
         if event.clientuuid in self.subscribers:
             self.subscribers.remove(event.clientuuid)
 
+    def _persisted(self, record):
+        """Tells, whether a record is stored in the database"""
+
+        return record.emitter != self.uniquename and \
+            record.level >= self.config.persistlevel
+
+    @handler('flush_logs')
+    def flush_logs(self, *args):
+        """Stores and distributes the records logged since the last flush"""
+
+        records, self._sequence = logger.records.since(self._sequence)
+
+        # Our own records would keep this going forever
+        records = [record for record in records
+                   if record.emitter != self.uniquename]
+
+        if len(records) == 0:
+            return
+
+        documents = [record.serializablefields() for record in records]
+
+        if len(self.subscribers) > 0:
+            self.fireEvent(logupdate(documents[-self.config.updatelimit:]),
+                           'logger')
+
+        # Copies, as the database adds its ObjectIds to inserted documents
+        persist = [dict(document) for document, record in
+                   zip(documents, records) if self._persisted(record)]
+
+        if len(persist) > 0:
+            collection = objectmodels['logmessage'].collection()
+            result = yield self.dbcall(collection.insert_many, persist,
+                                       ordered=False)
+            stored, failure = result.value
+            if failure is not None:
+                self.log('Could not store log records:', failure,
+                         lvl=error)
+
     @handler("logupdate", channel='logger')
     def logupdate(self, event):
-        self.log('Updating syslog viewers', lvl=debug)
+        self.log('Updating syslog viewers', lvl=verbose)
         packet = {
             'component': 'hfos.ui.syslog',
             'action': 'update',
-            'data': event.message.serializablefields()
+            'data': event.records
         }
 
-        for subscriber in self.subscribers:
-            self.fireEvent(send(subscriber, packet))
+        self.fireEvent(multicast(self.subscribers, packet, fail_quiet=True))
 
     @handler(history)
     def history(self, event):
@@ -61,22 +148,35 @@ class Syslog(ConfigurableComponent):
 
         self.log('History requested:', limit, end)
 
-        messages = []
+        # Recent history is served from the ring buffer, with the same
+        # records the database would have
+        buffered = [record for record in logger.records
+                    if record.timestamp <= end and self._persisted(record)]
 
-        om = objectmodels['logmessage']
-        try:
-            for msg in om.find(
-                    {
-                        'timestamp': {'$lte': end}
-                    },
-                    sort=[('timestamp', -1)],
-                    limit=limit
-            ):
-                messages.insert(0, msg.serializablefields())
-        except Exception as e:
-            self.log('Error during history lookup:', e, type(e), exc=True,
-                     lvl=error)
-            return
+        messages = [record.serializablefields() for record in
+                    buffered[-limit:]] if limit > 0 else []
+
+        # Older records have to come from the database
+        if len(messages) < limit:
+            if len(logger.records) > 0:
+                before = min(end, logger.records[0].timestamp)
+                object_filter = {'timestamp': {'$lt': before}}
+            else:
+                object_filter = {'timestamp': {'$lte': end}}
+
+            result = yield self.dbcall(
+                find_raw, objectmodels['logmessage'], object_filter,
+                {'_id': False}, sort=[('timestamp', -1)],
+                limit=limit - len(messages)
+            )
+            stored, failure = result.value
+
+            if failure is not None:
+                self.log('Error during history lookup:', failure,
+                         type(failure), lvl=error)
+                return
+
+            messages = list(reversed(stored)) + messages
 
         history_packet = {
             'component': 'hfos.ui.syslog',
@@ -88,4 +188,3 @@ class Syslog(ConfigurableComponent):
             }
         }
         self.fireEvent(send(event.client.uuid, history_packet))
-
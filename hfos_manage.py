@@ -365,16 +365,33 @@ def clear(ctx, schema):
     response = ask('Are you sure you want to delete the collection "%s"' % (
         schema), default='N', data_type=bool)
     if response is True:
-        # TODO: Fix this to make use of the dbhost
-
-        client = pymongo.MongoClient(host="localhost", port=27017)
-        db = client["hfos"]
+        db = ctx.obj['db'].get_database()
 
         hfoslog("Clearing collection for", schema, lvl=warn,
                 emitter='MANAGE')
         db.drop_collection(schema)
 
 
+@db.command(short_help='Create and check declared indices')
+@click.option("--schema", help="Specify schema to work with",
+              default=None)
+@click.option("--dry", help="Only report missing indices", default=False,
+              is_flag=True)
+@click.pass_context
+def indices(ctx, schema, dry):
+    """Creates missing indices declared in the schemata and reports unused
+    or undeclared ones"""
+
+    schemata = [schema] if schema is not None else None
+    report = ctx.obj['db'].ensure_indices(schemata, create=not dry)
+
+    for schemaname, entry in sorted(report.items()):
+        for key, names in sorted(entry.items()):
+            if len(names) > 0:
+                hfoslog(schemaname, key + ':', ', '.join(names),
+                        emitter='MANAGE')
+
+
 @db.group(cls=DYMGroup)
 @click.option("--schema", help="Specify schema to work with",
               default=None)
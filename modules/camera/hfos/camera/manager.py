@@ -153,7 +153,8 @@ class Manager(ConfigurableComponent):
     def _broadcast(self, camera_packet, camera_uuid):
         try:
             for recipient in self._subscribers[camera_uuid]:
-                self.fireEvent(send(recipient, camera_packet, raw=True),
+                self.fireEvent(send(recipient, camera_packet, raw=True,
+                                    coalesce='camera:' + camera_uuid),
                                "hfosweb")
         except Exception as e:
             self.log("Failed broadcast: ", e, type(e), lvl=error)
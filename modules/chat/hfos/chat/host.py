@@ -34,8 +34,8 @@ Chat manager
 from time import time
 from hfos.component import ConfigurableComponent, handler
 from hfos.logger import error, warn, hilight, debug, verbose
-from hfos.database import objectmodels
-from hfos.events.client import broadcast, send
+from hfos.database import objectmodels, dbtask, dbworker_channel, find_all
+from hfos.events.client import broadcast, send, multicast
 from hfos.events.system import authorizedevent
 from hfos.tools import std_now, std_uuid
 from circuits import Event
@@ -91,6 +91,9 @@ class Host(ConfigurableComponent):
     configprops = {}
     channel = "hfosweb"
 
+    # Offers the chat_users command on the command line interface
+    dependencies = ['cli']
+
     def __init__(self, *args):
         super(Host, self).__init__("CHAT", *args)
 
@@ -265,7 +268,10 @@ class Host(ConfigurableComponent):
                     self.log('User already joined', lvl=warn)
                 else:
                     self.chat_channels[channel_uuid].users.append(user_uuid)
-                    self.chat_channels[channel_uuid].save()
+                    self.fireEvent(
+                        dbtask(self.chat_channels[channel_uuid].save),
+                        dbworker_channel
+                    )
                     packet = {
                         'component': 'hfos.chat.host',
                         'action': 'join',
@@ -284,7 +290,7 @@ class Host(ConfigurableComponent):
             lastlog = self.lastlogs[user]
 
             lastlog.channels[recipient] = std_now()
-            lastlog.save()
+            self.fireEvent(dbtask(lastlog.save), dbworker_channel)
         else:
             self.log('Sending status update', lvl=debug)
             self._send_status(user)
@@ -304,22 +310,26 @@ class Host(ConfigurableComponent):
 
         messages = []
 
-        om = objectmodels['chatmessage']
-        try:
-            for msg in om.find(
-                    {
-                        'recipient': channel,
-                        'timestamp': {'$lte': end}
-                    },
-                    sort=[('timestamp', -1)],
-                    limit=limit
-            ):
-                messages.insert(0, msg.serializablefields())
-        except Exception as e:
-            self.log('Error during history lookup:', e, type(e), exc=True,
+        result = yield self.dbcall(
+            find_all,
+            objectmodels['chatmessage'],
+            {
+                'recipient': channel,
+                'timestamp': {'$lte': end}
+            },
+            sort=[('timestamp', -1)],
+            limit=limit
+        )
+        found, failure = result.value
+
+        if failure is not None:
+            self.log('Error during history lookup:', failure, type(failure),
                      lvl=error)
             return
 
+        for msg in reversed(found):
+            messages.append(msg.serializablefields())
+
         history_packet = {
             'component': 'hfos.chat.host',
             'action': 'history',
@@ -350,9 +360,19 @@ class Host(ConfigurableComponent):
                 'content': content,
                 'uuid': std_uuid()
             })
+        except Exception as e:
+            self.log("Error: '%s' %s" % (e, type(e)), exc=True, lvl=error)
+            return
 
-            message.save()
+        result = yield self.dbcall(message.save)
+        stored, failure = result.value
 
+        if failure is not None:
+            self.log('Could not store chat message:', failure, type(failure),
+                     lvl=error)
+            return
+
+        try:
             chat_packet = {
                 'component': 'hfos.chat.host',
                 'action': 'say',
@@ -360,14 +380,17 @@ class Host(ConfigurableComponent):
             }
 
             if recipient in self.chat_channels:
+                recipients = []
                 for useruuid in self.users:
                     if useruuid in self.chat_channels[recipient].users:
                         self.log('User in channel', lvl=debug)
                         self.update_lastlog(useruuid, recipient)
+                        recipients.append(useruuid)
 
-                        self.log('Sending message', lvl=debug)
-                        self.fireEvent(send(useruuid, chat_packet,
-                                            sendtype='user'))
+                self.log('Sending message to', len(recipients), 'users',
+                         lvl=debug)
+                self.fireEvent(multicast(recipients, chat_packet,
+                                         sendtype='user'))
 
         except Exception as e:
             self.log("Error: '%s' %s" % (e, type(e)), exc=True, lvl=error)
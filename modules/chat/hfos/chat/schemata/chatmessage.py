@@ -36,7 +36,8 @@ ChatMessage: ChatMessage to store messages in rooms and private chats
 from hfos.schemata.defaultform import defaultform
 from hfos.schemata.base import base_object
 
-ChatMessageSchema = base_object('chatmessage', all_roles='crew')
+ChatMessageSchema = base_object('chatmessage', all_roles='crew',
+                                indices=[['recipient', 'timestamp']])
 
 ChatMessageSchema['properties'].update({
     'timestamp': {'type': 'number', 'title': 'Timestamp',
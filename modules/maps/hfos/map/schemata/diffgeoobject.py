@@ -42,7 +42,8 @@ Provisions
 from hfos.schemata.defaultform import defaultform
 from hfos.schemata.base import base_object
 
-GeoObjectSchema = base_object('geoobject', all_roles='crew')
+GeoObjectSchema = base_object('geoobject', all_roles='crew',
+                              indices=['layer'])
 
 GeoObjectSchema['properties'].update({
     'layer': {
@@ -22,7 +22,7 @@ __author__ = "Heiko 'riot' Weinen"
 __license__ = "GPLv3"
 
 from circuits import Event
-from hfos.logger import hfoslog, events
+from hfos.logger import hfoslog, events, verbosity
 from hfos.events.system import authorizedevent
 
 
@@ -45,6 +45,8 @@ class sensordata(Event):
 class referenceframe(Event):
     """New sensordata has been parsed"""
 
+    __slots__ = ['data']
+
     def __init__(self, data):
         """
 
@@ -52,5 +54,6 @@ class referenceframe(Event):
         """
         super(referenceframe, self).__init__()
         self.data = data
-        hfoslog("[NAVDATA-EVENT] Reference frame generated: ", data,
-                lvl=events)
+        if verbosity['global'] <= events:
+            hfoslog("[NAVDATA-EVENT] Reference frame generated: ", data,
+                    lvl=events)
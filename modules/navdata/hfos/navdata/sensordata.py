@@ -37,7 +37,8 @@ from hfos.schemata.base import base_object
 SensorDataSchema = base_object('sensorData',
                                has_owner=False,
                                has_uuid=False,
-                               all_roles='crew')
+                               all_roles='crew',
+                               indices=['timestamp', 'type'])
 
 SensorDataSchema['properties'].update({
     'value': {
@@ -30,21 +30,20 @@ Module NavData
 
 """
 
-import sys
-import glob
 from copy import copy
 from circuits import Component, Event, Timer
 from circuits.net.sockets import TCPClient
 from circuits.net.events import connect, read
 from circuits.io.serial import Serial
 
-from hfos.database import objectmodels  # , ValidationError
+from hfos.database import objectmodels, dbtask, dbworker_channel
+from hfos.devices import serial_inventory
 from hfos.events.system import authorizedevent
 from hfos.navdata.events import referenceframe
 from hfos.logger import hfoslog, events, debug, verbose, critical, warn, \
     error, hilight
 from hfos.component import ConfigurableComponent, handler
-from hfos.events.client import send, broadcast
+from hfos.events.client import send, multicast, broadcast
 
 from pprint import pprint
 
@@ -58,39 +57,6 @@ except ImportError:
         lvl=critical, emitter="NMEA")
 
 
-def serial_ports():
-    """ Lists serial port names
-
-        :raises EnvironmentError:
-            On unsupported or unknown platforms
-        :returns:
-            A list of the serial ports available on the system
-
-        Courtesy: Thomas ( http://stackoverflow.com/questions/12090503
-        /listing-available-com-ports-with-python )
-    """
-    if sys.platform.startswith('win'):
-        ports = ['COM%s' % (i + 1) for i in range(256)]
-    elif sys.platform.startswith('linux') or sys.platform.startswith('cygwin'):
-        # this excludes your current terminal "/dev/tty"
-        ports = glob.glob('/dev/tty[A-Za-z]*')
-    elif sys.platform.startswith('darwin'):
-        ports = glob.glob('/dev/tty.*')
-    else:
-        raise EnvironmentError('Unsupported platform')
-
-    result = []
-    for port in ports:
-        try:
-            s = serial.Serial(port)
-            s.close()
-            result.append(port)
-        except (OSError, serial.SerialException) as e:
-            hfoslog('Could not open serial port:', port, e, type(e),
-                    exc=True, lvl=warn)
-    return result
-
-
 class subscribe(authorizedevent):
     """Subscribes from a navigation data subscription"""
 
@@ -268,10 +234,11 @@ class Sensors(ConfigurableComponent):
                         }
 
                         self.log("Serving update: ", packet, lvl=verbose)
-                        for uuid in self.subscriptions[ref.name]:
-                            self.log("Serving to ", uuid, lvl=events)
-                            self.fireEvent(send(uuid, packet),
-                                           'hfosweb')
+                        self.fireEvent(
+                            multicast(self.subscriptions[ref.name][:],
+                                      packet,
+                                      coalesce='navdata:' + ref.name),
+                            'hfosweb')
 
                     # self.log("New item: ", item)
                     sensordata = objectmodels['sensordata'](item)
@@ -280,7 +247,8 @@ class Sensors(ConfigurableComponent):
                     if ref.record:
                         self.log("Recording updated reference:",
                                  sensordata._fields)
-                        sensordata.save()
+                        self.fireEvent(dbtask(sensordata.save),
+                                       dbworker_channel)
 
                     ref.lastvalue = str(value)
                     ref.timestamp = timestamp
@@ -485,7 +453,7 @@ class SensorScanner(ConfigurableComponent):
         self.log('Initiating scan')
         scanning = False
 
-        portlist = serial_ports()
+        portlist = serial_inventory.ports()
         self.log('Scanning all found devices.', lvl=debug)
 
         self.log('Scanning', portlist, lvl=debug)
@@ -31,8 +31,6 @@ Module NMEA
 """
 
 import time
-import sys
-import glob
 from circuits import Component, Timer, Event
 from circuits.net.sockets import TCPClient
 from circuits.net.events import connect, read
@@ -40,6 +38,7 @@ from circuits.io.serial import Serial
 from decimal import Decimal
 from hfos.component import ConfigurableComponent, handler
 from hfos.database import ValidationError
+from hfos.devices import serial_port_props
 from hfos.logger import hfoslog, verbose, debug, warn, critical, error, hilight
 from hfos.navdata.events import sensordata
 from hfos.navdata.sensors import register_scanner_protocol, start_scanner
@@ -64,52 +63,13 @@ except ImportError:
         lvl=critical, emitter="NMEA")
 
 
-def serial_ports():
-    """ Lists serial port names
-
-        :raises EnvironmentError:
-            On unsupported or unknown platforms
-        :returns:
-            A list of the serial ports available on the system
-
-        Courtesy: Thomas ( http://stackoverflow.com/questions/12090503
-        /listing-available-com-ports-with-python )
-    """
-    if sys.platform.startswith('win'):
-        ports = ['COM%s' % (i + 1) for i in range(256)]
-    elif sys.platform.startswith('linux') or sys.platform.startswith('cygwin'):
-        # this excludes your current terminal "/dev/tty"
-        ports = glob.glob('/dev/tty[A-Za-z]*')
-    elif sys.platform.startswith('darwin'):
-        ports = glob.glob('/dev/tty.*')
-    else:
-        raise EnvironmentError('Unsupported platform')
-
-    result = []
-    for port in ports:
-        try:
-            s = serial.Serial(port)
-            s.close()
-            result.append(port)
-        except (OSError, serial.SerialException):
-            pass
-    return result
-
-
-def get_file_title_map(ports):
-    title_map = {}
-    for port in ports:
-        title_map[port] = port
-
-    return title_map
-
-
 class NMEAParser(ConfigurableComponent):
     """
     Parses raw data (e.g. from a serialport) for NMEA data and sends single
     sentences out.
     """
-    ports = serial_ports()
+
+    # The serial port choices are filled in on instantiation
     configprops = {
         'connectiontype': {
             'type': 'string',
@@ -143,7 +103,7 @@ class NMEAParser(ConfigurableComponent):
         },
         'serialfile': {
             'type': 'string',
-            'enum': ports + [''],
+            'enum': [''],
             'title': 'Serial port device',
             'description': 'File descriptor to access serial port',
             'default': '',
@@ -151,7 +111,7 @@ class NMEAParser(ConfigurableComponent):
             'x-schema-form': {
                 'type': 'select',
                 'htmlClass': 'div',
-                'titleMap': get_file_title_map(ports)
+                'titleMap': {}
             }
         },
         'auto_configure': {
@@ -164,7 +124,12 @@ class NMEAParser(ConfigurableComponent):
 
     channel = "nmea"
 
+    # The sensor scanner has to know the NMEA protocol before scanning
+    dependencies = ['sensorscanner']
+
     def __init__(self, *args, **kwargs):
+        self.configprops = serial_port_props(self.configprops)
+
         try:
             super(NMEAParser, self).__init__('NMEA', *args, **kwargs)
         except ValidationError:
@@ -34,16 +34,14 @@ NeoCortex board.
 
 """
 
-import sys
-
 import six
 from circuits.io import Serial
 from circuits.io.events import write
 from random import randint
 
-import glob
 from hfos.component import ConfigurableComponent
 from hfos.component import handler
+from hfos.devices import serial_port_props
 from hfos.logger import hfoslog, critical, debug, warn
 
 try:
@@ -55,38 +53,6 @@ except ImportError:
             lvl=critical, emitter="MR")
 
 
-def serial_ports():
-    """ Lists serial port names
-
-        :raises EnvironmentError:
-            On unsupported or unknown platforms
-        :returns:
-            A list of the serial ports available on the system
-
-        Courtesy: Thomas ( http://stackoverflow.com/questions/12090503
-        /listing-available-com-ports-with-python )
-    """
-    if sys.platform.startswith('win'):
-        ports = ['COM%s' % (i + 1) for i in range(256)]
-    elif sys.platform.startswith('linux') or sys.platform.startswith('cygwin'):
-        # this excludes your current terminal "/dev/tty"
-        ports = glob.glob('/dev/tty[A-Za-z]*')
-    elif sys.platform.startswith('darwin'):
-        ports = glob.glob('/dev/tty.*')
-    else:
-        raise EnvironmentError('Unsupported platform')
-
-    result = []
-    for port in ports:
-        try:
-            s = serial.Serial(port)
-            s.close()
-            result.append(port)
-        except (OSError, serial.SerialException):
-            pass
-    return result
-
-
 class Machineroom(ConfigurableComponent):
     """
     Enables simple robotic control by translating high level events to
@@ -100,7 +66,7 @@ class Machineroom(ConfigurableComponent):
 
     channel = "machineroom"
 
-    ports = serial_ports()
+    # The serial port choices are filled in on instantiation
     configprops = {
         'baudrate': {
             'type': 'integer',
@@ -115,7 +81,7 @@ class Machineroom(ConfigurableComponent):
             'default': 4096
         },
         'serialfile': {
-            'enum': ports + [''],
+            'enum': [''],
             'title': 'Serial port device',
             'description': 'File descriptor to access serial port',
             'default': ''
@@ -134,6 +100,8 @@ class Machineroom(ConfigurableComponent):
         terminator = bytes(chr(13), encoding="ascii")
 
     def __init__(self, *args, **kwargs):
+        self.configprops = serial_port_props(self.configprops)
+
         super(Machineroom, self).__init__('MR', *args, **kwargs)
         self.log("Machineroom starting")
 
@@ -42,7 +42,9 @@ Provisions
 from hfos.schemata.base import base_object
 from hfos.schemata.defaultform import editbuttons
 
-ShareableSchema = base_object('shareable', all_roles='crew')
+ShareableSchema = base_object('shareable', all_roles='crew',
+                              indices=[['reservations.starttime',
+                                        'reservations.endtime']])
 
 ShareableSchema['properties'].update({
     'creatoruuid': {'type': 'string', 'title': 'Creator',
@@ -171,6 +171,26 @@ def clean_test_components():
         item.delete()
 
 
+def pytest_addoption(parser):
+    parser.addoption('--benchmark', action='store_true', default=False,
+                     help='Run the benchmarks as well')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'benchmark: timing comparisons, '
+                                       'only run with --benchmark')
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--benchmark'):
+        return
+
+    skip = pytest.mark.skip(reason='Benchmarks only run with --benchmark')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
+
+
 @pytest.hookimpl()
 def pytest_unconfigure(config):
     clean_test_components()
@@ -39,7 +39,7 @@ from uuid import uuid4
 from hfos.ui.auth import Authenticator
 from hfos.events.client import authenticationrequest, authentication
 from hfos.tools import std_uuid
-from hfos.database import objectmodels
+from hfos.database import objectmodels, dbworker
 import hfos.logger as logger
 
 from pprint import pprint
@@ -48,6 +48,7 @@ m = Manager()
 
 auth = Authenticator()
 auth.register(m)
+dbworker().register(m)
 
 
 def test_instantiate():
@@ -85,7 +86,7 @@ def test_invalid_user_auth():
     result = transmit('authentication', 'auth', event, 'auth')
 
     assert result is None
-    assert "No userobject due to error" in str(log)
+    assert "Unknown user" in str(log)
 
 
 def test_createuser():
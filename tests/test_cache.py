@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# HFOS - Hackerfleet Operating System
+# ===================================
+# Copyright (C) 2011-2017 Heiko 'riot' Weinen <riot@c-base.org> and others.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Heiko 'riot' Weinen"
+__license__ = "GPLv3"
+
+"""
+Hackerfleet Operating System - Backend
+
+Test HFOS Object Cache
+======================
+
+
+
+"""
+
+from time import sleep
+from uuid import uuid4
+
+from hfos import cache
+from hfos.cache import ObjectCache
+from hfos.database import objectmodels
+
+
+def test_lru_eviction():
+    """Tests if the least recently used entry gets evicted first"""
+
+    lru = ObjectCache('test', 2, 0)
+
+    lru.put('a', {'uuid': 'a'})
+    lru.put('b', {'uuid': 'b'})
+    assert lru.get('a') == {'uuid': 'a'}
+
+    lru.put('c', {'uuid': 'c'})
+
+    assert lru.get('b') is None
+    assert lru.get('a') is not None
+    assert lru.get('c') is not None
+
+    stats = lru.stats()
+    assert stats['evictions'] == 1
+    assert stats['hits'] == 3
+    assert stats['misses'] == 1
+
+
+def test_ttl_expiry():
+    """Tests if entries expire after their time to live"""
+
+    lru = ObjectCache('test', 10, 0.1)
+    lru.put('a', {'uuid': 'a'})
+
+    sleep(0.2)
+
+    assert lru.get('a') is None
+    assert lru.stats()['expirations'] == 1
+
+
+def test_cached_copies():
+    """Tests if cached fields cannot be modified from the outside"""
+
+    lru = ObjectCache('test', 10, 0)
+    fields = {'uuid': 'a', 'name': 'foo'}
+    lru.put('a', fields)
+
+    fields['name'] = 'bar'
+
+    assert lru.get('a')['name'] == 'foo'
+
+
+def test_read_through_and_invalidation():
+    """Tests if lookups are cached and model writes invalidate them"""
+
+    uuid = str(uuid4())
+    obj = objectmodels['systemconfig']({'uuid': uuid, 'name': 'cached'})
+    obj.save()
+
+    assert cache.get_object('systemconfig', uuid).name == 'cached'
+    assert cache.get_cached('systemconfig', uuid) is not None
+
+    obj.name = 'changed'
+    obj.save()
+
+    assert cache.get_cached('systemconfig', uuid) is None
+    assert cache.get_object('systemconfig', uuid).name == 'changed'
+
+    obj.delete()
+
+    assert cache.get_cached('systemconfig', uuid) is None
+    assert cache.get_object('systemconfig', uuid) is None
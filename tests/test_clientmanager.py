@@ -31,8 +31,8 @@ Test HFOS Launcher
 
 """
 
-from hfos.ui.clientobjects import User, Client
-from circuits import Manager
+from hfos.ui.clientobjects import User, Client, Outbox, Socket
+from circuits import Manager, Component, handler
 from circuits.web.websockets.client import WebSocketClient
 from circuits.web.websockets.dispatcher import WebSocketsDispatcher
 from circuits.web.servers import TCPServer
@@ -40,8 +40,11 @@ from circuits.net.events import write, read
 from json import loads, dumps
 import pytest
 from uuid import uuid4
+from time import sleep
 from hfos.ui.clientmanager import ClientManager
-from hfos.events.client import authenticationrequest
+from hfos.ui.ratelimit import RateLimiter
+from hfos.ui.requeststats import RequestStats
+from hfos.events.client import authenticationrequest, multicast, send
 
 from pprint import pprint
 
@@ -128,3 +131,254 @@ def test_auth_logout():
 
     assert result.clientuuid == client_uuid
 
+
+
+class WriteRecorder(Component):
+    channel = 'wsserver'
+
+    def init(self):
+        self.written = []
+
+    @handler('write')
+    def write(self, sock, data):
+        self.written.append((sock, data))
+
+
+def test_multicast():
+    """Tests if a multicast packet is encoded once and written to every
+    recipient's socket exactly once"""
+
+    recorder = WriteRecorder().register(m)
+    m.start()
+
+    useruuid = str(uuid4())
+    clientuuids = [str(uuid4()), str(uuid4())]
+
+    user = User(None, None, useruuid)
+    user.clients = clientuuids
+    cm._users[useruuid] = user
+
+    for clientuuid in clientuuids:
+        cm._clients[clientuuid] = Client('sock-' + clientuuid, '127.0.0.1',
+                                         clientuuid, useruuid)
+
+    packet = {'component': 'test', 'action': 'multicast', 'data': 23}
+
+    waiter = pytest.WaitEvent(m, 'multicast_complete', 'hfosweb')
+    event = multicast([useruuid, clientuuids[0], 'BERTRAM'], packet,
+                      sendtype='user', fail_quiet=True)
+    event.complete = True
+    m.fire(event, 'hfosweb')
+    waiter.wait()
+
+    # The client recipients are not users, so only the user's sockets count
+    sockets = [sock for sock, data in recorder.written]
+    assert sorted(sockets) == sorted(['sock-' + uuid for uuid in clientuuids])
+
+    data = [data for sock, data in recorder.written]
+    assert data[0] is data[1]
+    assert loads(data[0]) == packet
+
+    recorder.unregister()
+
+
+class Account(object):
+    def __init__(self, name):
+        self.name = name
+
+
+def test_send_by_username():
+    """Tests if packets addressed by user name reach the connected user's
+    clients without a database lookup"""
+
+    recorder = WriteRecorder().register(m)
+    m.start()
+
+    useruuid = str(uuid4())
+    clientuuid = str(uuid4())
+    sock = 'sock-' + clientuuid
+
+    user = User(Account('bertram'), None, useruuid)
+    user.clients = [clientuuid]
+    cm._users[useruuid] = user
+    cm._clients[clientuuid] = Client(sock, '127.0.0.1', clientuuid, useruuid)
+
+    packet = {'component': 'test', 'action': 'named', 'data': 42}
+
+    m.fire(send(None, packet, username='nobody', sendtype='user',
+                fail_quiet=True), 'hfosweb')
+    m.fire(send(None, packet, username='bertram', sendtype='user'),
+           'hfosweb')
+
+    for retry in range(100):
+        if len(recorder.written) > 0:
+            break
+        sleep(0.01)
+
+    assert len(recorder.written) == 1
+    assert recorder.written[0][0] == sock
+    assert loads(recorder.written[0][1]) == packet
+
+    del cm._users[useruuid]
+    del cm._clients[clientuuid]
+    recorder.unregister()
+
+
+def test_outbox_coalescing():
+    """Tests if superseded messages are replaced in the outbound queue"""
+
+    outbox = Outbox(1000, 10)
+
+    outbox.put('first')
+    outbox.put('frame 1', coalesce='camera')
+    outbox.put('frame 2', coalesce='camera')
+
+    assert len(outbox) == 2
+    assert outbox.coalesced == 1
+    assert outbox.get() == 'first'
+    assert outbox.get() == 'frame 2'
+    assert outbox.bytes == 0
+
+
+def test_outbox_limits():
+    """Tests if droppable messages are dropped first and a queue over its
+    limits is flagged"""
+
+    outbox = Outbox(1000, 3)
+
+    outbox.put('update', droppable=True)
+    outbox.put('a')
+    outbox.put('b')
+    outbox.put('c')
+
+    assert outbox.dropped == 1
+    assert outbox.over_limit is None
+    assert outbox.get() == 'a'
+
+    outbox.put('d')
+    outbox.put('e')
+
+    assert outbox.over_limit is not None
+
+    outbox.get()
+
+    assert outbox.over_limit is None
+
+
+def test_outbound_watermark():
+    """Tests if messages are held back while a socket's transmissions in
+    flight are above the watermark and sent once they are taken over"""
+
+    recorder = WriteRecorder().register(m)
+    m.start()
+
+    clientuuid = str(uuid4())
+    sock = 'sock-' + clientuuid
+    watermark = cm.config.outbound_watermark
+
+    socket = Socket('127.0.0.1', clientuuid, Outbox(watermark * 4, 10))
+    socket.inflight = watermark
+    cm._sockets[sock] = socket
+
+    cm._write(sock, 'held')
+
+    assert len(socket.outbox) == 1
+    assert recorder.written == []
+
+    cm.write_complete(write(sock, 'x' * watermark))
+
+    for retry in range(100):
+        if len(recorder.written) > 0:
+            break
+        sleep(0.01)
+
+    assert recorder.written == [(sock, 'held')]
+    assert len(socket.outbox) == 0
+
+    del cm._sockets[sock]
+    recorder.unregister()
+
+
+def test_batching():
+    """Tests if packets for a batching client are collected into one frame
+    and superseded packets are coalesced"""
+
+    recorder = WriteRecorder().register(m)
+    m.start()
+
+    clientuuid = str(uuid4())
+    sock = 'sock-' + clientuuid
+
+    cm._sockets[sock] = Socket('127.0.0.1', clientuuid, batch=0.2)
+    cm._clients[clientuuid] = Client(sock, '127.0.0.1', clientuuid)
+
+    for value in range(3):
+        m.fire(send(clientuuid, {'component': 'test', 'action': 'update',
+                                 'data': value}, coalesce='test'), 'hfosweb')
+    m.fire(send(clientuuid, {'component': 'test', 'action': 'other',
+                             'data': None}), 'hfosweb')
+
+    for retry in range(100):
+        if len(recorder.written) > 0:
+            break
+        sleep(0.01)
+
+    assert len(recorder.written) == 1
+
+    batch = loads(recorder.written[0][1])
+
+    assert batch['action'] == 'batch'
+    assert [packet['data'] for packet in batch['data']] == [2, None]
+
+    recorder.unregister()
+
+
+def test_rate_limiter():
+    """Tests if client and per event limits are enforced independently"""
+
+    limiter = RateLimiter(1, 3, {'test.search': {'rate': 1, 'burst': 1}})
+
+    assert limiter.check('client', 'test.search') is True
+    assert limiter.check('client', 'test.search') is False
+    assert limiter.check('client', 'test.list') is True
+    assert limiter.check('client', 'test.list') is True
+    assert limiter.check('client', 'test.list') is False
+    assert limiter.check('other', 'test.list') is True
+
+    assert limiter.rejections == {'test.search': 1, '*': 1}
+
+    limiter.forget('client')
+    assert limiter.check('client', 'test.search') is True
+
+
+def test_dispatch_table():
+    """Tests if anonymous events take precedence in the dispatch table"""
+
+    cm.authorized_events = {
+        'test': {'search': {'event': send}, 'list': {'event': send}}
+    }
+    cm.anonymous_events = {'test': {'search': {'event': multicast}}}
+    cm._build_dispatch()
+
+    assert cm._dispatch['test', 'search'].event is multicast
+    assert cm._dispatch['test', 'search'].authorized is False
+    assert cm._dispatch['test', 'list'].authorized is True
+    assert cm._dispatch['test', 'list'].key == 'test.list'
+
+
+def test_request_stats():
+    """Tests if latencies are measured to the first response only"""
+
+    stats = RequestStats()
+
+    stats.started('sock', 'test.search', now=10.0)
+    stats.answered('sock', now=10.003)
+    stats.answered('sock', now=11.0)
+    stats.started('sock', 'test.search', now=12.0)
+    stats.started('sock', 'test.list', now=12.0)
+    stats.answered('sock', now=12.2)
+
+    assert stats.requests == {'test.search': 2, 'test.list': 1}
+    assert stats.latencies['test.search'].count == 1
+    assert stats.latencies['test.search'].percentile(50) == pytest.approx(3)
+    assert stats.latencies['test.list'].percentile(99) == pytest.approx(200)
@@ -151,3 +151,20 @@ def test_example_component():
     c = hfos.component.ExampleComponent()
 
     assert type(c) == hfos.component.ExampleComponent
+
+
+def test_config_model_memoized():
+    """Tests that equal configprops share one compiled configuration model"""
+
+    configprops = {'setting': {'type': 'string', 'default': 'foo'}}
+
+    schema, model = hfos.component.get_config_model(configprops)
+    same_schema, same_model = hfos.component.get_config_model(
+        dict(configprops))
+    other_schema, other_model = hfos.component.get_config_model({})
+
+    assert same_model is model
+    assert same_schema is schema
+    assert other_model is not model
+    assert 'setting' in schema['schema']['properties']
+    assert 'setting' not in other_schema['schema']['properties']
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# HFOS - Hackerfleet Operating System
+# ===================================
+# Copyright (C) 2011-2017 Heiko 'riot' Weinen <riot@c-base.org> and others.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Heiko 'riot' Weinen"
+__license__ = "GPLv3"
+
+"""
+Hackerfleet Operating System - Backend
+
+Test HFOS Database
+==================
+
+
+
+"""
+
+from hfos import database
+
+
+def test_shared_client():
+    """Tests if all handles are derived from the one shared client"""
+
+    client = database.get_client()
+
+    assert database.get_database().name == 'hfos-test'
+    assert database.get_database().client is client
+    assert database.get_collection('user').database.client is client
+
+
+def test_reinitialize_same_database():
+    """Tests if initializing the same database again keeps the client"""
+
+    client = database.get_client()
+
+    database.initialize(database.dbhost, database.dbname)
+
+    assert database.get_client() is client
+    assert database.get_database().command('ping')['ok']
+
+
+def test_pool_counters():
+    """Tests if connection pool usage is counted"""
+
+    database.get_database().command('ping')
+
+    stats = database.pool_stats()
+
+    assert stats['created'] >= 1
+    assert stats['in_use'] >= 0
+    assert stats['checked_out'] >= stats['checked_in']
+
+
+def test_declared_indices():
+    """Tests if uuid indices are declared and created"""
+
+    declared = database.declared_indices('systemconfig')
+
+    assert declared['uuid_1']['unique'] is True
+
+    database.ensure_indices(['systemconfig'])
+
+    collection = database.objectmodels['systemconfig'].collection()
+    assert 'uuid_1' in collection.index_information()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# HFOS - Hackerfleet Operating System
+# ===================================
+# Copyright (C) 2011-2017 Heiko 'riot' Weinen <riot@c-base.org> and others.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Heiko 'riot' Weinen"
+__license__ = "GPLv3"
+
+"""
+Hackerfleet Operating System - Backend
+
+Test HFOS Database Worker
+=========================
+
+Benchmarks event loop latency while a slow query is running, once blocking
+inside the handler and once handed off to the database worker pool.
+
+"""
+
+from time import sleep, time
+
+from circuits import Manager, Component, Event, Timer, handler
+
+from hfos.database import dbworker, dbtask, dbworker_channel
+
+SLOW_QUERY = 0.5
+TICK = 0.01
+
+
+def slow_query(duration):
+    sleep(duration)
+    return 'result'
+
+
+class slow_request(Event):
+    pass
+
+
+class Probe(Component):
+    channel = 'probe'
+
+    def init(self, nonblocking):
+        self.nonblocking = nonblocking
+        self.ticks = []
+        self.result = None
+        self.timer = Timer(TICK, Event.create('probe_tick'), self.channel,
+                           persist=True).register(self)
+
+    @handler('probe_tick')
+    def probe_tick(self):
+        self.ticks.append(time())
+
+    @handler('slow_request')
+    def slow_request(self):
+        if self.nonblocking:
+            result = yield self.call(dbtask(slow_query, SLOW_QUERY),
+                                     dbworker_channel)
+            self.result = result.value
+        else:
+            self.result = (slow_query(SLOW_QUERY), None)
+
+
+def measure(nonblocking):
+    m = Manager()
+    dbworker().register(m)
+    probe = Probe(nonblocking).register(m)
+    m.start()
+
+    try:
+        sleep(0.1)
+        start = time()
+        m.fire(slow_request(), 'probe')
+        while probe.result is None and time() - start < 5:
+            sleep(TICK)
+        sleep(0.1)
+    finally:
+        m.stop()
+
+    ticks = [start] + [tick for tick in probe.ticks if tick >= start]
+    gaps = [b - a for a, b in zip(ticks, ticks[1:])]
+
+    return probe.result, max(gaps) if gaps else SLOW_QUERY
+
+
+def test_event_loop_latency():
+    """Runs the same slow query blocking and non-blocking and compares the
+    largest gap between timer ticks"""
+
+    blocking_result, blocking_gap = measure(nonblocking=False)
+    worker_result, worker_gap = measure(nonblocking=True)
+
+    print("Largest tick gap: blocking %.3fs, worker pool %.3fs" % (
+        blocking_gap, worker_gap))
+
+    assert blocking_result == ('result', None)
+    assert worker_result == ('result', None)
+
+    assert blocking_gap >= SLOW_QUERY * 0.9
+    assert worker_gap < SLOW_QUERY / 2
+
+
+def test_failing_call():
+    """Tests if a failing database call resumes the handler with the
+    exception instead of hanging it"""
+
+    def broken():
+        raise ValueError('broken')
+
+    m = Manager()
+    dbworker().register(m)
+    m.start()
+
+    try:
+        value = m.fire(dbtask(broken), dbworker_channel)
+        start = time()
+        while not value.result and time() - start < 5:
+            sleep(TICK)
+    finally:
+        m.stop()
+
+    result, failure = value.value
+
+    assert result is None
+    assert isinstance(failure, ValueError)
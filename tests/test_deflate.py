@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# HFOS - Hackerfleet Operating System
+# ===================================
+# Copyright (C) 2011-2017 Heiko 'riot' Weinen <riot@c-base.org> and others.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Heiko 'riot' Weinen"
+__license__ = "GPLv3"
+
+"""
+Hackerfleet Operating System - Backend
+
+Test HFOS Websocket Compression
+===============================
+
+
+
+"""
+
+import zlib
+from json import dumps
+
+from hfos.ui.deflate import negotiate, DeflateWebSocketCodec, TRAILER
+
+packet = dumps({
+    'component': 'hfos.navdata.sensors',
+    'action': 'update',
+    'data': {'type': 'Wind_Direction_True', 'value': 273.5}
+})
+
+
+def test_negotiation():
+    """Tests if offers are accepted, limited or declined correctly"""
+
+    deflate, header = negotiate('permessage-deflate; client_max_window_bits',
+                                window_bits=12)
+    assert header == 'permessage-deflate; server_max_window_bits=12'
+    assert deflate.server_window_bits == 12
+
+    deflate, header = negotiate('permessage-deflate; '
+                                'server_max_window_bits=8, '
+                                'permessage-deflate; '
+                                'server_no_context_takeover')
+    assert header == 'permessage-deflate; server_no_context_takeover'
+
+    assert negotiate('permessage-deflate; unknown=1') == (None, None)
+    assert negotiate('') == (None, None)
+
+
+def test_compressed_roundtrip():
+    """Tests if messages are compressed with a shared context, small ones
+    are sent plain and compressed client messages are inflated"""
+
+    deflate, header = negotiate('permessage-deflate', min_size=10)
+
+    codec = DeflateWebSocketCodec('sock', deflate=deflate)
+    frames = []
+    codec._write = lambda frame: frames.append(bytes(frame))
+
+    for i in range(3):
+        codec._on_write('sock', packet)
+    codec._on_write('sock', 'tiny')
+
+    decompressor = zlib.decompressobj(-15)
+    for frame in frames[:3]:
+        assert frame[0] & 0x40
+        payload = frame[2:2 + frame[1]]
+        assert decompressor.decompress(payload + TRAILER).decode() == packet
+
+    assert not frames[3][0] & 0x40
+    # The shared compression context makes repeated messages tiny
+    assert len(frames[2]) < len(frames[0]) / 4
+    assert deflate.stats()['ratio'] < 0.5
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    payload = compressor.compress(packet.encode('utf-8')) + \
+        compressor.flush(zlib.Z_SYNC_FLUSH)
+    payload = payload[:-4]
+    mask = b'\x01\x02\x03\x04'
+    frame = bytes([0xc1, 0x80 | len(payload)]) + mask + \
+        bytes(c ^ mask[i % 4] for i, c in enumerate(payload))
+
+    assert codec._parse_messages(bytearray(frame)) == [packet]
+
+
+def test_split_compressed_frames():
+    """Tests if compressed frames arriving in pieces are inflated once
+    complete and plain messages in between are left alone"""
+
+    deflate, header = negotiate('permessage-deflate')
+    codec = DeflateWebSocketCodec('sock', deflate=deflate)
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    payload = compressor.compress(packet.encode('utf-8')) + \
+        compressor.flush(zlib.Z_SYNC_FLUSH)
+    compressed = bytes([0xc1, len(payload) - 4]) + payload[:-4]
+    plain = bytes([0x81, 4]) + b'tiny'
+
+    assert codec._parse_messages(bytearray(compressed[:5])) == []
+    assert codec._parse_messages(bytearray(compressed[5:] + plain)) == [
+        packet, 'tiny']
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# HFOS - Hackerfleet Operating System
+# ===================================
+# Copyright (C) 2011-2017 Heiko 'riot' Weinen <riot@c-base.org> and others.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Heiko 'riot' Weinen"
+__license__ = "GPLv3"
+"""
+Hackerfleet Operating System - Backend
+
+Test HFOS Devices
+=================
+
+Tests the cached, parallel serial port inventory.
+
+"""
+
+import os
+from time import sleep, time
+
+from hfos.devices import SerialInventory
+
+
+def test_serial_inventory(tmpdir):
+    """Tests that ports are probed once, slow ports are skipped and not
+    probed again while hanging and new device nodes trigger a rescan"""
+
+    for name in ('ttyUSB0', 'ttyUSB1', 'ttyHANG', 'null'):
+        tmpdir.join(name).write('')
+
+    probed = []
+
+    def probe(port):
+        probed.append(os.path.basename(port))
+        if port.endswith('HANG'):
+            sleep(2)
+        return not port.endswith('USB1')
+
+    inventory = SerialInventory(timeout=0.5, devicedir=str(tmpdir),
+                                probe=probe)
+
+    start = time()
+    ports = inventory.ports()
+    duration = time() - start
+
+    assert ports == [str(tmpdir.join('ttyUSB0'))]
+    assert duration < 1.5
+    assert sorted(probed) == ['ttyHANG', 'ttyUSB0', 'ttyUSB1']
+
+    inventory.ports()
+    assert inventory.scans == 1
+
+    tmpdir.join('ttyACM0').write('')
+
+    deadline = time() + 5
+    while str(tmpdir.join('ttyACM0')) not in inventory.ports():
+        assert time() < deadline
+        sleep(0.05)
+
+    assert inventory.scans == 2
+    # The port still hanging in its first probe is not probed again
+    assert probed.count('ttyHANG') == 1
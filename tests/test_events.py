@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# HFOS - Hackerfleet Operating System
+# ===================================
+# Copyright (C) 2011-2017 Heiko 'riot' Weinen <riot@c-base.org> and others.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Heiko 'riot' Weinen"
+__license__ = "GPLv3"
+"""
+Hackerfleet Operating System - Backend
+
+Test HFOS Events
+================
+
+Benchmarks client events through a manager with a no-op handler and
+tests on demand activation of dormant components.
+
+"""
+
+import pytest
+
+from time import time
+
+from circuits import Manager, Component, handler
+from hfos import logger
+from hfos.dormant import DormantComponent
+from hfos.events import system
+from hfos.events.client import send
+from hfos.events.system import populate_user_events, get_user_events
+
+COUNT = 20000
+
+
+class Sink(Component):
+    channel = 'benchmark'
+
+    @handler('send')
+    def send(self, event):
+        pass
+
+
+@pytest.mark.benchmark
+def test_send_event_benchmark():
+    """Measures send events per second, with the events log level off"""
+
+    m = Manager()
+    Sink().register(m)
+    while len(m):
+        m.tick()
+
+    verbosity = logger.verbosity['global']
+    logger.verbosity['global'] = logger.info
+
+    packet = {
+        'component': 'hfos.navdata.sensors',
+        'action': 'update',
+        'data': {'values': list(range(50)), 'text': 'x' * 200}
+    }
+
+    try:
+        start = time()
+        for i in range(COUNT):
+            m.fire(send('uuid', packet), 'benchmark')
+        while len(m):
+            m.tick()
+        duration = time() - start
+    finally:
+        logger.verbosity['global'] = verbosity
+
+    print("%.0f send events/s" % (COUNT / duration))
+
+    event = send('uuid', packet, coalesce='test')
+    assert event.coalesce == 'test'
+    assert 'packet' not in event.__dict__
+
+
+class Sleeper(Component):
+    channel = 'hfosweb'
+
+    requests = []
+
+    @handler('hfos.testdormant.sleeper_request')
+    def sleeper_request(self, event):
+        self.requests.append(event.data)
+
+
+def test_dormant_component():
+    """Tests that a dormant component advertises its events, is activated
+    by the first one and handles it"""
+
+    entry = {
+        'name': 'sleeper',
+        'module': __name__,
+        'attrs': ['Sleeper'],
+        'events': [{
+            'name': 'sleeper_request',
+            'module': 'hfos.testdormant',
+            'doc': 'Test request',
+            'authorized': False
+        }]
+    }
+
+    # The global event tables are restored for the other tests
+    tables = system.AuthorizedEvents, system.AnonymousEvents
+    dormant_events = dict(system.DormantEvents)
+
+    try:
+        m = Manager()
+        dormant = DormantComponent(entry, timeout=0).register(m)
+        while len(m):
+            m.tick()
+
+        populate_user_events()
+        event = system.AnonymousEvents['hfos.testdormant'][
+            'sleeper_request']['event']
+
+        assert event.dormant
+        assert 'hfos.testdormant' not in get_user_events()
+        assert dormant.component is None
+
+        m.fire(event('request', 'foo', None), 'hfosweb')
+        while len(m):
+            m.tick()
+
+        assert isinstance(dormant.component, Sleeper)
+        assert Sleeper.requests == ['foo']
+
+        dormant.deactivate()
+        while len(m):
+            m.tick()
+
+        assert dormant.component is None
+    finally:
+        system.AuthorizedEvents, system.AnonymousEvents = tables
+        system.DormantEvents.clear()
+        system.DormantEvents.update(dormant_events)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# HFOS - Hackerfleet Operating System
+# ===================================
+# Copyright (C) 2011-2017 Heiko 'riot' Weinen <riot@c-base.org> and others.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Heiko 'riot' Weinen"
+__license__ = "GPLv3"
+
+"""
+Hackerfleet Operating System - Backend
+
+Test HFOS Packet Framing
+========================
+
+
+
+"""
+
+import pytest
+
+from hfos.ui.framing import available, encode, decode
+
+packet = {
+    'component': 'hfos.navdata.sensors',
+    'action': 'update',
+    'data': {
+        'type': 'Wind_Direction_True',
+        'value': 273.5,
+        'timestamp': 1490000000.123
+    }
+}
+
+
+def test_json_default():
+    """Tests if JSON framing is always available and produces text"""
+
+    assert 'json' in available()
+
+    data = encode(packet)
+
+    assert not isinstance(data, bytes)
+    assert decode(data) == packet
+
+
+@pytest.mark.parametrize('framing', ['msgpack', 'cbor'])
+def test_binary_framing(framing):
+    """Tests if binary framings round trip packets with raw payloads and are
+    smaller than JSON"""
+
+    if framing not in available():
+        pytest.skip('%s not installed' % framing)
+
+    raw = dict(packet, data={'raw': b'\x00\x01\x02' * 100})
+
+    data = encode(raw, framing)
+
+    assert isinstance(data, bytes)
+    assert decode(data, framing) == raw
+    assert len(encode(packet, framing)) < len(encode(packet))
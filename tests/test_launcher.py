@@ -31,7 +31,7 @@ Test HFOS Launcher
 
 """
 
-from hfos.launcher import Core
+from hfos.launcher import Core, startup_order
 
 args = {
     'insecure': False,
@@ -52,3 +52,24 @@ def test_launcher():
     core = Core(args)
 
     assert type(core) == Core
+
+
+def test_startup_order():
+    """Tests that components are registered after their dependencies"""
+
+    order = startup_order({
+        'nmeaparser': ['sensorscanner'],
+        'sensorscanner': [],
+        'chat': ['cli', 'notinstalled'],
+        'cli': [],
+        'auth': []
+    })
+
+    assert sorted(order) == ['auth', 'chat', 'cli', 'nmeaparser',
+                             'sensorscanner']
+    assert order.index('sensorscanner') < order.index('nmeaparser')
+    assert order.index('cli') < order.index('chat')
+
+    circular = startup_order({'a': ['b'], 'b': ['a'], 'c': []})
+
+    assert circular == ['c', 'a', 'b']
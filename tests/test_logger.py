@@ -34,7 +34,8 @@ Test HFOS Launcher
 from circuits import Manager
 import pytest
 from hfos import logger
-from time import sleep
+from time import sleep, time
+import inspect
 
 from pprint import pprint
 
@@ -65,3 +66,131 @@ def test_script_logging():
     lastlog = "".join(logger.LiveLog[-1:])
 
     assert "FOOBAR" in lastlog
+
+
+def test_disabled_log_cost(monkeypatch):
+    """Benchmarks filtered out log calls and checks they don't inspect the
+    calling frame"""
+
+    def fail():
+        raise AssertionError('Frame inspected for a filtered record')
+
+    count = 100000
+    verbosity = logger.verbosity['global']
+    data = {'component': 'test', 'action': 'benchmark', 'data': [1, 2, 3]}
+
+    monkeypatch.setattr(inspect, 'currentframe', fail)
+    logger.verbosity['global'] = logger.info
+
+    try:
+        start = time()
+        for i in range(count):
+            logger.hfoslog('Benchmark', data, lvl=logger.verbose)
+        function_time = time() - start
+
+        start = time()
+        for i in range(count):
+            component.log('Benchmark', data, lvl=logger.network)
+        component_time = time() - start
+    finally:
+        logger.verbosity['global'] = verbosity
+
+    print("Filtered log calls: hfoslog %.3fus, component.log %.3fus" % (
+        function_time / count * 1e6, component_time / count * 1e6))
+
+
+def test_logfile_writer(tmpdir):
+    """Tests if the background writer rotates its file and drops records
+    on overload instead of blocking"""
+
+    path = str(tmpdir.join('hfos.log'))
+
+    writer = logger.LogFileWriter(path, max_records=5, flush_interval=0.05,
+                                  rotate_size=100, retention=2)
+
+    for i in range(10):
+        writer.put('Record %i' % i)
+
+    assert writer.dropped == 5
+
+    writer.start()
+    for i in range(30):
+        writer.put('Line %02i with some text' % i)
+        sleep(0.002)
+    writer.stop()
+
+    assert sorted(tmpdir.listdir()) == sorted(
+        [tmpdir.join(name) for name in ('hfos.log', 'hfos.log.1',
+                                        'hfos.log.2')]
+    )
+    assert 'Line 29' in tmpdir.join('hfos.log').read() + \
+        tmpdir.join('hfos.log.1').read()
+    assert writer.written >= 30
+
+
+def test_ring_buffer():
+    """Tests if the ring buffer stays bounded and hands out new items"""
+
+    ring = logger.RingBuffer(3)
+
+    for i in range(5):
+        ring.append(i)
+
+    assert len(ring) == 3
+    assert list(ring) == [2, 3, 4]
+    assert ring[-1:] == [4]
+
+    assert ring.since(3) == ([3, 4], 5)
+    assert ring.since(0) == ([2, 3, 4], 5)
+    assert ring.since(5) == ([], 5)
+
+    ring.append('LAST LINE')
+    assert str(ring) == str([3, 4, 'LAST LINE'])
+    assert 'LAST LINE' in str(ring)
+
+
+def test_structured_records():
+    """Tests if emitted records end up in the records ring buffer"""
+
+    logger.hfoslog('STRUCTURED', lvl=logger.warn, emitter='TEST')
+
+    record = logger.records[-1]
+    fields = record.serializablefields()
+
+    assert record.emitter == 'TEST'
+    assert fields['level'] == 'WARN'
+    assert fields['content'] == 'STRUCTURED'
+    # Every serialization of a record carries the same uuid
+    assert record.serializablefields()['uuid'] == fields['uuid']
+
+
+def test_log_filter():
+    """Tests emitter, level and text aware mute and solo rules"""
+
+    def emitted(*args, **kwargs):
+        sequence = logger.records.sequence
+        logger.hfoslog(*args, **kwargs)
+        return logger.records.sequence > sequence
+
+    try:
+        logger.set_filters(['@CM:warn', 'noisy'], [])
+
+        assert not emitted('Request', emitter='CM', lvl=logger.info)
+        assert emitted('Request', emitter='CM', lvl=logger.warn)
+        assert not emitted('Very NOISY', emitter='OM')
+        assert emitted('Quiet', emitter='OM')
+
+        logger.set_filters([], ['@NAV*:warn', 'special'])
+
+        assert emitted('Position', emitter='NAVDATA')
+        assert emitted('A special one', emitter='CM')
+        assert not emitted('Request', emitter='CM')
+
+        with pytest.raises(KeyError):
+            logger.set_filters(['@CM:bogus'])
+
+        assert logger.mute == []
+    finally:
+        logger.set_filters([], [])
+
+    assert logger.logfilter.active is False
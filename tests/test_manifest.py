@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# HFOS - Hackerfleet Operating System
+# ===================================
+# Copyright (C) 2011-2017 Heiko 'riot' Weinen <riot@c-base.org> and others.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Heiko 'riot' Weinen"
+__license__ = "GPLv3"
+"""
+Hackerfleet Operating System - Backend
+
+Test HFOS Manifest
+==================
+
+Benchmarks component discovery through entry points against the cached
+manifest.
+
+"""
+
+import os
+from time import time
+
+from hfos import manifest
+
+
+def test_manifest_startup_benchmark(tmpdir, monkeypatch):
+    """Compares building the manifest with loading the cached one"""
+
+    monkeypatch.setattr(manifest, 'manifest_path',
+                        str(tmpdir.join('manifest.json')))
+    monkeypatch.setattr(manifest, '_manifest', None)
+
+    start = time()
+    built = manifest.get_manifest(rebuild=True)
+    build_time = time() - start
+
+    monkeypatch.setattr(manifest, '_manifest', None)
+
+    start = time()
+    cached = manifest.get_manifest()
+    cached_time = time() - start
+
+    print("Component discovery: entry points %.3fs, manifest %.3fs" % (
+        build_time, cached_time))
+
+    assert cached == built
+    assert tmpdir.join('manifest.json').check()
+
+
+def test_untrusted_manifest(tmpdir, monkeypatch):
+    """Tests that a manifest writable by other users is not loaded"""
+
+    path = str(tmpdir.join('manifest.json'))
+    monkeypatch.setattr(manifest, 'manifest_path', path)
+    monkeypatch.setattr(manifest, 'user_manifest_path', path)
+
+    current = manifest.fingerprint()
+    groups = {'hfos.components': []}
+
+    assert manifest._write(path, current, groups) == path
+    assert oct(os.stat(path).st_mode & 0o777) == oct(0o600)
+    assert manifest._read(path, current) == groups
+
+    os.chmod(path, 0o666)
+
+    assert manifest._read(path, current) is None
+
+
+def test_manifest_fingerprint(tmpdir):
+    """Tests if installing a distribution changes the fingerprint"""
+
+    before = manifest.fingerprint([str(tmpdir)])
+
+    tmpdir.mkdir('hfos_example-1.0.dist-info')
+
+    assert manifest.fingerprint([str(tmpdir)]) != before
+
+
+def test_load_entry():
+    """Tests if manifest entries are imported lazily and correctly"""
+
+    entry = {'module': 'hfos.manifest', 'attrs': ['load_entry']}
+
+    assert manifest.load_entry(entry) is manifest.load_entry
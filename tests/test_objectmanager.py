@@ -36,7 +36,7 @@ from circuits import Manager
 import pytest
 from uuid import uuid4
 
-from hfos.database import objectmodels
+from hfos.database import objectmodels, dbworker
 from hfos.ui.clientobjects import User, Client
 from hfos.ui.objectmanager import ObjectManager
 from hfos.events.objectmanager import objectchange, objectcreation, \
@@ -49,6 +49,7 @@ from pprint import pprint
 m = Manager()
 om = ObjectManager()
 om.register(m)
+dbworker().register(m)
 
 useruuid = str(uuid4())
 clientuuid = str(uuid4())
@@ -138,6 +139,101 @@ def test_list_all_fields():
     assert 'active' in obj
 
 
+def test_paged_list():
+    """Tests if lists can be limited and are counted on request"""
+
+    packet = transmit('list', {
+        'schema': 'systemconfig',
+        'limit': 1,
+        'sort': '-uuid',
+        'count': True
+    })
+
+    data = packet['data']
+
+    assert packet['action'] == 'list'
+    assert len(data['list']) == 1
+    assert data['next'] == 1
+    assert data['count'] >= 1
+
+
+def test_streamed_list():
+    """Tests if streamed lists are transmitted in chunked frames"""
+
+    packet = transmit('list', {
+        'schema': 'systemconfig',
+        'stream': 1000
+    })
+
+    data = packet['data']
+
+    assert packet['action'] == 'list'
+    assert data['part'] == 0
+    assert data['done'] is True
+    assert len(data['list']) >= 1
+
+
+def test_list_filtered_by_permission():
+    """Tests if objects are only listed for permitted users"""
+
+    account = AccountMock()
+    account.roles = ['crew']
+
+    packet = transmit('list', {
+        'schema': 'systemconfig'
+    }, account=account)
+
+    assert packet['action'] == 'list'
+    assert len(packet['data']['list']) == 0
+
+
+def test_permission_filter():
+    """Tests if the permission check is translated into a query filter"""
+
+    account = AccountMock()
+    account.roles = ['crew']
+    user = User(account, ProfileMock(), useruuid)
+
+    assert om._get_permission_filter(user, 'list') == {'$or': [
+        {'perms.list': {'$in': ['crew']}},
+        {'perms.list': 'owner', 'owner': useruuid}
+    ]}
+
+    # Only admins get to see objects without permissions
+    admin = User(AccountMock(), ProfileMock(), useruuid)
+
+    assert om._get_permission_filter(admin, 'list') == {'$or': [
+        {'perms.list': {'$in': ['admin']}},
+        {'perms.list': 'owner', 'owner': useruuid},
+        {'perms': {'$exists': False}}
+    ]}
+
+
+def test_invalid_paging():
+    """Tests if malformed paging options are refused"""
+
+    packet = transmit('list', {
+        'schema': 'systemconfig',
+        'limit': 'BERTRAM'
+    })
+
+    assert packet['action'] == 'fail'
+    assert packet['data']['reason'] == 'invalid_options'
+
+
+def test_invalid_stream():
+    """Tests if malformed stream options are refused"""
+
+    for stream in ('yes', 0, -5, 2.5):
+        packet = transmit('list', {
+            'schema': 'systemconfig',
+            'stream': stream
+        })
+
+        assert packet['action'] == 'fail'
+        assert packet['data']['reason'] == 'invalid_options'
+
+
 def test_no_schema():
     """Tests if unspecified schema leads to 'noschema' error feedback"""
 
@@ -315,6 +411,37 @@ def test_put_new():
     assert packet['data']['uuid'] == uuid
 
 
+def test_put_update():
+    """Tests if an existing object is changed and stored by a put request"""
+
+    uuid = str(uuid4())
+    obj = objectmodels['systemconfig']({'uuid': uuid})
+    obj.active = False
+    obj.name = 'TEST SYSTEMCONFIG'
+
+    packet = transmit('put', {
+        'schema': 'systemconfig',
+        'obj': obj.serializablefields(),
+        'uuid': uuid
+    })
+
+    assert packet['action'] == 'put'
+
+    obj.name = 'CHANGED SYSTEMCONFIG'
+
+    packet = transmit('put', {
+        'schema': 'systemconfig',
+        'obj': obj.serializablefields(),
+        'uuid': uuid
+    })
+
+    assert packet['action'] == 'put'
+    assert packet['data']['uuid'] == uuid
+
+    stored = objectmodels['systemconfig'].find_one({'uuid': uuid})
+    assert stored.name == 'CHANGED SYSTEMCONFIG'
+
+
 def test_put_new_permission_error():
     uuid = str(uuid4())
     obj = objectmodels['systemconfig']({'uuid': uuid})
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# HFOS - Hackerfleet Operating System
+# ===================================
+# Copyright (C) 2011-2017 Heiko 'riot' Weinen <riot@c-base.org> and others.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Heiko 'riot' Weinen"
+__license__ = "GPLv3"
+"""
+Hackerfleet Operating System - Backend
+
+Test HFOS Profiler
+==================
+
+
+
+"""
+
+from circuits import Manager, Component, Event, handler
+from hfos.profiler import HandlerProfiler
+
+
+class ping(Event):
+    pass
+
+
+class Busy(Component):
+    channel = 'busy'
+
+    @handler('ping')
+    def ping(self):
+        return sum(range(1000))
+
+
+def test_handler_profiler():
+    """Tests if handler calls and queue waits get measured"""
+
+    m = Manager()
+    Busy().register(m)
+    while len(m):
+        m.tick()
+
+    profiler = HandlerProfiler()
+    profiler.install(m)
+
+    for i in range(10):
+        value = m.fire(ping(), 'busy')
+    while len(m):
+        m.tick()
+
+    assert value.value == sum(range(1000))
+
+    timing = profiler.handlers['Busy', 'ping', 'busy']
+    assert timing.count == 10
+    assert timing.wall > 0
+    assert profiler.waits['ping'].count == 10
+
+    assert 'ping' in profiler.report()
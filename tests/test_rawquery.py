@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# HFOS - Hackerfleet Operating System
+# ===================================
+# Copyright (C) 2011-2017 Heiko 'riot' Weinen <riot@c-base.org> and others.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Heiko 'riot' Weinen"
+__license__ = "GPLv3"
+
+"""
+Hackerfleet Operating System - Backend
+
+Test HFOS Raw Queries
+=====================
+
+Compares listing a few fields of objects through model instances and as
+projected plain documents. The timing comparison of 10k objects only
+runs with --benchmark.
+
+"""
+
+import pytest
+
+from time import time
+from uuid import uuid4
+
+from hfos.database import objectmodels, find_all, find_raw
+
+COUNT = 10000
+FIELDS = ['timestamp', 'level']
+
+
+def model_list(model, object_filter):
+    result = []
+
+    for item in find_all(model, object_filter):
+        list_item = {'uuid': item.uuid}
+        for field in FIELDS:
+            list_item[field] = item._fields.get(field, None)
+        result.append(list_item)
+
+    return result
+
+
+def raw_list(model, object_filter):
+    projection = {'_id': False, 'uuid': True}
+    for field in FIELDS:
+        projection[field] = True
+
+    result = []
+
+    for document in find_raw(model, object_filter, projection):
+        list_item = {'uuid': document['uuid']}
+        for field in FIELDS:
+            list_item[field] = document.get(field, None)
+        result.append(list_item)
+
+    return result
+
+
+def store_messages(count):
+    """Stores count log messages with a unique emitter and returns the
+    filter selecting them"""
+
+    emitter = 'RAWQUERY-' + str(uuid4())
+
+    objectmodels['logmessage'].collection().insert_many([{
+        'uuid': str(uuid4()),
+        'timestamp': float(i),
+        'emitter': emitter,
+        'sourceloc': 'test_rawquery',
+        'level': 'debug',
+        'content': 'Test message %i with some payload' % i
+    } for i in range(count)])
+
+    return {'emitter': emitter}
+
+
+def test_raw_list():
+    """Tests if projected raw documents list the same as models"""
+
+    model = objectmodels['logmessage']
+    object_filter = store_messages(100)
+
+    try:
+        models = model_list(model, object_filter)
+        documents = raw_list(model, object_filter)
+    finally:
+        model.collection().delete_many(object_filter)
+
+    assert len(models) == len(documents) == 100
+    assert sorted(models, key=lambda item: item['uuid']) == \
+        sorted(documents, key=lambda item: item['uuid'])
+
+
+@pytest.mark.benchmark
+def test_raw_list_benchmark():
+    """Compares listing through models with projected raw documents"""
+
+    model = objectmodels['logmessage']
+    object_filter = store_messages(COUNT)
+
+    try:
+        start = time()
+        models = model_list(model, object_filter)
+        model_time = time() - start
+
+        start = time()
+        documents = raw_list(model, object_filter)
+        raw_time = time() - start
+    finally:
+        model.collection().delete_many(object_filter)
+
+    print("Listing %i objects: models %.3fs, raw documents %.3fs" % (
+        COUNT, model_time, raw_time))
+
+    assert len(models) == len(documents) == COUNT